@@ -1,13 +1,38 @@
-from flask import Flask, request, Response, jsonify, render_template_string
+from flask import Flask, request, Response, jsonify
 import edge_tts
 import asyncio
+import atexit
+import copy
+import gzip
+import hashlib
 import io
 import logging
 import os
+import threading
 import time
 import random
 from datetime import datetime
 from functools import wraps
+from tts_cache import cache_from_env, cache_key
+from rate_limiter import limiter_from_env
+from async_runtime import background_loop
+from segmenter import iter_segment_audio, split_sentences, split_text
+from sentence_cache import SentenceCache
+from batch import stream_batch_zip
+from job_queue import JobQueue, JobWorkers
+from preprocess import preprocess_text, stats as preprocess_stats
+from readiness import Readiness, WARMUP_TEXT
+from voice_manager import voice_manager
+from warmup import RequestLog, Warmer
+from engines import audio_type, router_from_env
+from hedging import caller_from_env
+from singleflight import SingleFlight
+import urllib.request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 app = Flask(__name__)
 
@@ -15,8 +40,59 @@ app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Rate limiting storage
-request_log = {}
+# 'admission' answers 429 + Retry-After during the cooldown instead of
+# sleeping; 'delay' keeps the old 20-30 second in-request sleep
+RATE_LIMIT_MODE = os.environ.get('RATE_LIMIT_MODE', 'admission')
+RATE_LIMIT_COOLDOWN = float(os.environ.get('RATE_LIMIT_COOLDOWN', 25))
+
+# Rate limiting storage (SQLite by default, shared by all gunicorn workers)
+limiter = limiter_from_env(
+    limit=10,
+    cooldown=RATE_LIMIT_COOLDOWN if RATE_LIMIT_MODE != 'delay' else 0.0
+)
+
+# Long texts are split into segments synthesized in parallel
+MAX_TEXT_LENGTH = int(os.environ.get('MAX_TEXT_LENGTH', 10000))
+SEGMENT_MAX_CHARS = int(os.environ.get('SEGMENT_MAX_CHARS', 300))
+SEGMENT_CONCURRENCY = int(os.environ.get('SEGMENT_CONCURRENCY', 4))
+
+# /tts/batch limits
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 200))
+BATCH_MAX_PARALLELISM = int(os.environ.get('BATCH_MAX_PARALLELISM', 8))
+
+# Synthesized audio cache (memory + disk)
+audio_cache = cache_from_env()
+
+# Opt-in: log each /tts request (text included) to pick warm-up targets,
+# e.g. REQUEST_LOG=cache/requests.jsonl; off by default for privacy
+REQUEST_LOG = os.environ.get('REQUEST_LOG', '')
+request_log = RequestLog(
+    REQUEST_LOG, max_bytes=int(float(os.environ.get('REQUEST_LOG_MAX_MB', 8)) * 1024 * 1024)
+) if REQUEST_LOG else None
+
+# Multi-sentence texts are synthesized per sentence, so an edited
+# document only re-synthesizes the sentences that changed
+sentence_cache = SentenceCache(audio_cache, enabled=os.environ.get('SENTENCE_CACHE', '1') == '1')
+
+# Asynchronous jobs: durable SQLite queue drained by background threads
+job_queue = JobQueue(
+    db_path=os.environ.get('JOB_DB', os.path.join('cache', 'jobs.sqlite3')),
+    results_dir=os.environ.get('JOB_RESULTS_DIR', os.path.join('cache', 'jobs')),
+    max_attempts=int(os.environ.get('JOB_MAX_ATTEMPTS', 3)),
+    # Params (with the text) and results are gone within the privacy page's 10-15 minutes
+    ttl=float(os.environ.get('JOB_TTL', 600)),
+    lease_seconds=float(os.environ.get('JOB_LEASE_SECONDS', 60))
+)
+
+# Edge TTS calls: first-chunk and total deadlines per attempt, jittered
+# retries and (EDGE_HEDGE=1) a hedged second attempt for the slow tail
+edge_caller = caller_from_env('EDGE')
+
+# Readiness: /ready answers 503 until every check passes, so a load
+# balancer only routes to warm workers
+readiness = Readiness()
+PIPER_URL = os.environ.get('PIPER_URL', '').rstrip('/')
+PIPER_WARM_VOICES = [v.strip() for v in os.environ.get('PIPER_WARM_VOICES', '').split(',') if v.strip()]
 
 # Voice configurations with gender info
 VOICES = {
@@ -41,46 +117,53 @@ VOICES = {
     'ur-PK-UzmaNeural': {'name': '🇵🇰 عظمیٰ (Female)', 'gender': 'female', 'lang': 'ur-PK'},
 }
 
+def check_rate_limit(client_ip, max_requests_per_hour=10):
+    """Count one request; returns None if admitted, else (429 body, retry-after seconds)"""
+    result = limiter.hit(client_ip, limit=max_requests_per_hour)
+    if result.allowed:
+        return None
+    
+    wait_time = result.retry_after
+    if result.reason == 'window':
+        message = f"Maximum {max_requests_per_hour} requests per hour"
+        try_again = f"Please wait {int(wait_time / 60)} minutes"
+    else:
+        # Enforce the spacing without parking the worker
+        message = f"Please wait {int(RATE_LIMIT_COOLDOWN)} seconds between requests"
+        try_again = f"Please wait {int(wait_time + 0.999)} seconds"
+    
+    return {
+        "error": "Rate limit exceeded",
+        "message": message,
+        "wait_time": int(wait_time / 60),  # minutes
+        "retry_after": int(wait_time + 0.999),  # seconds
+        "try_again": try_again
+    }, int(wait_time + 0.999)
+
 def rate_limit(max_requests_per_hour=10):
     """Rate limiting decorator - 10 requests per hour max"""
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            client_ip = request.remote_addr
-            current_time = time.time()
+            limited = check_rate_limit(request.remote_addr, max_requests_per_hour)
+            if limited is not None:
+                body, retry_after = limited
+                response = jsonify(body)
+                response.status_code = 429
+                response.headers['Retry-After'] = str(retry_after)
+                return response
             
-            # Clean old requests
-            if client_ip in request_log:
-                request_log[client_ip] = [t for t in request_log[client_ip] 
-                                         if current_time - t < 3600]  # 1 hour
-            
-            # Check rate limit
-            if client_ip in request_log and len(request_log[client_ip]) >= max_requests_per_hour:
-                wait_time = 3600 - (current_time - min(request_log[client_ip]))
-                return jsonify({
-                    "error": "Rate limit exceeded",
-                    "message": f"Maximum {max_requests_per_hour} requests per hour",
-                    "wait_time": int(wait_time / 60),  # minutes
-                    "try_again": f"Please wait {int(wait_time / 60)} minutes"
-                }), 429
-            
-            # Add delay of 20-30 seconds
-            delay = random.randint(20, 30)
-            logger.info(f"⏰ Adding delay of {delay} seconds...")
-            time.sleep(delay)
-            
-            # Log this request
-            if client_ip not in request_log:
-                request_log[client_ip] = []
-            request_log[client_ip].append(current_time)
+            if RATE_LIMIT_MODE == 'delay':
+                # Legacy: hold the worker for 20-30 seconds
+                delay = random.randint(20, 30)
+                logger.info(f"⏰ Adding delay of {delay} seconds...")
+                time.sleep(delay)
             
             return f(*args, **kwargs)
         return decorated_function
     return decorator
 
-@app.route('/')
-def home():
-    return render_template_string('''
+HOME_TEMPLATE = '''
     <!DOCTYPE html>
     <html>
     <head>
@@ -272,7 +355,7 @@ def home():
             </div>
             
             <div class="info-box">
-                <strong>⏰ Note:</strong> 20-30 second delay added to prevent abuse.<br>
+                <strong>⏰ Note:</strong> ~25 second cooldown between requests to prevent abuse.<br>
                 <strong>📊 Limit:</strong> 10 requests per hour.
             </div>
             
@@ -300,8 +383,8 @@ def home():
             <div class="row">
                 <div class="form-group">
                     <label>📝 Text to Convert</label>
-                    <textarea id="textInput" placeholder="Enter text here..." maxlength="1000">Assalam-o-Alaikum! Yeh Edge TTS hai. Isme pitch control aur delay bhi hai.</textarea>
-                    <div class="char-counter" id="charCounter">0/1000</div>
+                    <textarea id="textInput" placeholder="Enter text here..." maxlength="{{ max_chars }}">Assalam-o-Alaikum! Yeh Edge TTS hai. Isme pitch control aur delay bhi hai.</textarea>
+                    <div class="char-counter" id="charCounter">0/{{ max_chars }}</div>
                 </div>
             </div>
             
@@ -336,13 +419,12 @@ def home():
             </div>
             
             <button onclick="generateSpeech()" id="generateBtn">
-                <span>🎙️ Generate Speech (20-30 sec delay)</span>
+                <span>🎙️ Generate Speech</span>
             </button>
             
             <div class="loader" id="loader">
                 <div class="spinner"></div>
-                <p>⏰ Please wait 20-30 seconds...</p>
-                <small>Delay added to prevent abuse</small>
+                <p>⏰ Generating audio...</p>
             </div>
             
             <div class="audio-container" id="audioContainer">
@@ -353,12 +435,13 @@ def home():
         </div>
 
         <script>
+            const MAX_CHARS = {{ max_chars }};
             const textInput = document.getElementById('textInput');
             const charCounter = document.getElementById('charCounter');
             
             textInput.addEventListener('input', () => {
-                charCounter.textContent = textInput.value.length + '/1000';
-                if (textInput.value.length > 900) {
+                charCounter.textContent = textInput.value.length + '/' + MAX_CHARS;
+                if (textInput.value.length > MAX_CHARS * 0.9) {
                     charCounter.classList.add('warning');
                 } else {
                     charCounter.classList.remove('warning');
@@ -430,8 +513,8 @@ def home():
                     return;
                 }
                 
-                if (text.length > 1000) {
-                    alert('Max 1000 characters!');
+                if (text.length > MAX_CHARS) {
+                    alert('Max ' + MAX_CHARS + ' characters!');
                     return;
                 }
                 
@@ -476,10 +559,67 @@ def home():
         </script>
     </body>
     </html>
-    ''', voices=VOICES)
+    '''
 
-async def generate_edge_tts(text, voice, pitch, rate, gap):
-    """Generate TTS using Edge TTS with pitch and rate control"""
+# Compiled once; rendered bytes are rebuilt only when VOICES changes
+home_template = app.jinja_env.from_string(HOME_TEMPLATE)
+home_page = {'voices': None, 'max_chars': None, 'etag': None, 'variants': {}}
+home_page_lock = threading.Lock()
+
+def build_home_page():
+    """Render the home page and pre-compress it (gzip, plus brotli when installed)"""
+    html = home_template.render(voices=VOICES, max_chars=MAX_TEXT_LENGTH).encode('utf-8')
+    etag = hashlib.sha256(html).hexdigest()[:32]
+    variants = {
+        'identity': html,
+        'gzip': gzip.compress(html, compresslevel=9, mtime=0)
+    }
+    if brotli is not None:
+        variants['br'] = brotli.compress(html, quality=11)
+    return etag, variants
+
+def get_home_page():
+    """Cached (etag, variants), rebuilt if VOICES or the text limit changed"""
+    if home_page['voices'] != VOICES or home_page['max_chars'] != MAX_TEXT_LENGTH:
+        with home_page_lock:
+            if home_page['voices'] != VOICES or home_page['max_chars'] != MAX_TEXT_LENGTH:
+                etag, variants = build_home_page()
+                home_page.update(
+                    voices=copy.deepcopy(VOICES),
+                    max_chars=MAX_TEXT_LENGTH,
+                    etag=etag,
+                    variants=variants
+                )
+                logger.info(f"🏠 Home page rebuilt ({len(variants['identity'])} bytes, etag {etag[:8]})")
+    return home_page['etag'], home_page['variants']
+
+@app.route('/')
+def home():
+    etag, variants = get_home_page()
+    
+    # Each encoding is a different byte stream, so it gets its own strong ETag
+    if 'br' in variants and request.accept_encodings['br']:
+        encoding = 'br'
+    elif request.accept_encodings['gzip']:
+        encoding = 'gzip'
+    else:
+        encoding = 'identity'
+    tag = etag if encoding == 'identity' else f"{etag}-{encoding}"
+    
+    headers = {
+        'ETag': f'"{tag}"',
+        'Vary': 'Accept-Encoding',
+        'Cache-Control': 'no-cache'
+    }
+    if tag in request.if_none_match:
+        return Response(status=304, headers=headers)
+    
+    if encoding != 'identity':
+        headers['Content-Encoding'] = encoding
+    return Response(variants[encoding], mimetype='text/html', headers=headers)
+
+def edge_attempt(text, voice, pitch, rate, gap):
+    """Factory for one Edge TTS attempt; every call opens a fresh stream"""
     
     # Convert pitch and rate to Edge TTS format
     pitch_str = f"+{pitch}Hz" if int(pitch) >= 0 else f"{pitch}Hz"
@@ -489,71 +629,470 @@ async def generate_edge_tts(text, voice, pitch, rate, gap):
     if int(gap) > 0:
         text = f'<speak><break time="{gap}ms"/>{text}</speak>'
     
-    # Configure TTS
-    communicate = edge_tts.Communicate(
-        text=text,
-        voice=voice,
-        pitch=pitch_str,
-        rate=rate_str
-    )
+    async def attempt():
+        # Configure TTS
+        communicate = edge_tts.Communicate(
+            text=text,
+            voice=voice,
+            pitch=pitch_str,
+            rate=rate_str
+        )
+        
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                yield chunk["data"]
     
-    # Generate audio
-    audio_data = b''
-    async for chunk in communicate.stream():
-        if chunk["type"] == "audio":
-            audio_data += chunk["data"]
+    return attempt
+
+async def stream_edge_tts(text, voice, pitch, rate, gap):
+    """Yield MP3 chunks from Edge TTS as they arrive"""
+    async for chunk in edge_caller.stream(edge_attempt(text, voice, pitch, rate, gap)):
+        yield chunk
+
+async def generate_edge_tts(text, voice, pitch, rate, gap):
+    """Generate TTS using Edge TTS with pitch and rate control"""
+    return await edge_caller.collect(edge_attempt(text, voice, pitch, rate, gap))
+
+async def stream_edge_text(text, voice, pitch, rate, gap, info=None):
+    """Yield Edge MP3 for text of any length; long texts go through the segment pipeline"""
+    if sentence_cache.enabled:
+        sentences = split_sentences(text, SEGMENT_MAX_CHARS)
+        if len(sentences) > 1:
+            async def synthesize_sentence(sentence):
+                return await generate_edge_tts(sentence, voice, pitch, rate, 0)
+            
+            async for chunk in sentence_cache.stream(sentences, voice, pitch, rate, gap, synthesize_sentence,
+                                                     SEGMENT_CONCURRENCY, info):
+                yield chunk
+            return
+    
+    segments = split_text(text, SEGMENT_MAX_CHARS)
+    if len(segments) <= 1:
+        async for chunk in stream_edge_tts(text, voice, pitch, rate, gap):
+            yield chunk
+        return
     
+    # Gap becomes silence between segments instead of a leading break
+    async def synthesize(segment):
+        return await generate_edge_tts(segment, voice, pitch, rate, 0)
+    
+    async for chunk in iter_segment_audio(segments, synthesize, SEGMENT_CONCURRENCY, gap):
+        yield chunk
+
+# Edge or Piper per request, failing over to local Piper when Edge is down or slow
+engine_router = router_from_env(stream_edge_text, VOICES)
+
+def close_engines():
+    """Close pooled engine connections before the event loop stops"""
+    background_loop.run(engine_router.close(), timeout=5)
+
+# Registered after async_runtime's own hook, so it runs first
+atexit.register(close_engines)
+
+# Identical requests in flight at the same time share one synthesis
+inflight = SingleFlight(
+    enabled=os.environ.get('COALESCE_REQUESTS', '1') == '1',
+    retain_bytes=audio_cache.max_item_bytes
+)
+
+async def stream_text(text, voice, pitch, rate, gap, route=None):
+    """Yield audio for text of any length from whichever engine the router picks"""
+    def synthesize(flight_route):
+        return engine_router.stream(text, voice, pitch, rate, gap, flight_route)
+    
+    key = cache_key(text, voice, pitch, rate, gap)
+    async for chunk in inflight.stream(key, synthesize, route):
+        yield chunk
+
+async def synthesize_text(text, voice, pitch, rate, gap, route=None):
+    """Whole audio file for text of any length"""
+    chunks = []
+    async for chunk in stream_text(text, voice, pitch, rate, gap, route):
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+async def synthesize_cached(text, voice, pitch, rate, gap):
+    """synthesize_text() behind the audio cache"""
+    key = cache_key(text, voice, pitch, rate, gap)
+    # Disk tier I/O off the event loop, which other streams share
+    audio_data = await asyncio.to_thread(audio_cache.get, key)
+    if audio_data is None:
+        route = {}
+        audio_data = await synthesize_text(text, voice, pitch, rate, gap, route)
+        # A stand-in voice must not stay cached once Edge is back
+        if not route.get('fallback'):
+            await asyncio.to_thread(audio_cache.put, key, audio_data)
     return audio_data
 
+def server_timing(**durations):
+    """Server-Timing header value from stage durations in seconds"""
+    return ', '.join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in durations.items())
+
+def route_headers(route):
+    """Which engine answered and, for sentence-cached texts, how much was reused"""
+    headers = {'X-Engine': route.get('engine', '')}
+    if route.get('sentences'):
+        headers['X-Sentence-Reuse'] = f"{route['sentences_reused']}/{route['sentences']}"
+    return headers
+
+def audio_headers(audio_data, cache_status, **extra):
+    """Response headers for synthesized audio (MP3 from Edge, WAV from Piper)"""
+    extension = audio_type(audio_data)[1]
+    return dict(extra, **{
+        'Access-Control-Allow-Origin': '*',
+        'Content-Disposition': f'attachment; filename=speech.{extension}',
+        'X-Cache': cache_status
+    })
+
+def stream_tts_response(text, voice, pitch, rate, gap, key, timing=''):
+    """Chunked audio response that forwards chunks as the engine produces them"""
+    route = {}
+    chunks = stream_text(text, voice, pitch, rate, gap, route)
+    
+    # Pull the first chunk before committing to a 200 so early failures
+    # (bad voice, upstream down) still get a JSON error
+    try:
+        first = background_loop.run(chunks.__anext__())
+    except StopAsyncIteration:
+        return jsonify({'error': 'Failed to generate audio'}), 500
+    except Exception:
+        background_loop.run(chunks.aclose())
+        raise
+    
+    def generate():
+        # Keep a copy for the cache only while it stays under the item limit
+        cached = [first]
+        cached_size = len(first)
+        completed = False
+        try:
+            yield first
+            for chunk in background_loop.iterate(chunks):
+                if cached is not None:
+                    cached.append(chunk)
+                    cached_size += len(chunk)
+                    if cached_size > audio_cache.max_item_bytes:
+                        cached = None
+                yield chunk
+            completed = True
+        except Exception as e:
+            # Headers are already sent: abort the chunked body so the client
+            # sees a truncated transfer instead of a short "complete" MP3
+            logger.error(f"Stream error after {cached_size} bytes: {str(e)}")
+            raise
+        finally:
+            if completed and cached is not None and not route.get('fallback'):
+                audio_cache.put(key, b''.join(cached))
+    
+    return Response(
+        generate(),
+        mimetype=audio_type(first)[0],
+        headers=audio_headers(
+            first, 'MISS',
+            **route_headers(route), **{'X-Accel-Buffering': 'no', 'Server-Timing': timing}
+        )
+    )
+
+def parse_tts_request(data):
+    """Validate a /tts JSON body; returns (text, voice, pitch, rate, gap) or raises ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError('Invalid JSON body')
+    
+    text = data.get('text', '')
+    voice = data.get('voice', 'en-US-JennyNeural')
+    pitch = data.get('pitch', 0)
+    rate = data.get('rate', 0)
+    gap = data.get('gap', 0)
+    
+    if not text:
+        raise ValueError('No text provided')
+    
+    if len(text) > MAX_TEXT_LENGTH:
+        raise ValueError(f'Text too long (max {MAX_TEXT_LENGTH} chars)')
+    
+    try:
+        int(pitch), int(rate), int(gap)
+    except (TypeError, ValueError):
+        raise ValueError('pitch, rate and gap must be integers')
+    
+    return text, voice, pitch, rate, gap
+
 @app.route('/tts', methods=['POST'])
 @rate_limit(max_requests_per_hour=10)
 def tts():
     try:
-        data = request.json
-        text = data.get('text', '')
-        voice = data.get('voice', 'en-US-JennyNeural')
-        pitch = data.get('pitch', 0)
-        rate = data.get('rate', 0)
-        gap = data.get('gap', 0)
-        
-        if not text:
-            return jsonify({'error': 'No text provided'}), 400
+        data = request.get_json(silent=True)
+        try:
+            text, voice, pitch, rate, gap = parse_tts_request(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        mode = data.get('transliterate')
+        if request_log is not None:
+            request_log.record(text, voice, pitch, rate, gap, mode)
+        stream = bool(data.get('stream')) or request.args.get('stream') == '1'
         
-        if len(text) > 1000:
-            return jsonify({'error': 'Text too long (max 1000 chars)'}), 400
+        # Optional Roman Urdu → Urdu stage ("transliterate": true or "auto", else TRANSLITERATE_DEFAULT)
+        text, preprocess_seconds = preprocess_text(text, voice, mode)
         
         # Log request
         logger.info(f"🔊 TTS Request - Voice: {voice}, Pitch: {pitch}, Rate: {rate}, Gap: {gap}")
-        logger.info(f"📝 Text: {text[:50]}...")
+        logger.info(f"📝 Text: {text[:50]}... (preprocess {preprocess_seconds * 1000:.1f} ms)")
         
-        # Generate audio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        audio_data = loop.run_until_complete(
-            generate_edge_tts(text, voice, pitch, rate, gap)
+        # Serve repeated requests from cache
+        key = cache_key(text, voice, pitch, rate, gap)
+        audio_data = audio_cache.get(key)
+        if audio_data is not None:
+            logger.info(f"⚡ Cache hit: {key[:12]}")
+            return Response(
+                audio_data,
+                mimetype=audio_type(audio_data)[0],
+                headers=audio_headers(
+                    audio_data, 'HIT', **{'Server-Timing': server_timing(preprocess=preprocess_seconds)}
+                )
+            )
+        
+        if stream:
+            return stream_tts_response(text, voice, pitch, rate, gap, key,
+                                       server_timing(preprocess=preprocess_seconds))
+        
+        # Generate audio on the worker's long-lived event loop
+        route = {}
+        synth_start = time.perf_counter()
+        audio_data = background_loop.run(
+            synthesize_text(text, voice, pitch, rate, gap, route)
         )
-        loop.close()
+        synth_seconds = time.perf_counter() - synth_start
         
         if not audio_data:
             return jsonify({'error': 'Failed to generate audio'}), 500
         
+        # A stand-in voice must not stay cached once Edge is back
+        if not route.get('fallback'):
+            audio_cache.put(key, audio_data)
+        
         return Response(
             audio_data,
-            mimetype='audio/mpeg',
-            headers={
-                'Access-Control-Allow-Origin': '*',
-                'Content-Disposition': 'attachment; filename=speech.mp3'
-            }
+            mimetype=audio_type(audio_data)[0],
+            headers=audio_headers(audio_data, 'MISS', **route_headers(route), **{
+                'Server-Timing': server_timing(preprocess=preprocess_seconds, synth=synth_seconds)
+            })
         )
         
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/voices')
-def list_voices():
-    """List all available voices with gender info"""
-    return jsonify({
+def parse_batch_request(data):
+    """Validate a /tts/batch body; returns ([(params, error), ...], parallelism)"""
+    if not isinstance(data, dict) or not isinstance(data.get('items'), list):
+        raise ValueError('Expected {"items": [...]}')
+    
+    raw_items = data['items']
+    if not raw_items:
+        raise ValueError('No items provided')
+    if len(raw_items) > BATCH_MAX_ITEMS:
+        raise ValueError(f'Too many items (max {BATCH_MAX_ITEMS})')
+    
+    try:
+        parallelism = int(data.get('parallelism', 4))
+    except (TypeError, ValueError):
+        raise ValueError('parallelism must be an integer')
+    parallelism = max(1, min(parallelism, BATCH_MAX_PARALLELISM))
+    
+    # Bad items are reported in the manifest instead of failing the batch
+    items = []
+    for item in raw_items:
+        try:
+            text, voice, pitch, rate, gap = parse_tts_request(item)
+            text, _ = preprocess_text(text, voice, item.get('transliterate'))
+            params = {'text': text, 'voice': voice, 'pitch': pitch, 'rate': rate, 'gap': gap}
+            items.append((params, None))
+        except ValueError as e:
+            items.append((None, str(e)))
+    
+    return items, parallelism
+
+@app.route('/tts/batch', methods=['POST'])
+@rate_limit(max_requests_per_hour=10)
+def tts_batch():
+    """Synthesize many items; streams a zip with one MP3 per item plus manifest.json"""
+    try:
+        items, parallelism = parse_batch_request(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    logger.info(f"📦 Batch Request - Items: {len(items)}, Parallelism: {parallelism}")
+    
+    chunks = stream_batch_zip(items, synthesize_cached, parallelism)
+    return Response(
+        background_loop.iterate(chunks),
+        mimetype='application/zip',
+        headers={
+            'Access-Control-Allow-Origin': '*',
+            'Content-Disposition': 'attachment; filename=speech-batch.zip',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+def run_job(params):
+    """Job worker entry point: synthesize on the background loop"""
+    return background_loop.run(synthesize_cached(**params))
+
+job_workers = JobWorkers(job_queue, run_job, workers=int(os.environ.get('JOB_WORKERS', 2)))
+
+def job_payload(job):
+    """Public view of a job row"""
+    payload = {
+        'id': job['id'],
+        'status': job['status'],
+        'attempts': job['attempts'],
+        'created': datetime.fromtimestamp(job['created']).isoformat(),
+        'updated': datetime.fromtimestamp(job['updated']).isoformat(),
+        'status_url': f"/jobs/{job['id']}"
+    }
+    if job['error']:
+        payload['error'] = job['error']
+    if job['status'] == 'done':
+        payload['result_url'] = f"/jobs/{job['id']}?download=1"
+        payload['expires'] = datetime.fromtimestamp(job['expires_at']).isoformat()
+    return payload
+
+@app.route('/jobs', methods=['POST'])
+@rate_limit(max_requests_per_hour=10)
+def create_job():
+    """Queue a synthesis job; returns 202 with the job id"""
+    data = request.get_json(silent=True)
+    try:
+        text, voice, pitch, rate, gap = parse_tts_request(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    text, _ = preprocess_text(text, voice, data.get('transliterate'))
+    
+    params = {'text': text, 'voice': voice, 'pitch': pitch, 'rate': rate, 'gap': gap}
+    job_id, deduplicated = job_queue.enqueue(params, cache_key(text, voice, pitch, rate, gap))
+    job_workers.start()
+    job_workers.notify()
+    logger.info(f"📥 Job {job_id[:8]} queued (deduplicated: {deduplicated})")
+    
+    payload = job_payload(job_queue.get(job_id))
+    payload['deduplicated'] = deduplicated
+    response = jsonify(payload)
+    response.status_code = 202
+    response.headers['Location'] = payload['status_url']
+    return response
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    """Job status as JSON, or the audio itself with ?download=1 once done"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if request.args.get('download') == '1':
+        if job['status'] != 'done':
+            return jsonify(job_payload(job)), 409
+        try:
+            with open(job['result_path'], 'rb') as f:
+                audio_data = f.read()
+        except OSError:
+            return jsonify({'error': 'Result expired'}), 410
+        mimetype, extension = audio_type(audio_data)
+        return Response(
+            audio_data,
+            mimetype=mimetype,
+            headers={
+                'Access-Control-Allow-Origin': '*',
+                'Content-Disposition': f'attachment; filename=speech-{job_id[:8]}.{extension}'
+            }
+        )
+    
+    return jsonify(job_payload(job))
+
+def warm_event_loop():
+    background_loop.loop
+    return {}
+
+def warm_piper_voices():
+    """Load each in-process Piper voice and synthesize once"""
+    from piper_engine import piper_engine
+    timings = {}
+    for voice in PIPER_WARM_VOICES:
+        start = time.perf_counter()
+        piper_engine.synthesize(WARMUP_TEXT, voice)
+        timings[voice] = round(time.perf_counter() - start, 3)
+        logger.info(f"🔥 Warmed Piper voice {voice} in {timings[voice] * 1000:.0f} ms")
+    return {'warmup_seconds': timings}
+
+# Pending until start_background() runs them in the serving process
+readiness.add('event_loop')
+if PIPER_WARM_VOICES:
+    readiness.add('piper')
+
+def warmup_target(item):
+    """(text, voice, pitch, rate, gap) exactly as /tts would synthesize the item"""
+    text, _ = preprocess_text(item['text'], item['voice'], item.get('transliterate'))
+    return text, item['voice'], int(item['pitch']), int(item['rate']), int(item['gap'])
+
+def is_warm(item):
+    return cache_key(*warmup_target(item)) in audio_cache
+
+def warm(item):
+    background_loop.run(synthesize_cached(*warmup_target(item)))
+
+# Cache pre-warming from WARMUP_PHRASES and the most frequent logged requests,
+# at startup and every WARMUP_INTERVAL seconds, WARMUP_RATE syntheses/second
+cache_warmer = Warmer(
+    warm,
+    is_warm,
+    phrases_path=os.environ.get('WARMUP_PHRASES') or None,
+    request_log=request_log,
+    top_n=int(os.environ.get('WARMUP_TOP_N', 50)),
+    window_seconds=float(os.environ.get('WARMUP_WINDOW_HOURS', 168)) * 3600,
+    rate=float(os.environ.get('WARMUP_RATE', 0.5)),
+    interval=float(os.environ.get('WARMUP_INTERVAL', 0)),
+    on_start=os.environ.get('WARMUP_ON_START', '1') == '1',
+    start_delay=float(os.environ.get('WARMUP_START_DELAY', 5)),
+    default_voice=os.environ.get('WARMUP_VOICE', 'en-US-JennyNeural'),
+    busy=lambda: inflight.stats()['in_flight'] > 0,
+    lock_path=os.path.join('cache', 'warmup.lock')
+)
+
+background_lock = threading.Lock()
+background_pid = None
+
+def start_background():
+    """Start job workers, warm-ups and the cache warmer once per serving process
+
+    Called from gunicorn's post_fork hook, the ASGI lifespan startup and
+    __main__, so importing app (tests, benchmarks) starts no threads.
+    """
+    global background_pid
+    with background_lock:
+        if background_pid == os.getpid():
+            return
+        background_pid = os.getpid()
+    job_workers.start()
+    readiness.run('event_loop', warm_event_loop)
+    if PIPER_WARM_VOICES:
+        readiness.run('piper', warm_piper_voices)
+    cache_warmer.start()
+
+def ready_payload():
+    """Readiness checks, plus a live probe of the Piper pool when PIPER_URL is set"""
+    payload = readiness.payload()
+    if PIPER_URL:
+        # The Piper pool reports ready only while at least one worker is warm
+        try:
+            with urllib.request.urlopen(f"{PIPER_URL}/ready", timeout=1) as response:
+                upstream = response.status == 200
+        except Exception:
+            upstream = False
+        payload['checks']['piper_upstream'] = {'status': 'ready' if upstream else 'failed', 'url': PIPER_URL}
+        payload['ready'] = payload['ready'] and upstream
+    return payload
+
+def voices_payload():
+    """Voice list shared by the Flask and ASGI /voices routes"""
+    return {
         'voices': [
             {
                 'id': voice_id,
@@ -562,19 +1101,55 @@ def list_voices():
                 'language': data['lang']
             }
             for voice_id, data in VOICES.items()
+        ],
+        # Installed Piper voices, answered from the voice manifest in memory
+        'piper': [
+            {
+                'id': voice_id,
+                'name': voice_manager.available_voices.get(voice_id, {}).get('description', voice_id),
+                'gender': voice_manager.available_voices.get(voice_id, {}).get('gender', '').lower() or None,
+                'language': entry['language'],
+                'sample_rate': entry['sample_rate'],
+                'size': entry['size']
+            }
+            for voice_id, entry in sorted(voice_manager.catalog().items())
+            if entry['complete']
         ]
-    })
+    }
 
-@app.route('/health')
-def health():
-    """Health check endpoint"""
-    return jsonify({
+def health_payload():
+    """Health details shared by the Flask and ASGI /health routes"""
+    return {
         'status': 'healthy',
         'service': 'Edge TTS Pro',
         'voices': len(VOICES),
         'rate_limit': '10 requests/hour',
-        'delay': '20-30 seconds'
-    })
+        'delay': '20-30 seconds' if RATE_LIMIT_MODE == 'delay' else f'{int(RATE_LIMIT_COOLDOWN)} second cooldown (429 + Retry-After)',
+        'cache': audio_cache.stats(),
+        'preprocess': preprocess_stats(),
+        'engines': engine_router.stats(),
+        'upstream': edge_caller.stats(),
+        'singleflight': inflight.stats(),
+        'sentences': sentence_cache.stats(),
+        'warmup': cache_warmer.stats(),
+        'jobs': job_queue.stats()
+    }
+
+@app.route('/voices')
+def list_voices():
+    """List all available voices with gender info"""
+    return jsonify(voices_payload())
+
+@app.route('/health')
+def health():
+    """Health check endpoint"""
+    return jsonify(health_payload())
+
+@app.route('/ready')
+def ready():
+    """Readiness probe: 200 once warmed up, 503 until then"""
+    payload = ready_payload()
+    return jsonify(payload), 200 if payload['ready'] else 503
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
@@ -585,9 +1160,15 @@ if __name__ == '__main__':
     print(f"✅ Male Voices: {sum(1 for v in VOICES.values() if v['gender'] == 'male')}")
     print(f"✅ Female Voices: {sum(1 for v in VOICES.values() if v['gender'] == 'female')}")
     print(f"✅ Rate Limit: 10 requests/hour")
-    print(f"✅ Delay: 20-30 seconds per request")
+    if RATE_LIMIT_MODE == 'delay':
+        print(f"✅ Delay: 20-30 seconds per request")
+    else:
+        print(f"✅ Cooldown: {int(RATE_LIMIT_COOLDOWN)} seconds between requests (no sleeping)")
     print("-"*60)
     print(f"🌐 Port: {port}")
     print("="*60)
     
+    # The debug reloader's parent process only watches files
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background()
     app.run(host='0.0.0.0', port=port, debug=True)
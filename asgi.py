@@ -0,0 +1,291 @@
+"""
+ASGI serving mode: /tts, /tts/batch, /voices and /health as native coroutines
+
+Run with:  uvicorn asgi:app --host 0.0.0.0 --port $PORT --workers 2
+Every other path (the home page, static files, ...) is handed to the
+Flask app through asgiref's WSGI adapter, so existing routes keep working.
+Blocking work (SQLite rate limits, disk cache reads and writes, the request
+log) runs in the default thread pool so it never stalls other streams.
+"""
+import asyncio
+import json
+import logging
+import random
+import time
+
+from asgiref.wsgi import WsgiToAsgi
+
+import app as flask_module
+from app import (
+    RATE_LIMIT_MODE,
+    audio_cache,
+    cache_key,
+    check_rate_limit,
+    health_payload,
+    route_headers,
+    parse_batch_request,
+    parse_tts_request,
+    server_timing,
+    stream_text,
+    synthesize_cached,
+    synthesize_text,
+    voices_payload,
+)
+from batch import stream_batch_zip
+from engines import audio_type
+from preprocess import preprocess_text
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 2 * 1024 * 1024
+
+wsgi_fallback = WsgiToAsgi(flask_module.app)
+
+
+def audio_headers(audio_data):
+    """Content headers for MP3 from Edge or WAV from Piper"""
+    mimetype, extension = audio_type(audio_data)
+    return [
+        (b'content-type', mimetype.encode()),
+        (b'access-control-allow-origin', b'*'),
+        (b'content-disposition', f'attachment; filename=speech.{extension}'.encode()),
+    ]
+
+
+def encode_headers(headers):
+    return [(name.lower().encode(), str(value).encode()) for name, value in headers.items()]
+
+
+async def send_json(send, payload, status=200, headers=()):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            *headers,
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_audio(send, audio_data, cache_status, timing='', route=None):
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': audio_headers(audio_data) + [
+            (b'content-length', str(len(audio_data)).encode()),
+            (b'x-cache', cache_status),
+            (b'server-timing', timing.encode()),
+            *(encode_headers(route_headers(route)) if route else ()),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': audio_data})
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        body += message.get('body', b'')
+        if len(body) > MAX_BODY_BYTES:
+            raise ValueError('Request body too large')
+        if not message.get('more_body'):
+            return body
+
+
+async def stream_audio(send, text, voice, pitch, rate, gap, key, timing=''):
+    """Forward chunks as they arrive; same error contract as the Flask stream"""
+    route = {}
+    chunks = stream_text(text, voice, pitch, rate, gap, route)
+    try:
+        try:
+            first = await chunks.__anext__()
+        except StopAsyncIteration:
+            await send_json(send, {'error': 'Failed to generate audio'}, 500)
+            return
+        except Exception as e:
+            logger.error(f"Error: {str(e)}")
+            await send_json(send, {'error': str(e)}, 500)
+            return
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': audio_headers(first) + [
+                (b'x-accel-buffering', b'no'),
+                (b'x-cache', b'MISS'),
+                *encode_headers(route_headers(route)),
+                (b'server-timing', timing.encode()),
+            ],
+        })
+        cached = [first]
+        cached_size = len(first)
+        await send({'type': 'http.response.body', 'body': first, 'more_body': True})
+        try:
+            async for chunk in chunks:
+                if cached is not None:
+                    cached.append(chunk)
+                    cached_size += len(chunk)
+                    if cached_size > audio_cache.max_item_bytes:
+                        cached = None
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        except Exception as e:
+            # Headers are out: drop the connection so the client sees a truncated body
+            logger.error(f"Stream error after {cached_size} bytes: {str(e)}")
+            raise
+        await send({'type': 'http.response.body', 'body': b''})
+        if cached is not None and not route.get('fallback'):
+            await asyncio.to_thread(audio_cache.put, key, b''.join(cached))
+    finally:
+        await chunks.aclose()
+
+
+async def admit(scope, send):
+    """Method check plus rate limiting; returns False once a response was sent"""
+    if scope['method'] != 'POST':
+        await send_json(send, {'error': 'Method not allowed'}, 405, [(b'allow', b'POST')])
+        return False
+
+    client_ip = (scope.get('client') or ('unknown',))[0]
+    limited = await asyncio.to_thread(check_rate_limit, client_ip, max_requests_per_hour=10)
+    if limited is not None:
+        body, retry_after = limited
+        await send_json(send, body, 429, [(b'retry-after', str(retry_after).encode())])
+        return False
+
+    if RATE_LIMIT_MODE == 'delay':
+        # Legacy delay, but only this coroutine waits - not the whole process
+        await asyncio.sleep(random.randint(20, 30))
+    return True
+
+
+async def tts(scope, receive, send):
+    if not await admit(scope, send):
+        return
+
+    try:
+        raw = await read_body(receive)
+        if raw is None:
+            return
+        data = json.loads(raw or b'null')
+        text, voice, pitch, rate, gap = parse_tts_request(data)
+    except ValueError as e:
+        await send_json(send, {'error': str(e)}, 400)
+        return
+    mode = data.get('transliterate')
+    if flask_module.request_log is not None:
+        await asyncio.to_thread(flask_module.request_log.record, text, voice, pitch, rate, gap, mode)
+
+    query = scope.get('query_string', b'').decode('latin-1')
+    stream = bool(data.get('stream')) or 'stream=1' in query.split('&')
+
+    text, preprocess_seconds = preprocess_text(text, voice, mode)
+
+    logger.info(f"🔊 TTS Request (async) - Voice: {voice}, Pitch: {pitch}, Rate: {rate}, Gap: {gap}")
+
+    key = cache_key(text, voice, pitch, rate, gap)
+    audio_data = await asyncio.to_thread(audio_cache.get, key)
+    if audio_data is not None:
+        await send_audio(send, audio_data, b'HIT', server_timing(preprocess=preprocess_seconds))
+        return
+
+    if stream:
+        await stream_audio(send, text, voice, pitch, rate, gap, key, server_timing(preprocess=preprocess_seconds))
+        return
+
+    try:
+        synth_start = time.perf_counter()
+        route = {}
+        audio_data = await synthesize_text(text, voice, pitch, rate, gap, route)
+        synth_seconds = time.perf_counter() - synth_start
+        if not audio_data:
+            await send_json(send, {'error': 'Failed to generate audio'}, 500)
+            return
+        await send_audio(send, audio_data, b'MISS',
+                         server_timing(preprocess=preprocess_seconds, synth=synth_seconds),
+                         route)
+        if not route.get('fallback'):
+            await asyncio.to_thread(audio_cache.put, key, audio_data)
+    except Exception as e:
+        logger.error(f"Error: {str(e)}")
+        await send_json(send, {'error': str(e)}, 500)
+
+
+async def tts_batch(scope, receive, send):
+    if not await admit(scope, send):
+        return
+
+    try:
+        raw = await read_body(receive)
+        if raw is None:
+            return
+        items, parallelism = parse_batch_request(json.loads(raw or b'null'))
+    except ValueError as e:
+        await send_json(send, {'error': str(e)}, 400)
+        return
+
+    logger.info(f"📦 Batch Request (async) - Items: {len(items)}, Parallelism: {parallelism}")
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'application/zip'),
+            (b'access-control-allow-origin', b'*'),
+            (b'content-disposition', b'attachment; filename=speech-batch.zip'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    chunks = stream_batch_zip(items, synthesize_cached, parallelism)
+    try:
+        async for chunk in chunks:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    finally:
+        await chunks.aclose()
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def voices(scope, receive, send):
+    await send_json(send, await asyncio.to_thread(voices_payload))
+
+
+async def health(scope, receive, send):
+    payload = await asyncio.to_thread(health_payload)
+    payload['server'] = 'asgi'
+    await send_json(send, payload)
+
+
+ROUTES = {
+    '/tts': tts,
+    '/tts/batch': tts_batch,
+    '/voices': voices,
+    '/health': health,
+}
+
+
+async def lifespan(scope, receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            flask_module.start_background()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await flask_module.engine_router.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        await lifespan(scope, receive, send)
+        return
+    handler = ROUTES.get(scope['path']) if scope['type'] == 'http' else None
+    if handler is None:
+        await wsgi_fallback(scope, receive, send)
+        return
+    await handler(scope, receive, send)
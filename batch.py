@@ -0,0 +1,108 @@
+"""
+Batch synthesis: many items, bounded parallelism, results streamed as a zip
+"""
+import asyncio
+import json
+import time
+import zipfile
+
+from engines import audio_type
+
+
+class _Sink:
+    """Write-only file object; zipfile treats it as unseekable and emits data descriptors"""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+class ZipStream:
+    """Build a zip archive incrementally; each call returns the bytes ready to send"""
+
+    def __init__(self):
+        self._sink = _Sink()
+        self._zip = zipfile.ZipFile(self._sink, mode='w', compression=zipfile.ZIP_STORED)
+
+    def add(self, name, data):
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        # MP3 is already compressed; only the manifest is worth deflating
+        info.compress_type = zipfile.ZIP_DEFLATED if name.endswith('.json') else zipfile.ZIP_STORED
+        self._zip.writestr(info, data)
+        return self._sink.take()
+
+    def close(self):
+        self._zip.close()
+        return self._sink.take()
+
+
+async def iter_completed(items, synthesize, parallelism):
+    """
+    Run synthesize(**params) for each (index, params) pair, at most
+    `parallelism` at once, yielding (index, audio, error) in completion order.
+    """
+    semaphore = asyncio.Semaphore(parallelism)
+
+    async def run(index, params):
+        async with semaphore:
+            try:
+                return index, await synthesize(**params), None
+            except Exception as e:
+                return index, None, str(e) or e.__class__.__name__
+
+    tasks = [asyncio.ensure_future(run(index, params)) for index, params in items]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def stream_batch_zip(items, synthesize, parallelism=4):
+    """
+    Zip bytes for a batch. `items` is a list of (params, error) in request
+    order; items that failed validation carry an error and are not synthesized.
+    Audio entries are emitted as soon as each item finishes, and a final
+    manifest.json records every item's status.
+    """
+    archive = ZipStream()
+    manifest = [None] * len(items)
+    runnable = []
+    for index, (params, error) in enumerate(items):
+        if error is not None:
+            manifest[index] = {'index': index, 'status': 'error', 'error': error}
+        else:
+            runnable.append((index, params))
+
+    started = time.time()
+    async for index, audio, error in iter_completed(runnable, synthesize, parallelism):
+        if error is None and not audio:
+            error = 'Failed to generate audio'
+        if error is not None:
+            manifest[index] = {'index': index, 'status': 'error', 'error': error}
+            continue
+        name = f"{index:04d}.{audio_type(audio)[1]}"
+        manifest[index] = {'index': index, 'status': 'ok', 'file': name, 'bytes': len(audio)}
+        yield archive.add(name, audio)
+
+    summary = {
+        'items': manifest,
+        'succeeded': sum(1 for entry in manifest if entry['status'] == 'ok'),
+        'failed': sum(1 for entry in manifest if entry['status'] == 'error'),
+        'elapsed_seconds': round(time.time() - started, 3),
+    }
+    yield archive.add('manifest.json', json.dumps(summary, ensure_ascii=False, indent=2).encode('utf-8'))
+    yield archive.close()
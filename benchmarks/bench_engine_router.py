@@ -0,0 +1,115 @@
+"""
+Engine routing under a healthy, failing, slow and recovering remote engine
+
+A stand-in for Edge TTS answers after a configurable delay or fails; the
+local engine is the real in-process Piper engine with the installed voices.
+Each phase sends --requests sequential requests for an Edge voice, once
+through Edge alone and once through EngineRouter, and reports latency,
+errors and which engine served them.
+
+Run from anywhere; --voices-dir must be a directory named "voices" (the
+voice manager resolves voices/ relative to the working directory).
+
+Usage: python benchmarks/bench_engine_router.py [--voices-dir voices] [--requests 40]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TEXT = "Routing keeps speech flowing when the remote engine does not."
+VOICE = 'en-US-GuyNeural'
+EDGE_VOICES = {VOICE: {'lang': 'en-US', 'gender': 'male'}}
+
+
+class StandInEdge:
+    """Remote engine whose latency and availability the benchmark controls"""
+
+    def __init__(self):
+        self.delay = 0.15
+        self.down = False
+
+    async def stream(self, text, voice, pitch, rate, gap, info=None):
+        await asyncio.sleep(0.02 if self.down else self.delay)
+        if self.down:
+            raise ConnectionError("stand-in Edge is down")
+        yield b'ID3' + b'\0' * 4096
+
+
+async def run_phase(stream, requests):
+    latencies, errors, served = [], 0, Counter()
+    for _ in range(requests):
+        route = {'engine': 'edge'}
+        start = time.perf_counter()
+        try:
+            async for _ in stream(TEXT, VOICE, 0, 0, 0, route):
+                pass
+        except Exception:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+        served[route['engine']] += 1
+    return latencies, errors, served
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--voices-dir', default=os.path.join(ROOT, 'voices'))
+    parser.add_argument('--requests', type=int, default=40)
+    args = parser.parse_args()
+
+    voices_dir = os.path.abspath(args.voices_dir)
+    if os.path.basename(voices_dir) != 'voices':
+        parser.error("--voices-dir must be named 'voices'")
+    os.chdir(os.path.dirname(voices_dir))
+
+    from engines import EdgeEngine, EngineRouter, LocalPiperEngine
+
+    edge = StandInEdge()
+    router = EngineRouter(
+        [EdgeEngine(edge.stream), LocalPiperEngine()],
+        edge_voices=EDGE_VOICES, slow_seconds=1.0, probe_every=10, cooldown=2.0
+    )
+    stand_in = router.fallback_voice(VOICE)
+    if stand_in is None:
+        print(f"No English Piper voice in {voices_dir}")
+        return
+    print(f"local stand-in for {VOICE}: {stand_in}")
+
+    async def edge_only(text, voice, pitch, rate, gap, route):
+        async for chunk in edge.stream(text, voice, pitch, rate, gap):
+            yield chunk
+
+    phases = [
+        ('healthy (150 ms)', dict(delay=0.15, down=False)),
+        ('down', dict(down=True)),
+        ('slow (1.5 s)', dict(delay=1.5, down=False)),
+        ('recovered (150 ms)', dict(delay=0.15, down=False)),
+    ]
+    print(f"{'phase':20} {'mode':8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}  served by")
+    for label, settings in phases:
+        for mode, stream in (('edge', edge_only), ('router', router.stream)):
+            edge.__dict__.update(settings)
+            requests = args.requests if 'slow' not in label or mode == 'router' else max(4, args.requests // 8)
+            latencies, errors, served = asyncio.run(run_phase(stream, requests))
+            if latencies:
+                p50 = statistics.median(latencies) * 1000
+                p95 = sorted(latencies)[int(0.95 * (len(latencies) - 1))] * 1000
+            else:
+                p50 = p95 = float('nan')
+            share = ', '.join(f"{name} {count}" for name, count in served.most_common())
+            print(f"{label:20} {mode:8} {p50:8.0f} {p95:8.0f} {errors:>4}/{requests:<3} {share}")
+        # Let an open circuit's cooldown lapse between phases
+        time.sleep(router.engine_stats['edge'].cooldown)
+
+    print(f"\nrouter stats: {router.stats()}")
+
+
+if __name__ == "__main__":
+    main()
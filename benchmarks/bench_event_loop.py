@@ -0,0 +1,57 @@
+"""
+Per-request overhead: a new event loop per request vs the shared background loop
+
+Usage: python benchmarks/bench_event_loop.py [--requests 2000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_runtime import BackgroundLoop
+
+
+async def fake_synthesis():
+    # A few scheduling hops, like a short edge_tts stream
+    for _ in range(5):
+        await asyncio.sleep(0)
+    return b'\xff\xf3' * 64
+
+
+def per_request_loop():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(fake_synthesis())
+    finally:
+        loop.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        per_request_loop()
+    fresh = (time.perf_counter() - start) / args.requests
+
+    background = BackgroundLoop()
+    background.run(fake_synthesis())  # thread start is a one-off cost
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        background.run(fake_synthesis())
+    shared = (time.perf_counter() - start) / args.requests
+    background.stop()
+
+    print(f"new_event_loop per request : {fresh * 1e6:8.1f} µs/request")
+    print(f"shared background loop     : {shared * 1e6:8.1f} µs/request")
+    print(f"speedup                    : {fresh / shared:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
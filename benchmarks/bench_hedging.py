@@ -0,0 +1,103 @@
+"""
+Tail latency of upstream synthesis with deadlines, retries and hedging
+
+A stand-in upstream answers its first chunk after ~150 ms, but a few
+percent of streams stall for seconds before producing audio (the stuck
+edge_tts streams that set our p99). Runs the same request mix three ways:
+
+  bare       iterate the stream with no deadline (what generate_edge_tts did)
+  deadline   first-chunk deadline plus jittered retries
+  hedged     the same plus a second attempt after the recent p95
+
+and reports latency percentiles, upstream attempts and HedgedCaller's
+counters.
+
+Usage: python benchmarks/bench_hedging.py [--requests 400] [--concurrency 8] [--stall-rate 0.04]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hedging import HedgedCaller
+
+
+class StandInUpstream:
+    def __init__(self, stall_rate, stall_seconds, seed):
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    def factory(self):
+        self.calls += 1
+        stalled = self.random.random() < self.stall_rate
+        first = self.stall_seconds if stalled else self.random.lognormvariate(-1.9, 0.25)
+
+        async def stream():
+            await asyncio.sleep(first)
+            for _ in range(8):
+                yield b'\xff\xfb' + b'\0' * 1024
+                await asyncio.sleep(0.005)
+        return stream()
+
+
+async def bare(factory):
+    return b''.join([chunk async for chunk in factory()])
+
+
+async def run(mode, args):
+    upstream = StandInUpstream(args.stall_rate, args.stall_seconds, seed=1)
+    caller = HedgedCaller(
+        first_chunk_timeout=args.first_chunk_timeout, total_timeout=30.0, retries=2,
+        backoff_base=0.05, hedge=(mode == 'hedged'), hedge_min_samples=20
+    )
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            if mode == 'bare':
+                await bare(upstream.factory)
+            else:
+                await caller.collect(upstream.factory)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    return sorted(latencies), upstream.calls, caller.stats()
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--stall-rate', type=float, default=0.04)
+    parser.add_argument('--stall-seconds', type=float, default=5.0)
+    parser.add_argument('--first-chunk-timeout', type=float, default=1.0)
+    args = parser.parse_args()
+
+    print(f"{args.requests} requests, {args.stall_rate:.0%} stall for {args.stall_seconds:.0f}s, "
+          f"first-chunk deadline {args.first_chunk_timeout:.1f}s")
+    print(f"{'mode':9} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'max ms':>7} {'upstream':>9}  counters")
+    for mode in ('bare', 'deadline', 'hedged'):
+        latencies, calls, stats = asyncio.run(run(mode, args))
+        counters = '' if mode == 'bare' else (
+            f"retries {stats['retries']}, timeouts {stats['first_chunk_timeouts']}, "
+            f"hedges fired/won/wasted {stats['hedges_fired']}/{stats['hedges_won']}/{stats['hedges_wasted']}"
+        )
+        print(f"{mode:9} {statistics.median(latencies) * 1000:7.0f} {percentile(latencies, 0.95):7.0f} "
+              f"{percentile(latencies, 0.99):7.0f} {latencies[-1] * 1000:7.0f} {calls:9}  {counters}")
+
+
+if __name__ == "__main__":
+    main()
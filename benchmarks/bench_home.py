@@ -0,0 +1,67 @@
+"""
+GET / throughput: render_template_string per hit vs the precompiled, cached page
+
+Usage: python benchmarks/bench_home.py [--requests 2000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TTS_CACHE_DISK_MB', '0')
+os.environ.setdefault('RATE_LIMIT_BACKEND', 'memory')
+os.environ.setdefault('JOB_WORKERS', '0')
+
+from flask import Flask, render_template_string
+
+import app as app_module
+
+legacy = Flask('legacy')
+
+
+@legacy.route('/')
+def legacy_home():
+    # What home() did before: parse + compile + render on every request
+    return render_template_string(app_module.HOME_TEMPLATE, voices=app_module.VOICES,
+                                  max_chars=app_module.MAX_TEXT_LENGTH)
+
+
+def measure(client, requests, headers=None):
+    client.get('/', headers=headers)  # warm up
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get('/', headers=headers)
+    elapsed = time.perf_counter() - start
+    return requests / elapsed, response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    rows = []
+    rps, response = measure(legacy.test_client(), args.requests)
+    rows.append(('render_template_string', rps, len(response.data)))
+
+    client = app_module.app.test_client()
+    rps, response = measure(client, args.requests)
+    rows.append(('cached, identity', rps, len(response.data)))
+    rps, response = measure(client, args.requests, {'Accept-Encoding': 'gzip'})
+    rows.append(('cached, gzip', rps, len(response.data)))
+    if app_module.brotli is not None:
+        rps, response = measure(client, args.requests, {'Accept-Encoding': 'br'})
+        rows.append(('cached, br', rps, len(response.data)))
+    etag = response.headers['ETag']
+    rps, response = measure(client, args.requests, {'Accept-Encoding': response.headers.get('Content-Encoding', ''),
+                                                    'If-None-Match': etag})
+    rows.append(('cached, 304 revalidate', rps, len(response.data)))
+
+    print(f"{'mode':28} {'req/s':>10} {'bytes':>8}")
+    for name, rps, size in rows:
+        print(f"{name:28} {rps:10.0f} {size:8}")
+
+
+if __name__ == "__main__":
+    main()
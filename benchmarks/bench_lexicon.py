@@ -0,0 +1,156 @@
+"""
+Large Roman Urdu lexicon: RSS and lookup throughput, Python dict vs mmap Lexicon
+
+Generates a synthetic lexicon (default 200k entries, ~10% multi-word
+phrases), compiles it, then measures each loader in a fresh subprocess so
+RSS numbers are not polluted by the other. Lookups are timed for uniformly
+drawn words (worst case for the Lexicon's LRU) and for Zipf-distributed
+words, which is closer to running text.
+
+Usage: python benchmarks/bench_lexicon.py [--entries 200000]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SYLLABLES = ['ka', 'ki', 'ma', 'na', 'ra', 'sa', 'ta', 'ja', 'da', 'la', 'ba', 'pa',
+             'kh', 'sh', 'gh', 'ch', 'aa', 'ee', 'oo', 'ai', 'an', 'in', 'ar', 'al']
+URDU = 'ابپتٹثجچحخدڈذرڑزژسشصضطظعغفقکگلمنوہیے'
+
+
+def rss():
+    """Resident memory split into anonymous (private) and file-backed (shareable) pages, in MB"""
+    fields = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('VmRSS', 'RssAnon', 'RssFile'):
+                fields[key] = int(value.split()[0]) / 1024
+    return fields
+
+
+def generate(path, entries, seed=11):
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < entries:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 5))))
+    words = sorted(words)
+    with open(path, 'w', encoding='utf-8') as f:
+        for i, word in enumerate(words):
+            if i % 10 == 0:
+                word = f"{word} {rng.choice(words)}"
+            urdu = ''.join(rng.choice(URDU) for _ in range(rng.randint(3, 8)))
+            f.write(f"{word}\t{urdu}\n")
+    return words
+
+
+def measure(mode, tsv_path, lex_path, probes_path):
+    """Runs inside a child process; prints one JSON line"""
+    with open(probes_path, encoding='utf-8') as f:
+        probes = f.read().split('\n')
+    with open(zipf_path(probes_path), encoding='utf-8') as f:
+        zipf_probes = f.read().split('\n')
+    baseline = rss()
+    start = time.perf_counter()
+    if mode == 'dict':
+        table = {}
+        with open(tsv_path, encoding='utf-8') as f:
+            for line in f:
+                roman, urdu = line.rstrip('\n').split('\t', 1)
+                table[roman] = urdu
+        get = table.get
+    else:
+        from roman_lexicon import Lexicon
+        table = Lexicon(lex_path)
+        get = table.get
+    load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    hits = sum(get(word) is not None for word in probes)
+    lookup = time.perf_counter() - start
+    start = time.perf_counter()
+    for word in zipf_probes:
+        get(word)
+    zipf_lookup = time.perf_counter() - start
+
+    after = rss()
+    result = {
+        'load_s': load,
+        'lookups_per_s': len(probes) / lookup,
+        'zipf_lookups_per_s': len(zipf_probes) / zipf_lookup,
+        'hits': hits,
+        'rss_mb': after['VmRSS'] - baseline['VmRSS'],
+        'anon_mb': after['RssAnon'] - baseline['RssAnon'],
+        'file_mb': after['RssFile'] - baseline['RssFile'],
+    }
+
+    if mode == 'mmap':
+        import roman_urdu
+        roman_urdu.load_lexicon(lex_path)
+        corpus = ' '.join(probes[:50000])
+        start = time.perf_counter()
+        roman_urdu.roman_urdu_to_urdu_text(corpus)
+        result['transliterate_mb_per_s'] = len(corpus.encode('utf-8')) / (1024 * 1024) / (time.perf_counter() - start)
+    print(json.dumps(result))
+
+
+def zipf_path(probes_path):
+    return probes_path.replace('.txt', '-zipf.txt')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=200000)
+    parser.add_argument('--measure', nargs=4, metavar=('MODE', 'TSV', 'LEX', 'PROBES'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    from roman_lexicon import compile_lexicon
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tsv_path = os.path.join(tmp, 'lexicon.tsv')
+        lex_path = os.path.join(tmp, 'lexicon.lex')
+        probes_path = os.path.join(tmp, 'probes.txt')
+
+        words = generate(tsv_path, args.entries)
+        start = time.perf_counter()
+        count = compile_lexicon(tsv_path, lex_path)
+        build = time.perf_counter() - start
+        rng = random.Random(3)
+        probes = [rng.choice(words) for _ in range(200000)]
+        with open(probes_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(probes))
+        ranked = rng.sample(words, len(words))
+        weights = [1 / (rank + 1) for rank in range(len(ranked))]
+        with open(zipf_path(probes_path), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(rng.choices(ranked, weights, k=200000)))
+
+        print(f"{count:,} entries  tsv {os.path.getsize(tsv_path) / 1e6:.1f} MB  "
+              f"compiled {os.path.getsize(lex_path) / 1e6:.1f} MB in {build:.2f} s")
+        print(f"{'loader':8} {'load s':>8} {'uniform/s':>12} {'zipf/s':>12} {'RSS MB':>8} {'anon MB':>8} {'file MB':>8}")
+        for mode in ('dict', 'mmap'):
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--measure', mode, tsv_path, lex_path, probes_path],
+                capture_output=True, text=True, check=True, cwd=ROOT
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(f"{mode:8} {r['load_s']:8.3f} {r['lookups_per_s']:12,.0f} {r['zipf_lookups_per_s']:12,.0f} "
+                  f"{r['rss_mb']:8.1f} {r['anon_mb']:8.1f} {r['file_mb']:8.1f}")
+            if 'transliterate_mb_per_s' in r:
+                print(f"{'':8} transliteration with lexicon: {r['transliterate_mb_per_s']:.2f} MB/s")
+        print("anon = private to each worker; file = page cache shared by all workers mapping the lexicon")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Per-worker and total memory for N worker processes x M Piper voices
+
+Each worker process loads every voice through PiperEngine, once with
+private copies (PiperVoice.load) and once through the memory-mapped
+ModelStore, synthesizes a sentence per voice, then holds still while the
+parent reads /proc/<pid>/smaps_rollup. Pss splits shared pages fairly
+between the processes mapping them, so the sum of Pss is the real total.
+
+Usage: python benchmarks/bench_model_store.py [--voices-dir voices] [--workers 4]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from model_store import ModelStore
+from piper_engine import PiperEngine
+from voice_manager import VoiceManager
+
+TEXT = "Shared weights, private activations."
+
+
+def smaps(pid):
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('Rss', 'Pss', 'Pss_Anon', 'Pss_File', 'Private_Dirty'):
+                fields[key] = int(value.split()[0]) / 1024
+    return fields
+
+
+def worker(voices_dir, mapped, ready, done):
+    manager = VoiceManager(voices_dir)
+    engine = PiperEngine(manager, memory_budget_mb=1e6, store=ModelStore(manager) if mapped else None)
+    start = time.perf_counter()
+    for name in manager.list_downloaded_voices():
+        engine.synthesize(TEXT, name)
+    ready.put((os.getpid(), time.perf_counter() - start))
+    done.wait()
+
+
+def measure(voices_dir, workers, mapped):
+    context = multiprocessing.get_context('spawn')
+    ready = context.Queue()
+    done = context.Event()
+    processes = [context.Process(target=worker, args=(voices_dir, mapped, ready, done)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    results = [ready.get(timeout=600) for _ in processes]
+    rows = [(pid, load, smaps(pid)) for pid, load in results]
+    done.set()
+    for process in processes:
+        process.join()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--voices-dir', default=os.path.join(ROOT, 'voices'))
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    manager = VoiceManager(args.voices_dir)
+    names = manager.list_downloaded_voices()
+    if not names:
+        print(f"No Piper voices in {args.voices_dir}")
+        return
+    store = ModelStore(manager)
+    for name in names:
+        store.mapped_path(name)
+    model_mb = sum(os.path.getsize(manager.get_voice_path(name)) for name in names) / (1024 * 1024)
+    print(f"{args.workers} workers x {len(names)} voices ({model_mb:.0f} MB of models)")
+
+    for label, mapped in (('private (PiperVoice.load)', False), ('mmap (ModelStore)', True)):
+        rows = measure(args.voices_dir, args.workers, mapped)
+        print(f"\n{label}")
+        print(f"{'pid':>8} {'load+synth s':>12} {'RSS MB':>8} {'PSS MB':>8} {'anon':>8} {'file':>8}")
+        for pid, load, m in rows:
+            print(f"{pid:8} {load:12.2f} {m['Rss']:8.0f} {m['Pss']:8.0f} {m['Pss_Anon']:8.0f} {m['Pss_File']:8.0f}")
+        print(f"{'total':>8} {'':12} {sum(m['Rss'] for _, _, m in rows):8.0f} "
+              f"{sum(m['Pss'] for _, _, m in rows):8.0f}   <- sum of PSS is the real footprint")
+
+
+if __name__ == "__main__":
+    main()
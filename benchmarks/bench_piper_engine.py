@@ -0,0 +1,93 @@
+"""
+Piper latency per voice: cold (load + first synthesis) vs warm (resident session)
+
+For every downloaded voice, measures:
+  subprocess  a fresh interpreter that imports piper, loads the model and
+              synthesizes, i.e. what spawning `python -m piper` per request costs
+  cold        PiperEngine miss: model load plus the first synthesis
+  warm        PiperEngine hit: median and p95 over --repeat synthesises
+
+Then replays a round-robin over the voices with a budget that fits all of
+them and one that fits only half, to show what LRU eviction costs.
+
+Usage: python benchmarks/bench_piper_engine.py [--voices-dir voices] [--repeat 20] [--download]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from piper_engine import PiperEngine
+from voice_manager import VoiceManager
+
+TEXT = "The quick brown fox jumps over the lazy dog. Piper keeps this voice loaded between requests."
+
+SUBPROCESS_SNIPPET = """
+import io, sys, wave
+from piper import PiperVoice
+voice = PiperVoice.load(sys.argv[1])
+with wave.open(io.BytesIO(), 'wb') as wav_file:
+    voice.synthesize_wav(sys.argv[2], wav_file)
+"""
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--voices-dir', default=os.path.join(ROOT, 'voices'))
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--download', action='store_true', help="download every available voice first")
+    args = parser.parse_args()
+
+    manager = VoiceManager(args.voices_dir)
+    if args.download:
+        for name in manager.list_available_voices():
+            manager.download_voice(name, background=False)
+    names = sorted(name for name in manager.list_downloaded_voices() if manager.get_config_path(name))
+    if not names:
+        print(f"No Piper voices with configs in {args.voices_dir}; rerun with --download")
+        return
+
+    engine = PiperEngine(manager, memory_budget_mb=1e6)
+    print(f"{'voice':24} {'model MB':>8} {'subproc ms':>10} {'load ms':>8} {'cold ms':>8} "
+          f"{'warm p50':>9} {'warm p95':>9} {'cold/warm':>9}")
+    for name in names:
+        model_path = manager.get_voice_path(name)
+        subproc = timed(subprocess.run, [sys.executable, '-c', SUBPROCESS_SNIPPET, model_path, TEXT])
+        cold = timed(engine.synthesize, TEXT, name)
+        load = engine.get_voice(name).load_seconds
+        warm = [timed(engine.synthesize, TEXT, name) for _ in range(args.repeat)]
+        p50 = statistics.median(warm)
+        print(f"{name:24} {os.path.getsize(model_path) / 1e6:8.1f} {subproc * 1000:10.0f} {load * 1000:8.0f} "
+              f"{cold * 1000:8.0f} {p50 * 1000:9.1f} {percentile(warm, 0.95) * 1000:9.1f} {cold / p50:8.1f}x")
+
+    total_mb = sum(engine.estimate_cost(manager.get_voice_path(name)) for name in names) / (1024 * 1024)
+    rounds = max(1, args.repeat // 4)
+    print(f"\nround-robin over {len(names)} voices, {rounds} rounds")
+    for label, budget in (('budget fits all', total_mb + 1), ('budget fits half', total_mb / 2)):
+        lru = PiperEngine(manager, memory_budget_mb=budget)
+        for name in names:
+            lru.synthesize(TEXT, name)
+        elapsed = sum(timed(lru.synthesize, TEXT, name) for _ in range(rounds) for name in names)
+        stats = lru.stats()
+        print(f"{label:18} {budget:8.0f} MB  {elapsed / (rounds * len(names)) * 1000:8.1f} ms/request  "
+              f"misses {stats['misses']:3}  evictions {stats['evictions']:3}")
+
+
+if __name__ == "__main__":
+    main()
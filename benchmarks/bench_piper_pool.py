@@ -0,0 +1,67 @@
+"""
+Piper pool throughput: requests/s with 1..N worker processes
+
+Starts a PiperPool for each worker count and fires --requests synthesis
+calls from 2x as many client threads, so every worker always has queued work.
+
+Usage: python benchmarks/bench_piper_pool.py --model voices/en_US-lessac-medium.onnx [--max-workers 4]
+"""
+import argparse
+import os
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from piper_pool import PiperPool
+
+TEXT = "The quick brown fox jumps over the lazy dog."
+
+
+def wait_listening(pool, timeout=60):
+    deadline = time.monotonic() + timeout
+    for worker in pool.workers:
+        while True:
+            try:
+                socket.create_connection((worker.host, worker.port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', required=True)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--base-port', type=int, default=5600)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs")
+    print(f"{'workers':>7} {'req/s':>8} {'speedup':>8}   per-worker served")
+    baseline = None
+    counts = sorted({1, 2, args.max_workers} | set(range(4, args.max_workers + 1, 4)))
+    for workers in (n for n in counts if n <= args.max_workers):
+        pool = PiperPool(args.model, workers=workers, base_port=args.base_port).start()
+        try:
+            wait_listening(pool)
+            for _ in range(workers):
+                pool.synthesize(TEXT)
+            with ThreadPoolExecutor(max_workers=workers * 2) as executor:
+                start = time.perf_counter()
+                list(executor.map(lambda _: pool.synthesize(TEXT), range(args.requests)))
+                elapsed = time.perf_counter() - start
+            rps = args.requests / elapsed
+            baseline = baseline or rps
+            served = [worker['served'] for worker in pool.stats()]
+            print(f"{workers:7} {rps:8.1f} {rps / baseline:7.2f}x   {served}")
+        finally:
+            pool.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Rate limiter microbenchmark - per-request cost as distinct client IPs grow
+
+Usage: python benchmarks/bench_rate_limiter.py [--keys 100000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limiter import MemoryBackend, RateLimiter, SQLiteBackend
+
+
+def ip(n):
+    return f"10.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}"
+
+
+def run(name, limiter, total_keys, checkpoints, sample=5000):
+    print(f"\n{name}")
+    print(f"{'distinct IPs':>14} {'µs/request':>12}")
+    now = time.time()
+    inserted = 0
+    for target in checkpoints:
+        # Grow the key set, then time a sample of hits against existing keys
+        while inserted < target:
+            limiter.hit(ip(inserted), now=now)
+            inserted += 1
+        start = time.perf_counter()
+        for i in range(sample):
+            limiter.hit(ip((i * 7919) % inserted), now=now)
+        elapsed = time.perf_counter() - start
+        print(f"{inserted:>14,} {elapsed / sample * 1e6:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--keys', type=int, default=100000)
+    args = parser.parse_args()
+
+    checkpoints = [k for k in (1000, 10000, 100000, 1000000) if k < args.keys] + [args.keys]
+
+    run("MemoryBackend", RateLimiter(MemoryBackend(), cooldown=25), args.keys, checkpoints)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = SQLiteBackend(os.path.join(tmp, 'ratelimit.sqlite3'))
+        run("SQLiteBackend (WAL)", RateLimiter(backend, cooldown=25), args.keys, checkpoints)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Roman Urdu transliteration throughput over a ~1 MB corpus
+
+Compares the per-key regex passes the module used to run with the
+precompiled single-pass engine, then checks the engine against TEST_CASES.
+
+Usage: python benchmarks/bench_roman_urdu.py [--size-mb 1]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import roman_urdu
+from roman_urdu import ROMAN_TO_URDU, TEST_CASES, roman_urdu_to_urdu_text
+
+
+def legacy_convert(text):
+    """The previous algorithm: one compile + sub pass per dictionary key"""
+    text_lower = text.lower()
+    urdu_text = text
+    for roman in sorted(ROMAN_TO_URDU.keys(), key=len, reverse=True):
+        if roman in text_lower:
+            pattern = re.compile(re.escape(roman), re.IGNORECASE)
+            urdu_text = pattern.sub(ROMAN_TO_URDU[roman], urdu_text)
+    return urdu_text.replace('?', '؟')
+
+
+def build_corpus(size_bytes, seed=7):
+    rng = random.Random(seed)
+    vocabulary = [k for k in ROMAN_TO_URDU if len(k) > 2] + ['kal', 'ghar', 'jana', 'chalo', 'bohat', 'khana']
+    lines = []
+    total = 0
+    while total < size_bytes:
+        words = [rng.choice(vocabulary) for _ in range(rng.randint(4, 14))]
+        line = ' '.join(words) + rng.choice(['.', '?', '!', '']) + '\n'
+        lines.append(line)
+        total += len(line)
+    return ''.join(lines)
+
+
+def timed(fn, text):
+    start = time.perf_counter()
+    result = fn(text)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=float, default=1.0)
+    args = parser.parse_args()
+
+    failures = sum(roman_urdu_to_urdu_text(roman) != expected for roman, expected in TEST_CASES)
+    print(f"correctness: {len(TEST_CASES) - failures}/{len(TEST_CASES)} TEST_CASES pass")
+
+    corpus = build_corpus(int(args.size_mb * 1024 * 1024))
+    mb = len(corpus.encode('utf-8')) / (1024 * 1024)
+    print(f"corpus: {mb:.2f} MB, {corpus.count(chr(10))} lines, {len(ROMAN_TO_URDU)} dictionary keys")
+
+    start = time.perf_counter()
+    roman_urdu.get_engine()
+    build = time.perf_counter() - start
+
+    legacy_time, _ = timed(legacy_convert, corpus)
+    engine_time, _ = timed(roman_urdu_to_urdu_text, corpus)
+    print(f"{'legacy per-key passes':24} {legacy_time:8.3f} s {mb / legacy_time:8.2f} MB/s")
+    print(f"{'single-pass engine':24} {engine_time:8.3f} s {mb / engine_time:8.2f} MB/s"
+          f"   (engine build {build * 1000:.2f} ms)")
+    print(f"speedup: {legacy_time / engine_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
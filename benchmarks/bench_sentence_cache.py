@@ -0,0 +1,93 @@
+"""
+Regenerating an edited document: whole-text synthesis vs per-sentence cache
+
+Simulates the home page workflow: synthesize a --sentences sentence
+document, then --edits times change one sentence and regenerate. Runs
+against a stand-in for edge_tts whose latency grows with the text length
+(--base + --per-char per character), once with SENTENCE_CACHE off (packed
+segments, as before) and once on, and reports upstream calls, characters
+sent upstream, wall time per regeneration and the reuse ratio.
+
+Usage: python benchmarks/bench_sentence_cache.py [--sentences 20] [--edits 10]
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TTS_CACHE_DISK_MB', '0')
+os.environ.setdefault('JOB_WORKERS', '0')
+
+import edge_tts
+
+import app as flask_module
+
+BASE = 0.3
+PER_CHAR = 0.002
+upstream = {'calls': 0, 'chars': 0}
+
+
+class FakeCommunicate:
+    """Stands in for edge_tts.Communicate: latency grows with the text"""
+
+    def __init__(self, text, voice, **kwargs):
+        self.text = text
+
+    async def stream(self):
+        upstream['calls'] += 1
+        upstream['chars'] += len(self.text)
+        await asyncio.sleep(BASE + PER_CHAR * len(self.text))
+        yield {'type': 'audio', 'data': b'\xff\xf3\x64\xc0' + bytes(140)}
+
+
+def make_document(count, rng):
+    words = "speech cache sentence edit voice audio frame stream splice reuse document".split()
+    return [' '.join(rng.choices(words, k=rng.randint(8, 16))).capitalize() + '.' for _ in range(count)]
+
+
+def run(enabled, args):
+    flask_module.sentence_cache.enabled = enabled
+    rng = random.Random(3)
+    document = make_document(args.sentences, rng)
+    # A distinct voice per run so neither run sees the other's cache entries
+    voice = 'en-US-JennyNeural' if enabled else 'en-US-AriaNeural'
+    upstream.update(calls=0, chars=0)
+    timings = []
+    for edit in range(args.edits + 1):
+        if edit:
+            document[rng.randrange(len(document))] = f"Edit number {edit} changes this sentence."
+        start = time.perf_counter()
+        flask_module.background_loop.run(flask_module.synthesize_cached(' '.join(document), voice, 0, 0, 0))
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    global BASE, PER_CHAR
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sentences', type=int, default=20)
+    parser.add_argument('--edits', type=int, default=10)
+    parser.add_argument('--base', type=float, default=0.3)
+    parser.add_argument('--per-char', type=float, default=0.002)
+    args = parser.parse_args()
+
+    BASE, PER_CHAR = args.base, args.per_char
+    edge_tts.Communicate = FakeCommunicate
+
+    print(f"{args.sentences}-sentence document, {args.edits} one-sentence edits, "
+          f"upstream {args.base * 1000:.0f} ms + {args.per_char * 1000:.1f} ms/char")
+    print(f"{'mode':16} {'calls':>6} {'chars':>7} {'first s':>8} {'edit p50 s':>11}")
+    for enabled in (False, True):
+        timings = run(enabled, args)
+        label = 'per-sentence' if enabled else 'whole text'
+        print(f"{label:16} {upstream['calls']:6} {upstream['chars']:7} {timings[0]:8.2f} "
+              f"{statistics.median(timings[1:]):11.2f}")
+    print(f"\nsentence cache: {flask_module.sentence_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Upstream calls under a duplicate-heavy burst, with and without coalescing
+
+Fires --requests /tts calls at once, drawn from --prompts popular texts
+(half of them streaming), against a stand-in for edge_tts that takes
+--latency seconds. Runs the Flask app on a threaded WSGI server (gunicorn
+gthread: request threads sharing one event loop) and asgi:app on uvicorn,
+with COALESCE_REQUESTS off and on, and counts upstream streams opened.
+Also checks that every response for a prompt carried identical bytes.
+
+Usage: python benchmarks/bench_singleflight.py [--requests 200] [--prompts 5] [--latency 0.5]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TTS_CACHE_DISK_MB', '0')
+os.environ.setdefault('RATE_LIMIT_BACKEND', 'memory')
+os.environ.setdefault('JOB_WORKERS', '0')
+
+import aiohttp
+import edge_tts
+import uvicorn
+
+import app as flask_module
+
+LATENCY = 0.5
+upstream_calls = 0
+counter_lock = threading.Lock()
+
+
+class FakeCommunicate:
+    """Stands in for edge_tts.Communicate: counts streams, sleeps, yields text-derived chunks"""
+
+    def __init__(self, text, voice, **kwargs):
+        self.text = text
+
+    async def stream(self):
+        global upstream_calls
+        with counter_lock:
+            upstream_calls += 1
+        for i in range(4):
+            await asyncio.sleep(LATENCY / 4)
+            yield {'type': 'audio', 'data': f"{self.text}|{i}|".encode() + bytes(140)}
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class ThreadedServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    request_queue_size = 2048
+
+
+def start_wsgi(port):
+    server = make_server('127.0.0.1', port, flask_module.app,
+                         server_class=ThreadedServer, handler_class=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.shutdown
+
+
+def start_asgi(port):
+    import asgi
+    config = uvicorn.Config(asgi.app, host='127.0.0.1', port=port, log_level='warning')
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+    return stop
+
+
+async def burst(url, texts):
+    bodies = {}
+
+    async def one(session, i, text):
+        stream = '?stream=1' if i % 2 else ''
+        async with session.post(url + stream, json={'text': text}) as resp:
+            body = await resp.read()
+            bodies.setdefault(text, set()).add((resp.status, body))
+
+    connector = aiohttp.TCPConnector(limit=len(texts))
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=None)) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(session, i, text) for i, text in enumerate(texts)))
+        return time.perf_counter() - start, bodies
+
+
+def main():
+    global LATENCY, upstream_calls
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--prompts', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.5)
+    args = parser.parse_args()
+
+    LATENCY = args.latency
+    edge_tts.Communicate = FakeCommunicate
+    flask_module.check_rate_limit = lambda client_ip, max_requests_per_hour=10: None
+
+    print(f"{args.requests} simultaneous requests over {args.prompts} prompts, upstream latency {args.latency}s")
+    print(f"{'server':7} {'coalesce':9} {'upstream calls':>15} {'wall s':>7} {'identical':>10}")
+    rng = random.Random(7)
+    for name, start_server, port in (('wsgi', start_wsgi, 18091), ('asgi', start_asgi, 18092)):
+        stop = start_server(port)
+        try:
+            for enabled in (False, True):
+                flask_module.inflight.enabled = enabled
+                # Fresh prompts per run so the audio cache never answers
+                prompts = [f"popular prompt {p} ({name}, {enabled})" for p in range(args.prompts)]
+                weights = [1 / (rank + 1) for rank in range(args.prompts)]
+                texts = rng.choices(prompts, weights, k=args.requests)
+                upstream_calls = 0
+                elapsed, bodies = asyncio.run(burst(f"http://127.0.0.1:{port}/tts", texts))
+                identical = all(len(variants) == 1 for variants in bodies.values())
+                print(f"{name:7} {'on' if enabled else 'off':9} {upstream_calls:15} {elapsed:7.2f} {str(identical):>10}")
+        finally:
+            stop()
+    print(f"\nsingleflight stats: {flask_module.inflight.stats()}")
+
+
+if __name__ == "__main__":
+    main()
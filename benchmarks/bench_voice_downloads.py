@@ -0,0 +1,202 @@
+"""
+Voice downloads against a local stand-in for Hugging Face
+
+The stand-in serves fake .onnx/.onnx.json files with Range support, a
+sha256 ETag like Hugging Face's LFS files, a per-connection bandwidth cap,
+and optionally drops the first connection for each file halfway through.
+
+Compares the old serial 8 KB download (restarts from zero on error) with
+VoiceManager's bounded parallel pool, Range resume and verification, and
+checks every installed file's checksum and that no .part files are left.
+
+Usage: python benchmarks/bench_voice_downloads.py [--voices 6] [--size-mb 8] [--mbps 40]
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+import voice_manager as vm_module
+from voice_manager import VoiceManager
+
+
+class StandIn:
+    """Range-capable file server with throttling and one-shot connection drops"""
+
+    def __init__(self, files, bytes_per_second, drop_first=False):
+        self.files = files
+        self.bytes_per_second = bytes_per_second
+        self.drop_first = drop_first
+        self.dropped = set()
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                body = stand_in.files.get(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                start = 0
+                range_header = self.headers.get('Range')
+                if range_header:
+                    start = int(range_header.split('=')[1].split('-')[0])
+                    if start >= len(body):
+                        self.send_response(416)
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header('Content-Range', f'bytes {start}-{len(body) - 1}/{len(body)}')
+                else:
+                    self.send_response(200)
+                if not self.path.endswith('.json'):
+                    self.send_header('ETag', f'"{hashlib.sha256(body).hexdigest()}"')
+                self.send_header('Content-Length', str(len(body) - start))
+                self.end_headers()
+
+                drop_at = None
+                with stand_in.lock:
+                    if stand_in.drop_first and self.path not in stand_in.dropped and not self.path.endswith('.json'):
+                        stand_in.dropped.add(self.path)
+                        drop_at = start + (len(body) - start) // 2
+                step = 64 * 1024
+                position = start
+                while position < len(body):
+                    end = min(len(body), position + step)
+                    if drop_at is not None and end > drop_at:
+                        self.wfile.write(body[position:drop_at])
+                        self.close_connection = True
+                        self.connection.shutdown(2)
+                        with stand_in.lock:
+                            stand_in.bytes_sent += drop_at - position
+                        return
+                    self.wfile.write(body[position:end])
+                    with stand_in.lock:
+                        stand_in.bytes_sent += end - position
+                    position = end
+                    time.sleep(step / stand_in.bytes_per_second)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def close(self):
+        self.server.shutdown()
+
+
+def legacy_download(url, file_path):
+    """What VoiceManager._download_file did before: serial, 8 KB, no resume"""
+    for _ in range(vm_module.DOWNLOAD_RETRIES):
+        try:
+            response = requests.get(url, stream=True, timeout=30)
+            response.raise_for_status()
+            total = int(response.headers.get('content-length', 0))
+            written = 0
+            with open(file_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=8192):
+                    f.write(chunk)
+                    written += len(chunk)
+            if written < total:
+                raise IOError("short read")
+            return True
+        except Exception:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+    return False
+
+
+def make_manager(voices_dir, stand_in, names, workers):
+    manager = VoiceManager(voices_dir, download_workers=workers)
+    manager.available_voices = {name: {'url': f"{stand_in.url}/{name}.onnx"} for name in names}
+    return manager
+
+
+def check(voices_dir, files):
+    ok = all(
+        open(os.path.join(voices_dir, path.lstrip('/')), 'rb').read() == body
+        for path, body in files.items()
+    )
+    leftovers = [f for f in os.listdir(voices_dir) if f.endswith('.part')]
+    return ok and not leftovers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--voices', type=int, default=6)
+    parser.add_argument('--size-mb', type=float, default=8)
+    parser.add_argument('--mbps', type=float, default=40, help="per-connection cap in MB/s")
+    parser.add_argument('--workers', type=int, default=vm_module.DOWNLOAD_WORKERS)
+    args = parser.parse_args()
+
+    # No multi-second retry backoff against a local server
+    vm_module.time = types.SimpleNamespace(perf_counter=time.perf_counter, sleep=lambda seconds: None)
+
+    names = [f"xx_XX-voice{i}-medium" for i in range(args.voices)]
+    files = {}
+    for name in names:
+        files[f"/{name}.onnx"] = os.urandom(int(args.size_mb * 1024 * 1024))
+        files[f"/{name}.onnx.json"] = b'{"audio": {"sample_rate": 22050}}'
+    total_mb = sum(len(body) for body in files.values()) / 1e6
+
+    print(f"{args.voices} voices x {args.size_mb} MB, {args.mbps} MB/s per connection, pool of {args.workers}")
+    print(f"{'mode':34} {'seconds':>8} {'MB sent':>8} {'verified':>9}")
+    for drop in (False, True):
+        label = 'drop each model at 50%' if drop else 'clean link'
+        rows = []
+
+        stand_in = StandIn(files, args.mbps * 1e6, drop_first=drop)
+        voices_dir = tempfile.mkdtemp()
+        start = time.perf_counter()
+        for path in files:
+            legacy_download(stand_in.url + path, os.path.join(voices_dir, path.lstrip('/')))
+        rows.append(('serial 8 KB, restart on error', time.perf_counter() - start, stand_in.bytes_sent,
+                     check(voices_dir, files)))
+        stand_in.close()
+        shutil.rmtree(voices_dir)
+
+        stand_in = StandIn(files, args.mbps * 1e6, drop_first=drop)
+        voices_dir = tempfile.mkdtemp()
+        manager = make_manager(voices_dir, stand_in, names, args.workers)
+        start = time.perf_counter()
+        results = manager.download_voices(names)
+        rows.append(('pool + resume + sha256', time.perf_counter() - start, stand_in.bytes_sent,
+                     all(results.values()) and check(voices_dir, files)))
+        stand_in.close()
+        shutil.rmtree(voices_dir)
+
+        print(f"-- {label} ({total_mb:.0f} MB of files)")
+        for mode, seconds, sent, verified in rows:
+            print(f"{mode:34} {seconds:8.2f} {sent / 1e6:8.1f} {str(verified):>9}")
+
+    # A corrupted partial left behind by an earlier run must not be installed
+    stand_in = StandIn(files, args.mbps * 1e6)
+    voices_dir = tempfile.mkdtemp()
+    manager = make_manager(voices_dir, stand_in, names[:1], 1)
+    with open(os.path.join(voices_dir, f"{names[0]}.onnx.part"), 'wb') as f:
+        f.write(b'\0' * 1024)
+    manager.download_voices(names[:1])
+    print(f"\ncorrupt .part detected and re-downloaded: {check(voices_dir, {k: v for k, v in files.items() if names[0] in k})}")
+    stand_in.close()
+    shutil.rmtree(voices_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Load test: syntheses in flight per process, sync WSGI worker vs ASGI
+
+Runs both servers in this process against a stand-in for edge_tts that
+takes --latency seconds per request, so only the serving model differs:
+  wsgi - the Flask app on a single-threaded WSGI server (one sync gunicorn worker)
+  asgi - asgi:app on a single uvicorn process
+
+Usage: python benchmarks/load_test.py [--requests 200] [--concurrency 100] [--latency 1.0]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('TTS_CACHE_DISK_MB', '0')
+os.environ.setdefault('RATE_LIMIT_BACKEND', 'memory')
+
+import aiohttp
+import edge_tts
+import uvicorn
+
+import app as flask_module
+
+LATENCY = 1.0
+in_flight = 0
+peak_in_flight = 0
+counter_lock = threading.Lock()
+
+
+class FakeCommunicate:
+    """Stands in for edge_tts.Communicate: sleeps, then yields a few chunks"""
+
+    def __init__(self, text, voice, **kwargs):
+        self.text = text
+
+    async def stream(self):
+        global in_flight, peak_in_flight
+        with counter_lock:
+            in_flight += 1
+            peak_in_flight = max(peak_in_flight, in_flight)
+        try:
+            for _ in range(4):
+                await asyncio.sleep(LATENCY / 4)
+                yield {'type': 'audio', 'data': b'\xff\xf3\x64\xc0' + bytes(140)}
+        finally:
+            with counter_lock:
+                in_flight -= 1
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class BackloggedServer(WSGIServer):
+    # Queue connections like gunicorn does instead of dropping SYNs
+    request_queue_size = 2048
+
+
+def start_wsgi(port):
+    server = make_server('127.0.0.1', port, flask_module.app,
+                         server_class=BackloggedServer, handler_class=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.shutdown
+
+
+def start_asgi(port):
+    import asgi
+    config = uvicorn.Config(asgi.app, host='127.0.0.1', port=port, log_level='warning')
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+    return stop
+
+
+async def drive(url, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses = {}
+
+    async def one(session, i):
+        async with semaphore:
+            async with session.post(url, json={'text': f'load test {i} {time.time()}'}) as resp:
+                await resp.read()
+                statuses[resp.status] = statuses.get(resp.status, 0) + 1
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(session, i) for i in range(requests)))
+        return time.perf_counter() - start, statuses
+
+
+def run(name, start_server, port, args):
+    global peak_in_flight
+    peak_in_flight = 0
+    stop = start_server(port)
+    try:
+        elapsed, statuses = asyncio.run(drive(f'http://127.0.0.1:{port}/tts', args.requests, args.concurrency))
+    finally:
+        stop()
+    print(f"{name:6} {args.requests / elapsed:10.1f} req/s {elapsed:9.1f} s "
+          f"{peak_in_flight:8} in flight   statuses={statuses}")
+
+
+def main():
+    global LATENCY
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=1.0)
+    parser.add_argument('--only', choices=['wsgi', 'asgi'])
+    args = parser.parse_args()
+
+    LATENCY = args.latency
+    edge_tts.Communicate = FakeCommunicate
+    # One client IP sends everything; measure serving, not the limiter
+    flask_module.check_rate_limit = lambda client_ip, max_requests_per_hour=10: None
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, upstream latency {args.latency}s")
+    print(f"{'mode':6} {'throughput':>14} {'wall':>11} {'peak':>8}")
+    if args.only in (None, 'wsgi'):
+        run('wsgi', start_wsgi, 18081, args)
+    if args.only in (None, 'asgi'):
+        run('asgi', start_asgi, 18082, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+"""
+Synthesis engines and the router that picks one for each request
+
+Edge TTS is the remote engine. Piper runs locally, either behind its HTTP
+server (piper_worker.py / piper_server.py, reached through a pooled
+keep-alive client) or in-process through piper_engine. The router sends a
+request to the engines that serve its voice, keeps an EWMA of time to first
+audio and of the error rate per engine, and fails over to an installed Piper
+voice in the same language when Edge is down (its circuit opens after
+repeated failures) or has been persistently slow. Only failures that are
+the engine's fault (transport, timeouts, 5xx) count toward the circuit and
+trigger failover; an error caused by the request itself goes straight back
+to the caller.
+
+Edge returns MP3 and Piper returns WAV; audio_type() tells them apart.
+"""
+import asyncio
+import importlib.util
+import io
+import logging
+import os
+import re
+import threading
+import time
+import wave
+import weakref
+
+import aiohttp
+from edge_tts.exceptions import UnexpectedResponse, UnknownResponse, WebSocketError
+
+from voice_manager import voice_manager
+
+logger = logging.getLogger(__name__)
+
+# Piper voices are named like en_US-lessac-medium, Edge voices like en-US-JennyNeural
+PIPER_VOICE_NAME = re.compile(r'^[a-z]{2,3}_[A-Z]{2}-')
+
+
+def audio_type(data):
+    """(mimetype, extension) of synthesized audio"""
+    if data[:4] == b'RIFF':
+        return 'audio/wav', 'wav'
+    return 'audio/mpeg', 'mp3'
+
+
+def with_leading_silence(wav_bytes, milliseconds):
+    """Prepend silence to a WAV file (Piper's stand-in for the SSML break)"""
+    if int(milliseconds) <= 0:
+        return wav_bytes
+    with wave.open(io.BytesIO(wav_bytes), 'rb') as source:
+        params = source.getparams()
+        frames = source.readframes(params.nframes)
+    silence = b'\0' * (int(params.framerate * int(milliseconds) / 1000) * params.sampwidth * params.nchannels)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as target:
+        target.setparams(params)
+        target.writeframes(silence + frames)
+    return buffer.getvalue()
+
+
+def is_transient(error):
+    """True for transport, timeout and 5xx-type failures; False when the request is at fault"""
+    if isinstance(error, aiohttp.WSServerHandshakeError):
+        # Edge refusing the WebSocket (403 on a token or endpoint change) is the
+        # usual way it goes down, whatever the status
+        return True
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status >= 500 or error.status in (408, 429)
+    return isinstance(error, (
+        asyncio.TimeoutError, OSError, aiohttp.ClientError,
+        WebSocketError, UnexpectedResponse, UnknownResponse,
+    ))
+
+
+def is_piper_voice(voice):
+    return bool(PIPER_VOICE_NAME.match(voice)) or voice in voice_manager.catalog()
+
+
+class EngineStats:
+    """EWMA latency and error rate for one engine, plus a circuit breaker"""
+
+    def __init__(self, alpha=0.2, failure_threshold=3, cooldown=30.0):
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.first_audio = None
+        self.total = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+
+    def _ewma(self, current, sample):
+        return sample if current is None else current + self.alpha * (sample - current)
+
+    def record_first_audio(self, seconds):
+        with self._lock:
+            self.first_audio = self._ewma(self.first_audio, seconds)
+
+    def record_success(self, seconds):
+        with self._lock:
+            self.requests += 1
+            self.total = self._ewma(self.total, seconds)
+            self.error_rate = self._ewma(self.error_rate, 0.0)
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+
+    def record_failure(self):
+        """Count a failure; returns True if it opened the circuit"""
+        with self._lock:
+            self.requests += 1
+            self.failures += 1
+            self.error_rate = self._ewma(self.error_rate, 1.0)
+            self.consecutive_failures += 1
+            # After the cooldown one request is let through; failing it reopens at once
+            if self.consecutive_failures >= self.failure_threshold:
+                self.open_until = time.monotonic() + self.cooldown
+                return True
+        return False
+
+    def is_open(self):
+        return time.monotonic() < self.open_until
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'first_audio_ms': round(self.first_audio * 1000, 1) if self.first_audio is not None else None,
+                'total_ms': round(self.total * 1000, 1) if self.total is not None else None,
+                'error_rate': round(self.error_rate, 3),
+                'requests': self.requests,
+                'failures': self.failures,
+                'circuit_open': time.monotonic() < self.open_until,
+            }
+
+
+class EdgeEngine:
+    """Microsoft Edge TTS (remote, MP3)"""
+    name = 'edge'
+    local = False
+
+    def __init__(self, stream):
+        # stream(text, voice, pitch, rate, gap, info) is app.py's segmenting Edge pipeline
+        self._stream = stream
+
+    def serves(self, voice):
+        return not is_piper_voice(voice)
+
+    def stream(self, text, voice, pitch, rate, gap, info=None):
+        return self._stream(text, voice, pitch, rate, gap, info)
+
+
+class PiperHTTPEngine:
+    """Piper HTTP server (or PiperPool proxy) through a pooled keep-alive client"""
+    name = 'piper-http'
+    local = True
+
+    def __init__(self, base_url, pool_size=8, keepalive=30.0, timeout=60.0):
+        self.base_url = base_url.rstrip('/')
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.timeout = timeout
+        # aiohttp sessions belong to one event loop; Flask's background loop
+        # and uvicorn's loop each get their own connection pool
+        self._sessions = weakref.WeakKeyDictionary()
+
+    def serves(self, voice):
+        return is_piper_voice(voice)
+
+    def _session(self):
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=self.keepalive),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+            self._sessions[loop] = session
+        return session
+
+    async def close(self):
+        """Close the calling loop's connection pool"""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+    async def stream(self, text, voice, pitch, rate, gap, info=None):
+        from piper_engine import length_scale_for
+
+        payload = {'text': text, 'voice': voice}
+        length_scale = length_scale_for(f"{rate}%")
+        if length_scale is not None:
+            payload['length_scale'] = length_scale
+        async with self._session().post(f"{self.base_url}/synthesize", json=payload) as response:
+            body = await response.read()
+            if response.status != 200:
+                raise aiohttp.ClientResponseError(
+                    response.request_info, response.history, status=response.status,
+                    message=f"Piper returned {response.status}: {body[:200]!r}"
+                )
+        yield with_leading_silence(body, gap)
+
+
+class LocalPiperEngine:
+    """In-process Piper (piper_engine), run on the default thread pool"""
+    name = 'piper-local'
+    local = True
+
+    def serves(self, voice):
+        return voice_manager.get_voice_path(voice) is not None
+
+    async def stream(self, text, voice, pitch, rate, gap, info=None):
+        from piper_engine import piper_engine
+
+        loop = asyncio.get_running_loop()
+        audio = await loop.run_in_executor(None, lambda: piper_engine.synthesize(text, voice, rate=f"{rate}%"))
+        yield with_leading_silence(audio, gap)
+
+
+class EngineRouter:
+    """Per-request engine choice with latency-aware failover to local Piper"""
+
+    def __init__(self, engines, edge_voices=None, voice_map=None, slow_seconds=4.0,
+                 probe_every=10, alpha=0.2, failure_threshold=3, cooldown=30.0):
+        self.engines = list(engines)
+        self.edge_voices = edge_voices or {}
+        self.voice_map = voice_map or {}
+        self.slow_seconds = slow_seconds
+        self.probe_every = probe_every
+        self.engine_stats = {
+            engine.name: EngineStats(alpha, failure_threshold, cooldown) for engine in self.engines
+        }
+        self.failovers = 0
+        self._routed = 0
+        self._lock = threading.Lock()
+
+    def fallback_voice(self, voice):
+        """Installed Piper voice standing in for an Edge voice, or None
+
+        ENGINE_VOICE_MAP entries (by voice, then by language) win; otherwise
+        the first installed voice in the same language, same gender if any.
+        """
+        info = self.edge_voices.get(voice, {})
+        lang = info.get('lang') or '-'.join(voice.split('-')[:2])
+        mapped = self.voice_map.get(voice) or self.voice_map.get(lang)
+        if mapped:
+            return mapped
+        code = lang.replace('-', '_')
+        installed = sorted(
+            name for name, entry in voice_manager.catalog().items()
+            if entry['complete'] and (entry.get('language') or name.split('-')[0]) == code
+        )
+        same_gender = [
+            name for name in installed
+            if voice_manager.available_voices.get(name, {}).get('gender', '').lower() == info.get('gender')
+        ]
+        return (same_gender or installed or [None])[0]
+
+    def plan(self, voice):
+        """Ordered (engine, engine_voice, is_fallback) attempts for a voice"""
+        def latency(attempt):
+            return self.engine_stats[attempt[0].name].first_audio or 0.0
+
+        primary = sorted(
+            ((engine, voice, False) for engine in self.engines if engine.serves(voice)), key=latency
+        )
+        fallback = []
+        if not any(engine.local for engine, _, _ in primary):
+            stand_in = self.fallback_voice(voice)
+            if stand_in:
+                fallback = sorted(
+                    ((engine, stand_in, True) for engine in self.engines
+                     if engine.local and engine.serves(stand_in)),
+                    key=latency
+                )
+
+        with self._lock:
+            self._routed += 1
+            probe = self._routed % self.probe_every == 0
+        # A persistently slow primary goes behind the fallback, except for
+        # every probe_every-th request, which keeps its EWMA fresh
+        if fallback and primary and not probe:
+            first_audio = self.engine_stats[primary[0][0].name].first_audio
+            if first_audio is not None and first_audio > self.slow_seconds:
+                primary, fallback = fallback, primary
+
+        attempts = primary + fallback
+        # Engines with an open circuit are tried last rather than not at all
+        return (
+            [a for a in attempts if not self.engine_stats[a[0].name].is_open()]
+            + [a for a in attempts if self.engine_stats[a[0].name].is_open()]
+        )
+
+    async def stream(self, text, voice, pitch, rate, gap, route=None):
+        """Yield audio from the first engine that produces any
+
+        Failover happens only before the first chunk; once audio has been
+        sent an error propagates. `route`, if given, is filled with the
+        engine, voice, whether it was a fallback and whatever the engine
+        reported about the attempt (e.g. sentence reuse).
+        """
+        attempts = self.plan(voice)
+        if not attempts:
+            raise RuntimeError(f"No synthesis engine serves voice {voice}")
+
+        error = None
+        for engine, engine_voice, is_fallback in attempts:
+            stats = self.engine_stats[engine.name]
+            start = time.perf_counter()
+            attempt = {}
+            chunks = engine.stream(text, engine_voice, pitch, rate, gap, attempt)
+            try:
+                try:
+                    first = await chunks.__anext__()
+                except Exception as e:
+                    if isinstance(e, StopAsyncIteration):
+                        e = RuntimeError(f"{engine.name} returned no audio")
+                    if not is_transient(e):
+                        # A bad request (nothing speakable, invalid voice...) fails the
+                        # same way everywhere and says nothing about the engine's health
+                        raise e
+                    error = e
+                    if stats.record_failure():
+                        logger.error(f"🔌 {engine.name} circuit open for {stats.cooldown:.0f}s")
+                    logger.warning(f"⚠️ {engine.name} failed for {engine_voice}: {e}")
+                    continue
+
+                stats.record_first_audio(time.perf_counter() - start)
+                if is_fallback:
+                    with self._lock:
+                        self.failovers += 1
+                    logger.info(f"🔀 {voice} served by {engine.name} as {engine_voice}")
+                if route is not None:
+                    route.update(attempt, engine=engine.name, voice=engine_voice, fallback=is_fallback)
+
+                try:
+                    yield first
+                    async for chunk in chunks:
+                        yield chunk
+                except Exception as e:
+                    if is_transient(e):
+                        stats.record_failure()
+                    raise
+                stats.record_success(time.perf_counter() - start)
+                return
+            finally:
+                await chunks.aclose()
+        raise error
+
+    async def close(self):
+        for engine in self.engines:
+            if hasattr(engine, 'close'):
+                await engine.close()
+
+    def stats(self):
+        return {
+            'engines': {name: stats.snapshot() for name, stats in self.engine_stats.items()},
+            'failovers': self.failovers,
+            'slow_seconds': self.slow_seconds,
+        }
+
+
+def parse_voice_map(value):
+    """'en-US=en_US-lessac-medium,ur-PK-AsadNeural=ur_PK-medium' → dict"""
+    pairs = (item.split('=', 1) for item in value.split(',') if '=' in item)
+    return {key.strip(): target.strip() for key, target in pairs}
+
+
+def router_from_env(edge_stream, edge_voices=None):
+    engines = [EdgeEngine(edge_stream)]
+    piper_url = os.environ.get('PIPER_URL', '').rstrip('/')
+    if piper_url:
+        engines.append(PiperHTTPEngine(piper_url, pool_size=int(os.environ.get('PIPER_HTTP_POOL', 8))))
+    if os.environ.get('PIPER_LOCAL', '1') == '1' and importlib.util.find_spec('piper') is not None:
+        engines.append(LocalPiperEngine())
+    return EngineRouter(
+        engines,
+        edge_voices=edge_voices,
+        voice_map=parse_voice_map(os.environ.get('ENGINE_VOICE_MAP', '')),
+        slow_seconds=float(os.environ.get('ENGINE_SLOW_SECONDS', 4.0)),
+        probe_every=int(os.environ.get('ENGINE_PROBE_EVERY', 10)),
+        failure_threshold=int(os.environ.get('ENGINE_FAILURE_THRESHOLD', 3)),
+        cooldown=float(os.environ.get('ENGINE_COOLDOWN', 30.0)),
+    )
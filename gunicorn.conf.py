@@ -0,0 +1,15 @@
+"""
+Gunicorn settings (picked up automatically by `gunicorn app:app`)
+"""
+
+
+def post_fork(server, worker):
+    """Start the worker's job threads, warm-ups and cache warmer"""
+    from app import start_background
+    start_background()
+
+
+def worker_exit(server, worker):
+    """Stop the worker's background event loop before it exits"""
+    from async_runtime import background_loop
+    background_loop.stop()
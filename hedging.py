@@ -0,0 +1,241 @@
+"""
+Deadlines, jittered retries and hedging for upstream audio streams
+
+An attempt is an async iterator of audio chunks (a fresh one per call of
+the factory). Each attempt has two deadlines: one for its first chunk and
+one for the whole stream. An attempt that fails or times out before its
+first chunk is retried after a random, exponentially growing pause (full
+jitter), so a burst of failures does not retry in lockstep.
+
+With hedging on, a second attempt is fired if the first has not produced
+audio after the recent p95 time to first chunk; whichever produces audio
+first is kept and the other is cancelled. Only a slow tail pays for the
+extra request, and the fired / won / wasted counters show what it costs.
+"""
+import asyncio
+import logging
+import os
+import random
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class HedgedCaller:
+    """Runs attempt factories under deadlines, retries and optional hedging"""
+
+    def __init__(self, first_chunk_timeout=10.0, total_timeout=60.0, retries=1,
+                 backoff_base=0.2, backoff_max=2.0, hedge=False, hedge_quantile=0.95,
+                 hedge_min_delay=0.1, hedge_min_samples=20, window=200):
+        self.first_chunk_timeout = first_chunk_timeout
+        self.total_timeout = total_timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self._first_chunk = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.counters = {
+            'attempts': 0,
+            'retries': 0,
+            'first_chunk_timeouts': 0,
+            'total_timeouts': 0,
+            'errors': 0,
+            'hedges_fired': 0,
+            'hedges_won': 0,
+            'hedges_wasted': 0,
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def hedge_delay(self):
+        """Seconds to wait for a first chunk before hedging: the recent p95"""
+        with self._lock:
+            samples = sorted(self._first_chunk)
+        if len(samples) < self.hedge_min_samples:
+            # Too little history: hedge only what is clearly stuck
+            return max(self.hedge_min_delay, self.first_chunk_timeout / 2)
+        index = min(len(samples) - 1, int(self.hedge_quantile * len(samples)))
+        return max(self.hedge_min_delay, samples[index])
+
+    def backoff(self, retry):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** retry)))
+
+    async def _discard(self, task, chunks):
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await chunks.aclose()
+
+    async def _first(self, factory):
+        """Start an attempt (plus a hedge if it is slow); returns (chunks, first, deadline)"""
+        loop = asyncio.get_running_loop()
+
+        def launch(is_hedge):
+            chunks = factory()
+            self._count('attempts')
+            task = asyncio.ensure_future(chunks.__anext__())
+            pending[task] = (chunks, is_hedge, loop.time())
+
+        pending = {}
+        launch(False)
+        hedge_at = loop.time() + self.hedge_delay() if self.hedge else None
+        hedged = False
+        error = None
+        try:
+            while pending:
+                now = loop.time()
+                # The earliest first-chunk deadline among live attempts, or the hedge point
+                wake = min(started for _, _, started in pending.values()) + self.first_chunk_timeout
+                if hedge_at is not None:
+                    wake = min(wake, hedge_at)
+                done, _ = await asyncio.wait(
+                    list(pending), timeout=max(0.0, wake - now), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    chunks, is_hedge, started = pending.pop(task)
+                    try:
+                        first = task.result()
+                    except ValueError:
+                        # A bad request fails the same way on every attempt
+                        raise
+                    except StopAsyncIteration:
+                        error = RuntimeError("Upstream returned no audio")
+                        await chunks.aclose()
+                        continue
+                    except Exception as e:
+                        error = e
+                        await chunks.aclose()
+                        continue
+                    with self._lock:
+                        self._first_chunk.append(loop.time() - started)
+                    if hedged:
+                        self._count('hedges_won' if is_hedge else 'hedges_wasted')
+                    return chunks, first, started + self.total_timeout
+
+                now = loop.time()
+                if hedge_at is not None and now >= hedge_at:
+                    hedge_at = None
+                    hedged = True
+                    self._count('hedges_fired')
+                    launch(True)
+                    continue
+                for task, (chunks, _, started) in list(pending.items()):
+                    if now >= started + self.first_chunk_timeout:
+                        del pending[task]
+                        self._count('first_chunk_timeouts')
+                        error = asyncio.TimeoutError(
+                            f"No audio within {self.first_chunk_timeout:.1f}s"
+                        )
+                        await self._discard(task, chunks)
+            raise error
+        finally:
+            # Losers (and anything still running on an error) are cancelled
+            for task, (chunks, _, _) in pending.items():
+                await self._discard(task, chunks)
+
+    async def _attempt(self, factory):
+        """One attempt (and its hedge), under the first-chunk and total deadlines"""
+        chunks, first, deadline = await self._first(factory)
+        loop = asyncio.get_running_loop()
+        try:
+            yield first
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self._count('total_timeouts')
+                    raise asyncio.TimeoutError(f"Stream exceeded {self.total_timeout:.1f}s")
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), remaining)
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    self._count('total_timeouts')
+                    raise asyncio.TimeoutError(f"Stream exceeded {self.total_timeout:.1f}s") from None
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+    async def stream(self, factory):
+        """Yield chunks from the first successful attempt
+
+        Retries happen only before the first chunk; after that an error or
+        a missed total deadline propagates.
+        """
+        for retry in range(self.retries + 1):
+            attempt = self._attempt(factory)
+            try:
+                first = await attempt.__anext__()
+            except ValueError:
+                raise
+            except Exception as e:
+                await attempt.aclose()
+                self._count('errors')
+                if retry == self.retries:
+                    raise
+                pause = self.backoff(retry)
+                self._count('retries')
+                logger.warning(f"⚠️ Upstream attempt failed ({e!r}), retrying in {pause * 1000:.0f} ms")
+                await asyncio.sleep(pause)
+                continue
+            try:
+                yield first
+                async for chunk in attempt:
+                    yield chunk
+            finally:
+                await attempt.aclose()
+            return
+
+    async def collect(self, factory):
+        """Whole audio; nothing has been sent yet, so mid-stream failures retry too"""
+        for retry in range(self.retries + 1):
+            try:
+                chunks = []
+                async for chunk in self._attempt(factory):
+                    chunks.append(chunk)
+                return b''.join(chunks)
+            except ValueError:
+                raise
+            except Exception as e:
+                self._count('errors')
+                if retry == self.retries:
+                    raise
+                pause = self.backoff(retry)
+                self._count('retries')
+                logger.warning(f"⚠️ Upstream attempt failed ({e!r}), retrying in {pause * 1000:.0f} ms")
+                await asyncio.sleep(pause)
+
+    def stats(self):
+        with self._lock:
+            samples = sorted(self._first_chunk)
+            counters = dict(self.counters)
+        p50 = samples[len(samples) // 2] if samples else None
+        return dict(
+            counters,
+            hedging=self.hedge,
+            hedge_delay_ms=round(self.hedge_delay() * 1000, 1),
+            first_chunk_p50_ms=round(p50 * 1000, 1) if p50 is not None else None,
+            first_chunk_timeout=self.first_chunk_timeout,
+            total_timeout=self.total_timeout,
+        )
+
+
+def caller_from_env(prefix='EDGE'):
+    def env(name, default):
+        return os.environ.get(f"{prefix}_{name}", default)
+
+    return HedgedCaller(
+        first_chunk_timeout=float(env('FIRST_CHUNK_TIMEOUT', 10.0)),
+        total_timeout=float(env('TOTAL_TIMEOUT', 60.0)),
+        retries=int(env('RETRIES', 1)),
+        backoff_base=float(env('BACKOFF_BASE', 0.2)),
+        backoff_max=float(env('BACKOFF_MAX', 2.0)),
+        hedge=env('HEDGE', '0') == '1',
+        hedge_quantile=float(env('HEDGE_QUANTILE', 0.95)),
+        hedge_min_delay=float(env('HEDGE_MIN_DELAY', 0.1)),
+    )
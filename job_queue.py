@@ -0,0 +1,319 @@
+"""
+Durable local job queue (SQLite) with background synthesis workers
+"""
+import json
+import logging
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+from engines import audio_type
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """
+    Jobs live in a WAL-mode SQLite file so they survive worker crashes and
+    restarts, and every gunicorn worker drains the same queue. A claimed
+    job holds a lease that its worker renews while the job runs; if the
+    worker dies the lease expires and the job is picked up again.
+    """
+
+    def __init__(self, db_path, results_dir, max_attempts=3, ttl=600, lease_seconds=60):
+        self.db_path = db_path
+        self.results_dir = results_dir
+        self.max_attempts = max_attempts
+        self.ttl = ttl
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        os.makedirs(results_dir, exist_ok=True)
+        conn = self._conn()
+        conn.execute('''CREATE TABLE IF NOT EXISTS jobs (
+                            id TEXT PRIMARY KEY,
+                            dedup_key TEXT NOT NULL,
+                            params TEXT NOT NULL,
+                            status TEXT NOT NULL,
+                            attempts INTEGER NOT NULL DEFAULT 0,
+                            error TEXT,
+                            result_path TEXT,
+                            created REAL NOT NULL,
+                            updated REAL NOT NULL,
+                            run_after REAL NOT NULL,
+                            lease_until REAL,
+                            expires_at REAL
+                        )''')
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, run_after)')
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key, status)')
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_expiry ON jobs (expires_at)')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, fn):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = fn(conn)
+            conn.execute('COMMIT')
+            return result
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def enqueue(self, params, dedup_key):
+        """Queue a job; returns (job_id, deduplicated) - identical pending jobs are shared"""
+        now = time.time()
+
+        def insert(conn):
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE dedup_key = ? AND status IN ('queued', 'running') LIMIT 1",
+                (dedup_key,)
+            ).fetchone()
+            if row is not None:
+                return row['id'], True
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                '''INSERT INTO jobs (id, dedup_key, params, status, created, updated, run_after)
+                   VALUES (?, ?, ?, 'queued', ?, ?, ?)''',
+                (job_id, dedup_key, json.dumps(params, ensure_ascii=False), now, now, now)
+            )
+            return job_id, False
+
+        return self._transaction(insert)
+
+    def claim(self):
+        """Lease the oldest runnable job (or one whose worker died); None if idle"""
+        now = time.time()
+
+        def take(conn):
+            row = conn.execute(
+                '''SELECT * FROM jobs
+                   WHERE (status = 'queued' AND run_after <= ?)
+                      OR (status = 'running' AND lease_until < ?)
+                   ORDER BY run_after LIMIT 1''',
+                (now, now)
+            ).fetchone()
+            if row is None:
+                return None
+            if row['attempts'] >= self.max_attempts:
+                # Its last worker died mid-run; stop handing it out
+                conn.execute(
+                    '''UPDATE jobs SET status = 'failed', error = 'Worker lost', lease_until = NULL,
+                                       updated = ?, expires_at = ?
+                       WHERE id = ?''',
+                    (now, now + self.ttl, row['id'])
+                )
+                return None
+            conn.execute(
+                '''UPDATE jobs SET status = 'running', attempts = attempts + 1,
+                                   lease_until = ?, updated = ?
+                   WHERE id = ?''',
+                (now + self.lease_seconds, now, row['id'])
+            )
+            job = dict(row)
+            job['attempts'] += 1
+            job['params'] = json.loads(job['params'])
+            return job
+
+        return self._transaction(take)
+
+    def renew(self, job_id, attempts):
+        """Extend a running job's lease; False once another worker has taken it over"""
+        now = time.time()
+        cursor = self._transaction(lambda conn: conn.execute(
+            '''UPDATE jobs SET lease_until = ?
+               WHERE id = ? AND status = 'running' AND attempts = ?''',
+            (now + self.lease_seconds, job_id, attempts)
+        ))
+        return cursor.rowcount > 0
+
+    def complete(self, job_id, attempts, audio_data):
+        """Store the result file atomically and mark the job done
+
+        Only the worker holding the given attempt's lease may finish it;
+        returns False (and keeps no file) once another worker has taken over.
+        """
+        # MP3 from Edge, WAV from Piper
+        path = os.path.join(self.results_dir, f"{job_id}.{audio_type(audio_data)[1]}")
+        fd, tmp_path = tempfile.mkstemp(dir=self.results_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(audio_data)
+        now = time.time()
+
+        def finish(conn):
+            cursor = conn.execute(
+                '''UPDATE jobs SET status = 'done', result_path = ?, error = NULL,
+                                   lease_until = NULL, updated = ?, expires_at = ?
+                   WHERE id = ? AND status = 'running' AND attempts = ?''',
+                (path, now, now + self.ttl, job_id, attempts)
+            )
+            if cursor.rowcount:
+                # Under the write lock, so a stale worker cannot replace the file
+                os.replace(tmp_path, path)
+            return cursor.rowcount > 0
+
+        try:
+            finished = self._transaction(finish)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return finished
+
+    def fail(self, job_id, attempts, error):
+        """Retry with jittered exponential backoff, or give up after max_attempts
+
+        Returns True if the job will be retried, False if it failed for good,
+        None if the lease was lost and another worker now owns the job.
+        """
+        now = time.time()
+        if attempts < self.max_attempts:
+            delay = min(300, 2 ** attempts) * random.uniform(0.5, 1.5)
+            cursor = self._transaction(lambda conn: conn.execute(
+                '''UPDATE jobs SET status = 'queued', error = ?, lease_until = NULL,
+                                   updated = ?, run_after = ?
+                   WHERE id = ? AND status = 'running' AND attempts = ?''',
+                (error, now, now + delay, job_id, attempts)
+            ))
+            return True if cursor.rowcount else None
+        cursor = self._transaction(lambda conn: conn.execute(
+            '''UPDATE jobs SET status = 'failed', error = ?, lease_until = NULL,
+                               updated = ?, expires_at = ?
+               WHERE id = ? AND status = 'running' AND attempts = ?''',
+            (error, now, now + self.ttl, job_id, attempts)
+        ))
+        return False if cursor.rowcount else None
+
+    def get(self, job_id):
+        row = self._conn().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        return job
+
+    def cleanup(self):
+        """Delete finished jobs past their TTL along with their audio files"""
+        now = time.time()
+
+        def expire(conn):
+            rows = conn.execute(
+                '''SELECT id, result_path FROM jobs
+                   WHERE status IN ('done', 'failed') AND expires_at < ?''',
+                (now,)
+            ).fetchall()
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND expires_at < ?",
+                (now,)
+            )
+            return rows
+
+        rows = self._transaction(expire)
+        for row in rows:
+            if row['result_path']:
+                try:
+                    os.remove(row['result_path'])
+                except OSError:
+                    pass
+        return len(rows)
+
+    def stats(self):
+        rows = self._conn().execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+
+class JobWorkers:
+    """Threads that drain a JobQueue, started once per worker process"""
+
+    def __init__(self, queue, run_job, workers=2, poll_interval=1.0, cleanup_interval=60):
+        self.queue = queue
+        self.run_job = run_job
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.cleanup_interval = cleanup_interval
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._pid = None
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid() or self.workers <= 0:
+                return
+            self._pid = os.getpid()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._loop, name=f'job-worker-{i}', daemon=True)
+                thread.start()
+        logger.info(f"🧵 Started {self.workers} job workers in process {self._pid}")
+
+    def notify(self):
+        """Wake idle workers after an enqueue"""
+        self._wakeup.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if time.time() - self._last_cleanup > self.cleanup_interval:
+                    self._last_cleanup = time.time()
+                    removed = self.queue.cleanup()
+                    if removed:
+                        logger.info(f"🧹 Removed {removed} expired jobs")
+                job = self.queue.claim()
+            except sqlite3.Error as e:
+                logger.error(f"Job queue error: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._run(job)
+
+    def _heartbeat(self, job, done):
+        """Renew the lease every third of its length until the job finishes"""
+        while not done.wait(self.queue.lease_seconds / 3):
+            try:
+                if not self.queue.renew(job['id'], job['attempts']):
+                    logger.warning(f"⚠️ Job {job['id'][:8]} lease lost")
+                    return
+            except sqlite3.Error as e:
+                logger.error(f"Job lease renewal failed: {e}")
+
+    def _run(self, job):
+        done = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(job, done), name='job-heartbeat', daemon=True).start()
+        try:
+            audio_data = self.run_job(job['params'])
+            if not audio_data:
+                raise RuntimeError('Failed to generate audio')
+            if self.queue.complete(job['id'], job['attempts'], audio_data):
+                logger.info(f"✅ Job {job['id'][:8]} done (attempt {job['attempts']})")
+            else:
+                logger.warning(f"⚠️ Job {job['id'][:8]} lease lost; dropped result of attempt {job['attempts']}")
+        except Exception as e:
+            retrying = self.queue.fail(job['id'], job['attempts'], str(e))
+            if retrying is None:
+                logger.warning(f"⚠️ Job {job['id'][:8]} lease lost; ignoring failure of attempt {job['attempts']}: {e}")
+            else:
+                logger.error(f"Job {job['id'][:8]} failed (attempt {job['attempts']}): {e}"
+                             + (" - will retry" if retrying else ""))
+        finally:
+            done.set()
@@ -0,0 +1,160 @@
+"""
+Memory-mapped Piper models shared by every worker process
+
+A plain InferenceSession(path) parses the .onnx into private heap memory
+and then pre-packs the weights into yet another private copy, so RSS grows
+with workers x voices. The store instead keeps a copy of each voice in
+voices/mmap/ with its weights split into an external-data file. ONNX
+Runtime maps external data straight from disk, and with pre-packing turned
+off the weights are used in place, so all workers share the same page cache
+pages and each one only holds the small graph privately.
+
+Converting needs the `onnx` package; loading an already converted model
+does not. Convert ahead of time with:
+    python model_store.py build [voice ...]
+"""
+import fcntl
+import json
+import logging
+import os
+import sys
+
+from voice_manager import voice_manager
+
+logger = logging.getLogger(__name__)
+
+try:
+    import onnx
+except ImportError:
+    onnx = None
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+# Initializers at least this large go into the mapped data file
+EXTERNAL_DATA_THRESHOLD = 1024
+
+
+class ModelStore:
+    """Converted, mmap-friendly copies of the voices in a VoiceManager's voices_dir"""
+
+    def __init__(self, voices=None, subdir='mmap', intra_op_threads=0):
+        self.voices = voices or voice_manager
+        self.store_dir = os.path.join(self.voices.voices_dir, subdir)
+        self.intra_op_threads = intra_op_threads
+
+    def _paths(self, voice_name):
+        base = os.path.join(self.store_dir, f"{voice_name}.onnx")
+        return base, f"{base}.data", f"{base}.source"
+
+    def _source_stamp(self, voice_name):
+        """Size and mtime of the installed model, known as soon as it is catalogued
+
+        Not the sha256: that is filled in by a background hash, and stamping
+        on it would reconvert the model in every worker until it lands.
+        """
+        entry = self.voices.catalog().get(voice_name)
+        return f"{entry['size']}:{entry['mtime_ns']}" if entry and entry['complete'] else None
+
+    def is_current(self, voice_name):
+        """True if the mapped copy exists and was built from the installed model"""
+        model_path, data_path, stamp_path = self._paths(voice_name)
+        try:
+            with open(stamp_path) as f:
+                stamp = f.read().strip()
+        except OSError:
+            return False
+        return os.path.exists(model_path) and os.path.exists(data_path) and stamp == self._source_stamp(voice_name)
+
+    def build(self, voice_name):
+        """Convert one installed voice; returns the mapped model path"""
+        if onnx is None:
+            raise RuntimeError("the onnx package is needed to convert models (pip install onnx)")
+        source = self.voices.get_voice_path(voice_name)
+        if source is None:
+            raise KeyError(f"Piper voice not downloaded: {voice_name}")
+        os.makedirs(self.store_dir, exist_ok=True)
+        model_path, data_path, stamp_path = self._paths(voice_name)
+
+        # Workers starting together convert each voice once
+        with open(f"{model_path}.lock", 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if self.is_current(voice_name):
+                return model_path
+            for path in (stamp_path, model_path, data_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+            model = onnx.load(source)
+            tmp_model = f"{model_path}.tmp"
+            onnx.save_model(
+                model, tmp_model,
+                save_as_external_data=True,
+                all_tensors_to_one_file=True,
+                location=os.path.basename(data_path),
+                size_threshold=EXTERNAL_DATA_THRESHOLD
+            )
+            # The data file is already in place; the graph and stamp make it visible
+            os.replace(tmp_model, model_path)
+            with open(f"{stamp_path}.tmp", 'w') as f:
+                f.write(self._source_stamp(voice_name) or '')
+            os.replace(f"{stamp_path}.tmp", stamp_path)
+        logger.info(f"🗺️ Converted {voice_name} for memory-mapped loading")
+        return model_path
+
+    def mapped_path(self, voice_name):
+        """Mapped model path, converting on first use; None when that is not possible"""
+        if self.is_current(voice_name):
+            return self._paths(voice_name)[0]
+        if onnx is None:
+            return None
+        return self.build(voice_name)
+
+    def session_options(self):
+        options = onnxruntime.SessionOptions()
+        # Pre-packing copies weights into private buffers, defeating the shared mapping
+        options.add_session_config_entry('session.disable_prepacking', '1')
+        if self.intra_op_threads:
+            options.intra_op_num_threads = self.intra_op_threads
+        return options
+
+    def load_session(self, voice_name, use_cuda=False):
+        """InferenceSession backed by the mapped copy (or the plain model as a fallback)"""
+        if onnxruntime is None:
+            raise RuntimeError("onnxruntime is not installed")
+        providers = ['CUDAExecutionProvider'] if use_cuda else ['CPUExecutionProvider']
+        model_path = self.mapped_path(voice_name)
+        if model_path is None:
+            logger.warning(f"⚠️ onnx not installed and {voice_name} not converted; loading a private copy")
+            return onnxruntime.InferenceSession(
+                self.voices.get_voice_path(voice_name), providers=providers
+            )
+        return onnxruntime.InferenceSession(model_path, sess_options=self.session_options(), providers=providers)
+
+    def load_voice(self, voice_name, use_cuda=False):
+        """PiperVoice whose session reads its weights from the shared mapping"""
+        from piper import PiperConfig, PiperVoice
+
+        config_path = self.voices.get_config_path(voice_name)
+        if config_path is None:
+            raise KeyError(f"Piper voice not downloaded: {voice_name}")
+        with open(config_path, encoding='utf-8') as f:
+            config = PiperConfig.from_dict(json.load(f))
+        return PiperVoice(session=self.load_session(voice_name, use_cuda), config=config)
+
+
+def store_from_env():
+    return ModelStore(intra_op_threads=int(os.environ.get('PIPER_INTRA_OP_THREADS', 0)))
+
+# Singleton instance
+model_store = store_from_env()
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != 'build':
+        print("Usage: python model_store.py build [voice ...]")
+        sys.exit(2)
+    logging.basicConfig(level=logging.INFO)
+    for name in sys.argv[2:] or model_store.voices.list_downloaded_voices():
+        print(f"✅ {name}: {model_store.build(name)}")
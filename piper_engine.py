@@ -0,0 +1,214 @@
+"""
+In-process Piper TTS engine
+
+Each voice's ONNX model is loaded once and its session stays resident, so
+synthesis is a function call instead of an HTTP hop to a separate
+`python -m piper` process. Loaded voices live in an LRU bounded by a memory
+budget estimated from the model file size; the least recently used voice is
+evicted when a new one would not fit.
+
+Usage: python piper_engine.py <voice> "text to speak" out.wav
+"""
+import io
+import logging
+import os
+import sys
+import threading
+import time
+import wave
+from collections import OrderedDict
+
+from model_store import model_store
+from voice_manager import voice_manager
+
+logger = logging.getLogger(__name__)
+
+try:
+    from piper import PiperVoice
+except ImportError:
+    PiperVoice = None
+
+try:
+    from piper import SynthesisConfig
+except ImportError:
+    # piper-tts < 1.3 takes synthesis options as keyword arguments
+    SynthesisConfig = None
+
+# ONNX Runtime holds the weights plus an activation arena, so a loaded voice
+# costs more than its file on disk
+PIPER_MEMORY_FACTOR = float(os.environ.get('PIPER_MEMORY_FACTOR', 2.0))
+
+
+def length_scale_for(rate):
+    """Edge-style rate ('+20%', '-10%') → Piper length_scale; None keeps the voice default"""
+    try:
+        percent = float(str(rate or '0').strip().rstrip('%'))
+    except ValueError:
+        return None
+    if percent == 0:
+        return None
+    return 1.0 / max(0.1, 1.0 + percent / 100.0)
+
+
+class LoadedVoice:
+    """A resident PiperVoice and its bookkeeping"""
+    __slots__ = ('name', 'voice', 'cost', 'load_seconds', 'lock', 'uses')
+
+    def __init__(self, name, voice, cost, load_seconds):
+        self.name = name
+        self.voice = voice
+        self.cost = cost
+        self.load_seconds = load_seconds
+        # The phonemizer (espeak-ng) is not re-entrant, so one synthesis per voice
+        # at a time; ONNX Runtime already spreads a single run across cores
+        self.lock = threading.Lock()
+        self.uses = 0
+
+    @property
+    def sample_rate(self):
+        return self.voice.config.sample_rate
+
+
+class PiperEngine:
+    """LRU of loaded Piper voices with a memory budget"""
+
+    def __init__(self, voices=None, memory_budget_mb=512, max_voices=0, use_cuda=False, store=None):
+        self.voices = voices or voice_manager
+        # ModelStore for memory-mapped weights shared across processes; None loads private copies
+        self.store = store
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.max_voices = max_voices
+        self.use_cuda = use_cuda
+        self._loaded = OrderedDict()
+        self._load_locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def available(self):
+        return PiperVoice is not None
+
+    def estimate_cost(self, model_path):
+        """Bytes a loaded model is expected to occupy"""
+        return int(os.path.getsize(model_path) * PIPER_MEMORY_FACTOR)
+
+    def _load(self, name):
+        if PiperVoice is None:
+            raise RuntimeError("piper-tts is not installed")
+        model_path = self.voices.get_voice_path(name)
+        if model_path is None:
+            raise KeyError(f"Piper voice not downloaded: {name}")
+        start = time.perf_counter()
+        if self.store is not None:
+            voice = self.store.load_voice(name, use_cuda=self.use_cuda)
+        else:
+            voice = PiperVoice.load(model_path, use_cuda=self.use_cuda)
+        load_seconds = time.perf_counter() - start
+        logger.info(f"🧠 Loaded Piper voice {name} in {load_seconds * 1000:.0f} ms")
+        return LoadedVoice(name, voice, self.estimate_cost(model_path), load_seconds)
+
+    def _evict(self):
+        # The voice just requested is the most recent, so it is never evicted,
+        # even if it alone exceeds the budget
+        while len(self._loaded) > 1 and (
+            self.used_bytes() > self.memory_budget
+            or (self.max_voices and len(self._loaded) > self.max_voices)
+        ):
+            name, entry = self._loaded.popitem(last=False)
+            self.evictions += 1
+            logger.info(f"♻️ Evicted Piper voice {name} ({entry.cost / 1e6:.0f} MB)")
+
+    def used_bytes(self):
+        return sum(entry.cost for entry in self._loaded.values())
+
+    def get_voice(self, name):
+        """The loaded voice, loading it (once, even under concurrency) on a miss"""
+        with self._lock:
+            entry = self._loaded.get(name)
+            if entry is not None:
+                self._loaded.move_to_end(name)
+                self.hits += 1
+                return entry
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                entry = self._loaded.get(name)
+                if entry is not None:
+                    self._loaded.move_to_end(name)
+                    self.hits += 1
+                    return entry
+            # Load outside the engine lock so other voices keep serving
+            entry = self._load(name)
+            with self._lock:
+                self.misses += 1
+                self._loaded[name] = entry
+                self._evict()
+        return entry
+
+    def is_loaded(self, name):
+        with self._lock:
+            return name in self._loaded
+
+    def unload(self, name):
+        with self._lock:
+            return self._loaded.pop(name, None) is not None
+
+    def synthesize(self, text, voice, rate=None, speaker_id=None):
+        """Synthesize text to WAV bytes"""
+        entry = self.get_voice(voice)
+        length_scale = length_scale_for(rate)
+        buffer = io.BytesIO()
+        with entry.lock:
+            with wave.open(buffer, 'wb') as wav_file:
+                if SynthesisConfig is not None:
+                    entry.voice.synthesize_wav(
+                        text, wav_file,
+                        syn_config=SynthesisConfig(speaker_id=speaker_id, length_scale=length_scale)
+                    )
+                else:
+                    entry.voice.synthesize(text, wav_file, speaker_id=speaker_id, length_scale=length_scale)
+            entry.uses += 1
+        return buffer.getvalue()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'available': self.available,
+                'loaded': [
+                    {'voice': entry.name, 'mb': round(entry.cost / 1e6, 1),
+                     'load_ms': round(entry.load_seconds * 1000), 'uses': entry.uses}
+                    for entry in self._loaded.values()
+                ],
+                'used_mb': round(self.used_bytes() / 1e6, 1),
+                'budget_mb': round(self.memory_budget / 1e6, 1),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+def engine_from_env():
+    return PiperEngine(
+        memory_budget_mb=float(os.environ.get('PIPER_MEMORY_MB', 512)),
+        max_voices=int(os.environ.get('PIPER_MAX_VOICES', 0)),
+        use_cuda=os.environ.get('PIPER_USE_CUDA', '0') == '1',
+        store=model_store if os.environ.get('PIPER_MMAP', '1') == '1' else None,
+    )
+
+# Singleton instance
+piper_engine = engine_from_env()
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(2)
+    logging.basicConfig(level=logging.INFO)
+    voice_name, text, out_path = sys.argv[1:]
+    start = time.perf_counter()
+    audio = piper_engine.synthesize(text, voice_name)
+    with open(out_path, 'wb') as f:
+        f.write(audio)
+    print(f"✅ Wrote {len(audio)} bytes to {out_path} in {time.perf_counter() - start:.2f} s")
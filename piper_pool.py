@@ -0,0 +1,280 @@
+"""
+Supervisor for a pool of Piper HTTP server processes
+
+Starts N `python -m piper.http_server` workers on consecutive ports, pumps
+each worker's stdout and stderr on its own thread (so a quiet pipe never
+blocks a busy one), restarts workers that exit with exponential backoff, and
+sends each request to the ready worker with the fewest requests in flight.
+A worker becomes ready once its port accepts connections and a warm-up
+synthesis has returned audio for every voice it should serve.
+"""
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from contextlib import contextmanager
+
+from readiness import wait_for_port, warmup_piper_http
+
+logger = logging.getLogger(__name__)
+
+PIPER_SERVER_MODULE = os.environ.get('PIPER_SERVER_MODULE', 'piper.http_server')
+
+
+class PiperProcess:
+    """One supervised Piper server"""
+
+    def __init__(self, index, host, port, command, start_timeout=60.0, warm_voices=(None,)):
+        self.index = index
+        self.host = host
+        self.port = port
+        self.command = command
+        self.start_timeout = start_timeout
+        self.warm_voices = warm_voices
+        self.process = None
+        self.ready = False
+        self.cold_start_seconds = None
+        self.outstanding = 0
+        self.served = 0
+        self.restarts = 0
+        self.failures = 0
+        self.started_at = 0.0
+        self.restart_at = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def routable(self):
+        return self.ready and self.alive()
+
+    def start(self):
+        self.process = subprocess.Popen(
+            self.command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1
+        )
+        self.started_at = time.monotonic()
+        self.restart_at = None
+        self.ready = False
+        for stream, label in ((self.process.stdout, 'Piper'), (self.process.stderr, 'Piper Error')):
+            threading.Thread(
+                target=self._pump, args=(stream, f"[{label} {self.index}]"), daemon=True
+            ).start()
+        threading.Thread(target=self._probe, args=(self.process,), daemon=True).start()
+        logger.info(f"🚀 Piper worker {self.index} started on {self.url} (pid {self.process.pid})")
+
+    def _probe(self, process):
+        """Wait for the port, warm every voice, then open the worker to traffic"""
+        listening = wait_for_port(self.host, self.port, self.start_timeout, process)
+        try:
+            if listening is None:
+                raise RuntimeError(f"not listening after {self.start_timeout:.0f}s")
+            timings = warmup_piper_http(self.url, self.warm_voices, timeout=self.start_timeout)
+        except Exception as e:
+            if process.poll() is None:
+                # A hung worker is killed so the supervisor restarts it
+                logger.error(f"❌ Piper worker {self.index} failed readiness: {e}")
+                process.kill()
+            return
+        if process is self.process:
+            self.cold_start_seconds = time.monotonic() - self.started_at
+            self.ready = True
+            warm = ', '.join(f"{voice} {seconds * 1000:.0f} ms" for voice, seconds in timings.items())
+            logger.info(
+                f"🔥 Piper worker {self.index} ready: listening after {listening:.2f}s, "
+                f"first audio after {self.cold_start_seconds:.2f}s (warm-up: {warm})"
+            )
+
+    def _pump(self, stream, prefix):
+        # readline() blocks only this thread; EOF arrives when the process exits
+        for line in iter(stream.readline, ''):
+            line = line.rstrip()
+            if line:
+                print(f"{prefix} {line}", flush=True)
+        stream.close()
+
+    def stop(self, timeout=5):
+        if not self.alive():
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+class PiperPool:
+    """N Piper workers behind least-outstanding-requests balancing"""
+
+    def __init__(self, model_path, workers=None, host='127.0.0.1', base_port=5002,
+                 backoff_base=0.5, backoff_max=30.0, stable_after=30.0, data_dir=None,
+                 module=PIPER_SERVER_MODULE, request_timeout=60, start_timeout=60.0,
+                 warm_voices=(None,)):
+        self.model_path = model_path
+        self.host = host
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stable_after = stable_after
+        self.request_timeout = request_timeout
+        data_dir = data_dir or os.path.dirname(os.path.abspath(model_path))
+
+        self.workers = []
+        for index in range(workers or os.cpu_count() or 1):
+            port = base_port + index
+            command = [
+                sys.executable, "-m", module,
+                "--model", model_path,
+                "--host", host,
+                "--port", str(port),
+                "--data-dir", data_dir
+            ]
+            self.workers.append(PiperProcess(index, host, port, command, start_timeout, warm_voices))
+
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._supervisor = None
+        self._next = 0
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+        self._supervisor = threading.Thread(target=self._supervise, daemon=True)
+        self._supervisor.start()
+        return self
+
+    def _supervise(self):
+        while not self._stopping.wait(0.5):
+            now = time.monotonic()
+            for worker in self.workers:
+                if worker.alive():
+                    if worker.failures and now - worker.started_at > self.stable_after:
+                        worker.failures = 0
+                    continue
+                if worker.restart_at is None:
+                    delay = min(self.backoff_max, self.backoff_base * (2 ** worker.failures))
+                    worker.failures += 1
+                    worker.restart_at = now + delay
+                    logger.warning(
+                        f"⚠️ Piper worker {worker.index} exited with code {worker.process.returncode}, "
+                        f"restarting in {delay:.1f}s"
+                    )
+                elif now >= worker.restart_at and not self._stopping.is_set():
+                    worker.restarts += 1
+                    try:
+                        worker.start()
+                    except OSError as e:
+                        logger.error(f"❌ Could not restart Piper worker {worker.index}: {e}")
+                        worker.restart_at = None
+
+    def _pick(self, exclude=()):
+        with self._lock:
+            live = [w for w in self.workers if w.routable() and w not in exclude]
+            if not live:
+                return None
+            # Rotate the starting point so ties spread across workers
+            self._next = (self._next + 1) % len(live)
+            rotated = live[self._next:] + live[:self._next]
+            worker = min(rotated, key=lambda w: w.outstanding)
+            worker.outstanding += 1
+            return worker
+
+    def _release(self, worker):
+        with self._lock:
+            worker.outstanding -= 1
+            worker.served += 1
+
+    @contextmanager
+    def acquire(self, exclude=()):
+        """Reserve the least-loaded live worker for one request"""
+        worker = self._pick(exclude)
+        if worker is None:
+            raise RuntimeError("No Piper workers are ready")
+        try:
+            yield worker
+        finally:
+            self._release(worker)
+
+    def forward(self, method, path, body=None, headers=None):
+        """Send one request to the pool; returns (status, headers, body)
+
+        A worker that refuses the connection (crashed or restarting) is skipped
+        and the request goes to the next least-loaded one.
+        """
+        tried = []
+        while True:
+            with self.acquire(exclude=tried) as worker:
+                request = urllib.request.Request(
+                    worker.url + path, data=body, method=method, headers=headers or {}
+                )
+                try:
+                    with urllib.request.urlopen(request, timeout=self.request_timeout) as response:
+                        return response.status, dict(response.headers), response.read()
+                except urllib.error.HTTPError as e:
+                    return e.code, dict(e.headers), e.read()
+                except (urllib.error.URLError, ConnectionError) as e:
+                    tried.append(worker)
+                    logger.warning(f"⚠️ Piper worker {worker.index} unreachable: {e}")
+                    if len(tried) >= len(self.workers):
+                        raise
+
+    def synthesize(self, text, voice=None, **options):
+        """Synthesize text to WAV bytes on the least-loaded worker"""
+        payload = dict(options, text=text)
+        if voice:
+            payload['voice'] = voice
+        status, _, body = self.forward(
+            'POST', '/synthesize', json.dumps(payload).encode('utf-8'),
+            {'Content-Type': 'application/json'}
+        )
+        if status != 200:
+            raise RuntimeError(f"Piper returned {status}: {body[:200]!r}")
+        return body
+
+    def ready(self):
+        return any(worker.routable() for worker in self.workers)
+
+    def wait_ready(self, timeout=60.0):
+        """Block until at least one worker is ready; returns True if one is"""
+        deadline = time.monotonic() + timeout
+        while not self.ready():
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return [
+                {
+                    'index': worker.index,
+                    'port': worker.port,
+                    'alive': worker.alive(),
+                    'ready': worker.routable(),
+                    'cold_start_seconds': worker.cold_start_seconds,
+                    'pid': worker.process.pid if worker.process else None,
+                    'outstanding': worker.outstanding,
+                    'served': worker.served,
+                    'restarts': worker.restarts,
+                }
+                for worker in self.workers
+            ]
+
+    def stop(self):
+        self._stopping.set()
+        for worker in self.workers:
+            worker.stop()
+        if self._supervisor is not None:
+            self._supervisor.join(timeout=2)
+        logger.info("✅ Piper pool stopped")
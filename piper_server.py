@@ -6,6 +6,19 @@ import sys
 import subprocess
 import time
 import atexit
+import threading
+
+from readiness import wait_for_port, warmup_piper_http
+
+PIPER_HOST = "127.0.0.1"
+PIPER_PORT = int(os.environ.get("PIPER_PORT", 5001))
+PIPER_START_TIMEOUT = float(os.environ.get("PIPER_START_TIMEOUT", 60))
+
+def pump(stream, prefix):
+    """Print a pipe line by line until the process closes it"""
+    for line in iter(stream.readline, ''):
+        if line.strip():
+            print(f"{prefix} {line.strip()}")
 
 def start_piper_server():
     """Start Piper TTS server"""
@@ -27,33 +40,39 @@ def start_piper_server():
     default_voice = "en_US-lessac-medium.onnx"
     voice_path = os.path.join(voices_dir, default_voice)
     
-    if not os.path.exists(voice_path):
-        print("📥 Downloading default voice...")
-        voice_url = "https://huggingface.co/rhasspy/piper-voices/resolve/v1.0.0/en/en_US/lessac/medium/en_US-lessac-medium.onnx"
-        
+    voice_url = "https://huggingface.co/rhasspy/piper-voices/resolve/v1.0.0/en/en_US/lessac/medium/en_US-lessac-medium.onnx"
+    
+    # The model needs its .onnx.json config next to it to load
+    for url, path in ((voice_url, voice_path), (f"{voice_url}.json", f"{voice_path}.json")):
+        if os.path.exists(path):
+            continue
+        print(f"📥 Downloading {os.path.basename(path)}...")
         try:
             import requests
-            response = requests.get(voice_url, stream=True)
-            with open(voice_path, 'wb') as f:
+            response = requests.get(url, stream=True)
+            response.raise_for_status()
+            with open(path, 'wb') as f:
                 for chunk in response.iter_content(chunk_size=8192):
                     f.write(chunk)
-            print(f"✅ Voice downloaded: {default_voice}")
+            print(f"✅ Downloaded: {os.path.basename(path)}")
         except Exception as e:
             print(f"❌ Failed to download voice: {e}")
             return
     
     # Start Piper server
     cmd = [
-        sys.executable, "-m", "piper",
+        sys.executable, "-m", "piper.http_server",
         "--model", voice_path,
-        "--host", "127.0.0.1",
-        "--port", "5001",
+        "--host", PIPER_HOST,
+        "--port", str(PIPER_PORT),
+        "--data-dir", voices_dir,
         "--debug"
     ]
     
     print(f"🔧 Starting command: {' '.join(cmd)}")
     
     try:
+        started = time.monotonic()
         process = subprocess.Popen(
             cmd,
             stdout=subprocess.PIPE,
@@ -70,32 +89,28 @@ def start_piper_server():
         
         atexit.register(cleanup)
         
-        # Wait a bit for server to start
-        time.sleep(3)
+        # Read both pipes in background so neither can fill up and block Piper
+        for stream, prefix in ((process.stdout, "[Piper]"), (process.stderr, "[Piper Error]")):
+            threading.Thread(target=pump, args=(stream, prefix), daemon=True).start()
         
-        # Check if server is running
-        if process.poll() is None:
-            print("✅ Piper TTS Server is running on http://localhost:5001")
-            
-            # Read output in background
-            import threading
-            
-            def read_output():
-                while True:
-                    output = process.stdout.readline()
-                    if output:
-                        print(f"[Piper] {output.strip()}")
-            
-            output_thread = threading.Thread(target=read_output, daemon=True)
-            output_thread.start()
-            
-            # Keep the process alive
-            process.wait()
-        else:
-            stdout, stderr = process.communicate()
-            print(f"❌ Piper server failed to start")
-            print(f"STDOUT: {stdout}")
-            print(f"STDERR: {stderr}")
+        # Wait until the server actually listens instead of sleeping a fixed time
+        listening = wait_for_port(PIPER_HOST, PIPER_PORT, PIPER_START_TIMEOUT, process)
+        if listening is None:
+            if process.poll() is None:
+                print(f"❌ Piper server not listening after {PIPER_START_TIMEOUT:.0f}s")
+            else:
+                print(f"❌ Piper server failed to start (exit code {process.returncode})")
+            return
+        print(f"✅ Piper TTS Server is listening on http://localhost:{PIPER_PORT} after {listening:.2f}s")
+        
+        # Pay model load and ONNX graph warm-up now, not on the first real request
+        warm_voices = [None] + [v.strip() for v in os.environ.get("PIPER_WARM_VOICES", "").split(",") if v.strip()]
+        for voice, seconds in warmup_piper_http(f"http://{PIPER_HOST}:{PIPER_PORT}", warm_voices).items():
+            print(f"🔥 Warmed {voice} in {seconds * 1000:.0f} ms")
+        print(f"✅ Piper TTS Server is ready: first audio {time.monotonic() - started:.2f}s after start")
+        
+        # Keep the process alive
+        process.wait()
             
     except Exception as e:
         print(f"❌ Error starting Piper server: {e}")
@@ -1,15 +1,72 @@
 """
-Piper TTS Worker - Simple Version
+Piper TTS Worker - a pool of Piper servers behind one port
 """
 import os
 import sys
-import subprocess
-import time
+import signal
+import threading
+import json
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from piper_pool import PiperPool
+from voice_manager import voice_manager
+
+# Headers that describe a single hop and must not be relayed
+HOP_HEADERS = {'connection', 'keep-alive', 'transfer-encoding', 'content-length', 'server', 'date'}
+
+def make_handler(pool):
+    class PoolHandler(BaseHTTPRequestHandler):
+        """Relays every request to the least-loaded Piper worker"""
+        protocol_version = 'HTTP/1.1'
+
+        def _relay(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else None
+            headers = {k: v for k, v in self.headers.items() if k.lower() not in HOP_HEADERS | {'host'}}
+            try:
+                status, response_headers, data = pool.forward(self.command, self.path, body, headers)
+            except Exception as e:
+                status, response_headers, data = 503, {'Content-Type': 'text/plain'}, str(e).encode()
+            self.send_response(status)
+            for key, value in response_headers.items():
+                if key.lower() not in HOP_HEADERS:
+                    self.send_header(key, value)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/ready':
+                # Load balancers route here only while some worker is warm
+                body = json.dumps({'ready': pool.ready(), 'workers': pool.stats()}).encode()
+                self.send_response(200 if pool.ready() else 503)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            self._relay()
+
+        do_POST = _relay
+
+        def log_message(self, format, *args):
+            pass
+
+    return PoolHandler
+
+def report_ready(pool):
+    if pool.wait_ready(timeout=300):
+        cold = min(w['cold_start_seconds'] for w in pool.stats() if w['ready'])
+        print(f"✅ Piper TTS pool is ready: first audio {cold:.2f}s after start")
+    else:
+        print("❌ No Piper worker became ready within 300s")
 
 def start_piper():
-    """Start Piper TTS server"""
+    """Start Piper TTS worker pool"""
     print("🚀 Starting Piper TTS...")
-    
+    logging.basicConfig(level=logging.INFO)
+
     # Check if piper-tts is installed
     try:
         import piper
@@ -17,76 +74,38 @@ def start_piper():
     except ImportError:
         print("❌ Piper TTS not installed. Please add to requirements.txt")
         return
-    
-    # Create voices directory
-    voices_dir = "voices"
-    os.makedirs(voices_dir, exist_ok=True)
-    
-    # Download a default voice if not exists
-    default_voice = "en_US-lessac-medium.onnx"
-    voice_path = os.path.join(voices_dir, default_voice)
-    
-    if not os.path.exists(voice_path):
-        print("📥 Downloading default voice...")
-        import requests
-        
-        voice_url = "https://huggingface.co/rhasspy/piper-voices/resolve/v1.0.0/en/en_US/lessac/medium/en_US-lessac-medium.onnx"
-        
-        try:
-            response = requests.get(voice_url, stream=True, timeout=30)
-            response.raise_for_status()
-            
-            with open(voice_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            print(f"✅ Voice downloaded: {default_voice}")
-        except Exception as e:
-            print(f"❌ Failed to download voice: {e}")
-            return
-    
-    # Start Piper HTTP server
-    print(f"🔧 Starting Piper server on port 5001...")
-    
-    cmd = [
-        sys.executable, "-m", "piper",
-        "--model", voice_path,
-        "--host", "0.0.0.0",
-        "--port", "5001"
-    ]
-    
+
+    # Download a default voice (model + config) if not exists
+    default_voice = os.environ.get('PIPER_VOICE', 'en_US-lessac-medium')
+    if not voice_manager.download_voice(default_voice, background=False):
+        print(f"❌ Failed to download voice: {default_voice}")
+        return
+    voice_path = voice_manager.get_voice_path(default_voice)
+
+    port = int(os.environ.get('PIPER_PORT', 5001))
+    workers = int(os.environ.get('PIPER_WORKERS', 0)) or os.cpu_count() or 1
+
+    # Workers listen on the ports after the public one
+    print(f"🔧 Starting {workers} Piper workers on ports {port + 1}-{port + workers}...")
+    # Every worker warms its default voice plus any listed in PIPER_WARM_VOICES
+    warm_voices = [None] + [v.strip() for v in os.environ.get('PIPER_WARM_VOICES', '').split(',') if v.strip()]
+    pool = PiperPool(voice_path, workers=workers, base_port=port + 1,
+                     data_dir=voice_manager.voices_dir, warm_voices=warm_voices).start()
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), make_handler(pool))
+    server.daemon_threads = True
+    # Turn SIGTERM (from the platform or a supervisor) into a clean shutdown of the pool
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"📡 Endpoint: http://localhost:{port} (readiness: /ready)")
+    threading.Thread(target=report_ready, args=(pool,), daemon=True).start()
+
     try:
-        # Run Piper server (this will block)
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        
-        print("✅ Piper TTS Server is running!")
-        print("📡 Endpoint: http://localhost:5001")
-        
-        # Print output
-        while True:
-            output = process.stdout.readline()
-            if output:
-                print(f"[Piper] {output.strip()}")
-            
-            error = process.stderr.readline()
-            if error:
-                print(f"[Piper Error] {error.strip()}")
-            
-            # Check if process is still running
-            if process.poll() is not None:
-                break
-            
-            time.sleep(0.1)
-                
-    except Exception as e:
-        print(f"❌ Error starting Piper: {e}")
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
     finally:
-        if 'process' in locals() and process.poll() is None:
-            process.terminate()
+        server.server_close()
+        pool.stop()
 
 if __name__ == "__main__":
     start_piper()
@@ -0,0 +1,92 @@
+"""
+Text preprocessing stage for /tts: optional Roman Urdu → Urdu script
+
+Off unless the request (or, when it does not say, TRANSLITERATE_DEFAULT)
+asks for it. With "transliterate": true every
+sentence is converted; with "auto", only for ur-PK voices and only the
+sentences whose words are mostly (TRANSLITERATE_MIN_COVERAGE) in the
+dictionary, since unknown words are spelled out letter by letter. Either
+way, if any sentence cannot be fully converted (it would keep Latin
+letters, or too few of its words are known) the whole text is left as
+typed, so the output is never mixed-script.
+"""
+import os
+import re
+import time
+from functools import lru_cache
+
+import roman_urdu
+
+# Voices whose text is transliterated when the request says 'auto'
+TRANSLITERATE_LOCALES = ('ur-PK',)
+
+# Keep sentence punctuation and line breaks attached to the piece they end
+SENTENCE_PIECES = re.compile(r'[^.!?\n]*(?:[.!?]+|\n+|$)')
+HAS_LATIN = re.compile(r'[A-Za-z]')
+
+PREPROCESS_CACHE_SIZE = int(os.environ.get('PREPROCESS_CACHE_SIZE', 4096))
+AUTO_MIN_COVERAGE = float(os.environ.get('TRANSLITERATE_MIN_COVERAGE', 0.8))
+# Mode for requests that send no "transliterate" field: off, on or auto
+# (auto converts Roman Urdu for ur-PK voices); "transliterate": false opts out
+TRANSLITERATE_DEFAULT = os.environ.get('TRANSLITERATE_DEFAULT', 'off')
+
+
+@lru_cache(maxsize=PREPROCESS_CACHE_SIZE)
+def _transliterate_sentence(sentence, dictionary_version, min_coverage):
+    # dictionary_version is part of the key so edits to ROMAN_TO_URDU invalidate entries
+    engine = roman_urdu.get_engine()
+    words = [word.lower() for word in engine.word_pattern.findall(sentence)]
+    known = sum(1 for word in words if engine.lookup(word) is not None)
+    if words and known / len(words) < min_coverage:
+        return sentence
+    converted = engine.convert(sentence)
+    return sentence if HAS_LATIN.search(converted) else converted
+
+
+def transliterate(text, min_coverage=0.0):
+    """Roman Urdu → Urdu, memoized per sentence so repeated phrases cost a dict hit"""
+    version = roman_urdu.ROMAN_TO_URDU.version
+    converted = ''.join(
+        _transliterate_sentence(piece, version, min_coverage) if HAS_LATIN.search(piece) else piece
+        for piece in SENTENCE_PIECES.findall(text)
+    )
+    return text if HAS_LATIN.search(converted) else converted
+
+
+def transliteration_mode(mode):
+    """Normalize a request's "transliterate" value to True, False or 'auto'; None means the server default"""
+    if mode is None:
+        mode = TRANSLITERATE_DEFAULT
+    if isinstance(mode, str):
+        mode = mode.lower()
+        if mode == 'auto':
+            return 'auto'
+        return mode in ('1', 'true', 'yes', 'on')
+    return bool(mode)
+
+
+def wants_transliteration(voice, mode=None):
+    """True forces it, 'auto' enables it for ur-PK voices, False skips it"""
+    mode = transliteration_mode(mode)
+    if mode == 'auto':
+        return voice.startswith(TRANSLITERATE_LOCALES)
+    return mode
+
+
+def preprocess_text(text, voice, mode=None):
+    """Run the preprocessing stage; returns (text, seconds spent)"""
+    start = time.perf_counter()
+    if wants_transliteration(voice, mode) and HAS_LATIN.search(text):
+        min_coverage = AUTO_MIN_COVERAGE if transliteration_mode(mode) == 'auto' else 0.0
+        text = transliterate(text, min_coverage)
+    return text, time.perf_counter() - start
+
+
+def stats():
+    info = _transliterate_sentence.cache_info()
+    return {
+        'sentence_cache_hits': info.hits,
+        'sentence_cache_misses': info.misses,
+        'sentence_cache_entries': info.currsize,
+        'sentence_cache_max': info.maxsize,
+    }
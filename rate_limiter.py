@@ -0,0 +1,181 @@
+"""
+Admission-control rate limiting (no sleeping in request threads)
+
+Each client key holds one fixed-size record: a ring of per-bucket counters
+for the sliding hourly window plus a cooldown token bucket. Records live in
+a backend: MemoryBackend for a single process, SQLiteBackend (WAL) to share
+one budget across gunicorn workers and keep it across restarts.
+"""
+import os
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+
+class RateLimitResult:
+    """Outcome of one admission check"""
+
+    __slots__ = ('allowed', 'reason', 'retry_after', 'remaining')
+
+    def __init__(self, allowed, reason=None, retry_after=0.0, remaining=0):
+        self.allowed = allowed
+        self.reason = reason            # None, 'window' or 'cooldown'
+        self.retry_after = retry_after  # seconds
+        self.remaining = remaining      # requests left in the window
+
+
+class RateLimiter:
+    """Sliding-window counter (ring of buckets) plus an optional cooldown bucket"""
+
+    def __init__(self, backend, limit=10, window=3600, buckets=12, cooldown=0.0):
+        self.backend = backend
+        self.limit = limit
+        self.window = window
+        self.buckets = buckets
+        self.bucket_seconds = window / buckets
+        self.cooldown = cooldown
+        # bucket index of the newest slot, cooldown tokens, cooldown timestamp, ring
+        self._record = struct.Struct(f'<qdd{buckets}H')
+
+    def hit(self, key, now=None, limit=None):
+        """Admit (and count) one request for `key`, or say why not"""
+        now = time.time() if now is None else now
+        limit = self.limit if limit is None else limit
+        return self.backend.update(key, now, lambda record: self._apply(record, now, limit))
+
+    def _apply(self, record, now, limit):
+        n = self.buckets
+        idx = int(now // self.bucket_seconds)
+        if record is None:
+            last_idx, tokens, updated, counts = idx, 1.0, now, [0] * n
+        else:
+            fields = self._record.unpack(record)
+            last_idx, tokens, updated, counts = fields[0], fields[1], fields[2], list(fields[3:])
+            # Zero the slots that scrolled out since the last hit
+            for b in range(last_idx + 1, min(idx, last_idx + n) + 1):
+                counts[b % n] = 0
+            last_idx = max(last_idx, idx)
+
+        total = sum(counts)
+        if total >= limit:
+            # The oldest non-empty bucket leaves the window first
+            wait = self.window
+            for b in range(idx - n + 1, idx + 1):
+                if counts[b % n]:
+                    wait = (b + n) * self.bucket_seconds - now
+                    break
+            result = RateLimitResult(False, 'window', max(wait, 0.0), 0)
+            return record, result
+
+        if self.cooldown > 0:
+            tokens = min(1.0, tokens + (now - updated) / self.cooldown)
+            if tokens < 1.0:
+                result = RateLimitResult(False, 'cooldown', (1.0 - tokens) * self.cooldown,
+                                         limit - total)
+                return self._record.pack(last_idx, tokens, now, *counts), result
+            tokens -= 1.0
+
+        counts[idx % n] += 1
+        result = RateLimitResult(True, None, 0.0, limit - total - 1)
+        return self._record.pack(last_idx, tokens, now, *counts), result
+
+
+class MemoryBackend:
+    """Per-process store: LRU of packed records with idle-key eviction"""
+
+    def __init__(self, max_keys=200000, idle_ttl=3600, sweep_every=256):
+        self.max_keys = max_keys
+        self.idle_ttl = idle_ttl
+        self.sweep_every = sweep_every
+        self.evictions = 0
+        self._records = OrderedDict()  # key -> (touched, record), oldest first
+        self._ops = 0
+        self._lock = threading.Lock()
+
+    def update(self, key, now, fn):
+        with self._lock:
+            entry = self._records.pop(key, None)
+            record, result = fn(entry[1] if entry else None)
+            if record is not None:
+                self._records[key] = (now, record)
+            self._ops += 1
+            if self._ops % self.sweep_every == 0 or len(self._records) > self.max_keys:
+                self._sweep(now)
+            return result
+
+    def _sweep(self, now):
+        # Records are ordered by last touch, so idle ones sit at the front
+        while self._records:
+            key, (touched, _) = next(iter(self._records.items()))
+            if len(self._records) <= self.max_keys and now - touched < self.idle_ttl:
+                break
+            del self._records[key]
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._records)
+
+
+class SQLiteBackend:
+    """Records in a WAL-mode SQLite file shared by every worker process"""
+
+    def __init__(self, path, idle_ttl=3600, sweep_every=1024):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self.sweep_every = sweep_every
+        self._local = threading.local()
+        self._ops = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute('''CREATE TABLE IF NOT EXISTS rate_limits (
+                            key TEXT PRIMARY KEY,
+                            touched REAL NOT NULL,
+                            record BLOB NOT NULL
+                        ) WITHOUT ROWID''')
+        conn.execute('CREATE INDEX IF NOT EXISTS rate_limits_touched ON rate_limits (touched)')
+
+    def _conn(self):
+        # One connection per thread; sqlite3 connections are not shareable
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def update(self, key, now, fn):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT record FROM rate_limits WHERE key = ?', (key,)).fetchone()
+            record, result = fn(row[0] if row else None)
+            if record is not None:
+                conn.execute('INSERT OR REPLACE INTO rate_limits (key, touched, record) VALUES (?, ?, ?)',
+                             (key, now, record))
+            self._ops += 1
+            if self._ops % self.sweep_every == 0:
+                conn.execute('DELETE FROM rate_limits WHERE touched < ?', (now - self.idle_ttl,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return result
+
+    def __len__(self):
+        return self._conn().execute('SELECT COUNT(*) FROM rate_limits').fetchone()[0]
+
+
+def limiter_from_env(limit=10, window=3600, cooldown=0.0):
+    """Build a limiter from RATE_LIMIT_BACKEND / RATE_LIMIT_DB"""
+    idle_ttl = window + cooldown
+    if os.environ.get('RATE_LIMIT_BACKEND', 'sqlite') == 'memory':
+        backend = MemoryBackend(idle_ttl=idle_ttl)
+    else:
+        path = os.environ.get('RATE_LIMIT_DB', os.path.join('cache', 'ratelimit.sqlite3'))
+        backend = SQLiteBackend(path, idle_ttl=idle_ttl)
+    return RateLimiter(backend, limit=limit, window=window, cooldown=cooldown)
@@ -0,0 +1,105 @@
+"""
+Readiness tracking: active port probing and warm-up timing
+
+A process is ready only once every registered check has passed, e.g. the
+Piper server is listening and each of its voices has produced audio once.
+Times are measured from process start, so "cold start to first audio" is
+what a load balancer would actually wait for.
+"""
+import json
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+
+PROCESS_STARTED = time.monotonic()
+
+# Short enough to warm in well under a second, long enough to touch the whole graph
+WARMUP_TEXT = "Ready."
+
+
+def wait_for_port(host, port, timeout=30.0, process=None, interval=0.05):
+    """Poll until host:port accepts TCP connections
+
+    Returns the seconds waited, or None on timeout or if `process` exits first.
+    """
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        if process is not None and process.poll() is not None:
+            return None
+        try:
+            socket.create_connection((host, port), timeout=min(1.0, timeout)).close()
+            return time.monotonic() - start
+        except OSError:
+            time.sleep(interval)
+    return None
+
+
+def warmup_piper_http(base_url, voices=(None,), text=WARMUP_TEXT, timeout=120.0):
+    """One short synthesis per voice against a Piper HTTP server; returns {voice: seconds}"""
+    timings = {}
+    for voice in voices:
+        payload = {'text': text}
+        if voice:
+            payload['voice'] = voice
+        request = urllib.request.Request(
+            f"{base_url}/synthesize",
+            data=json.dumps(payload).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        start = time.monotonic()
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            if not response.read():
+                raise RuntimeError(f"Empty warm-up audio for {voice or 'default voice'}")
+        timings[voice or 'default'] = time.monotonic() - start
+    return timings
+
+
+class Readiness:
+    """Named checks that must all pass before the process takes traffic"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checks = {}
+
+    def add(self, name):
+        with self._lock:
+            self._checks[name] = {'status': 'pending'}
+
+    def passed(self, name, **detail):
+        with self._lock:
+            self._checks[name] = dict(
+                detail, status='ready', since_start=round(time.monotonic() - PROCESS_STARTED, 3)
+            )
+
+    def failed(self, name, error):
+        with self._lock:
+            self._checks[name] = {'status': 'failed', 'error': str(error)}
+
+    def run(self, name, check):
+        """Run check() on a background thread; its dict result becomes the check's detail"""
+        self.add(name)
+
+        def runner():
+            try:
+                self.passed(name, **(check() or {}))
+            except Exception as e:
+                self.failed(name, e)
+
+        thread = threading.Thread(target=runner, name=f"readiness-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def is_ready(self):
+        with self._lock:
+            return all(check['status'] == 'ready' for check in self._checks.values())
+
+    def payload(self):
+        with self._lock:
+            return {
+                'ready': all(check['status'] == 'ready' for check in self._checks.values()),
+                'uptime': round(time.monotonic() - PROCESS_STARTED, 3),
+                'checks': {name: dict(check) for name, check in self._checks.items()},
+            }
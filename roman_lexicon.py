@@ -0,0 +1,155 @@
+"""
+Compact, memory-mapped Roman Urdu lexicon
+
+A compiled lexicon is one read-only file:
+
+    header   magic, entry count, longest phrase (in words)
+    offsets  (count + 1) uint32 key offsets, then (count + 1) uint32 value offsets
+    keys     UTF-8 keys, sorted bytewise, concatenated
+    values   UTF-8 Urdu values, concatenated in key order
+
+Lookups binary-search the mmap directly, so nothing is unpacked into
+Python objects up front and every gunicorn worker shares the same page
+cache pages instead of holding a private dict. Two small per-process
+structures keep that fast: a sparse index of every SPARSE_STEP-th key, so
+the search bisects in C before probing the mmap, and a bounded dict of hot
+results (hits and misses, oldest dropped first) in front of it all, since
+word frequencies in running text are skewed enough that most lookups
+never reach the mmap.
+
+Build one from a tab-separated "roman<TAB>urdu" file:
+    python roman_lexicon.py build lexicon.tsv lexicon.lex
+"""
+import mmap
+import os
+import struct
+import sys
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+
+MAGIC = b'RULEX001'
+HEADER = struct.Struct('<8sII')
+SPARSE_STEP = 16
+
+
+def compile_lexicon(tsv_path, out_path):
+    """Compile a TSV lexicon into the binary format; returns the entry count"""
+    entries = {}
+    with open(tsv_path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line or line.startswith('#') or '\t' not in line:
+                continue
+            roman, urdu = line.split('\t', 1)
+            roman = ' '.join(roman.lower().split())
+            if roman and urdu:
+                entries[roman.encode('utf-8')] = urdu.strip().encode('utf-8')
+
+    keys = sorted(entries)
+    max_words = max((key.count(b' ') + 1 for key in keys), default=1)
+
+    key_offsets, value_offsets = [0], [0]
+    for key in keys:
+        key_offsets.append(key_offsets[-1] + len(key))
+        value_offsets.append(value_offsets[-1] + len(entries[key]))
+
+    tmp_path = f"{out_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(keys), max_words))
+        f.write(struct.pack(f'<{len(key_offsets)}I', *key_offsets))
+        f.write(struct.pack(f'<{len(value_offsets)}I', *value_offsets))
+        for key in keys:
+            f.write(key)
+        for key in keys:
+            f.write(entries[key])
+    os.replace(tmp_path, out_path)
+    return len(keys)
+
+
+class Lexicon:
+    """Read-only view of a compiled lexicon file"""
+
+    def __init__(self, path, cache_size=32768):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.max_phrase_words = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a compiled Roman Urdu lexicon")
+        if sys.byteorder != 'little':
+            raise ValueError("Compiled lexicons are little-endian")
+        n = self.count + 1
+        # Zero-copy uint32 views of the offset tables
+        view = memoryview(self._map)
+        self._key_offsets = view[HEADER.size:HEADER.size + 4 * n].cast('I')
+        self._value_offsets = view[HEADER.size + 4 * n:HEADER.size + 8 * n].cast('I')
+        self._keys = HEADER.size + 8 * n
+        self._values = self._keys + self._key_offsets[self.count]
+        self._sparse = [self._key(i) for i in range(0, self.count, SPARSE_STEP)]
+        self.cache_size = cache_size
+        self._hot = OrderedDict()
+        self._hot_lock = threading.Lock()
+
+    def _key(self, i):
+        offsets = self._key_offsets
+        return self._map[self._keys + offsets[i]:self._keys + offsets[i + 1]]
+
+    def _value(self, i):
+        offsets = self._value_offsets
+        return self._map[self._values + offsets[i]:self._values + offsets[i + 1]].decode('utf-8')
+
+    def _search(self, key):
+        target = key.encode('utf-8')
+        block = bisect_right(self._sparse, target) - 1
+        if block < 0:
+            return None
+        lo = block * SPARSE_STEP
+        hi = min(lo + SPARSE_STEP, self.count)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            probe = self._key(mid)
+            if probe < target:
+                lo = mid + 1
+            elif probe > target:
+                hi = mid
+            else:
+                return self._value(mid)
+        return None
+
+    def get(self, key, default=None):
+        """Urdu for a lowercase Roman word or phrase: hot dict, then binary search"""
+        value = self._hot.get(key)
+        if value is None:
+            # '' records a miss; compiled values are never empty
+            value = self._search(key) or ''
+            if self.cache_size:
+                with self._hot_lock:
+                    if len(self._hot) >= self.cache_size:
+                        self._hot.popitem(last=False)
+                    self._hot[key] = value
+        return value or default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self._hot.clear()
+        self._key_offsets.release()
+        self._value_offsets.release()
+        self._map.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == 'build':
+        count = compile_lexicon(sys.argv[2], sys.argv[3])
+        print(f"✅ Compiled {count} entries into {sys.argv[3]}")
+    elif len(sys.argv) == 4 and sys.argv[1] == 'lookup':
+        print(Lexicon(sys.argv[2]).get(' '.join(sys.argv[3].lower().split())))
+    else:
+        print("Usage: python roman_lexicon.py build <lexicon.tsv> <lexicon.lex>")
+        print("       python roman_lexicon.py lookup <lexicon.lex> <word>")
+        sys.exit(2)
@@ -1,10 +1,65 @@
 """
 Roman Urdu to Urdu Text Converter
+
+Command line (reads a file or stdin, writes stdout or -o, reports lines/sec):
+    python roman_urdu.py chat_export.txt -o chat_export.ur.txt -j 4
+    cat subtitles.srt | python roman_urdu.py > subtitles.ur.srt
+    python roman_urdu.py --test
 """
+import argparse
+import multiprocessing
+import os
 import re
+import sys
+import time
+from collections import deque
+from itertools import islice
+
+from roman_lexicon import Lexicon
+
+
+class TransliterationDict(dict):
+    """dict that counts mutations, so the compiled engine knows when to rebuild"""
+
+    version = 0
+
+    def _changed(self):
+        self.version += 1
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._changed()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._changed()
+
+    def pop(self, *args):
+        result = super().pop(*args)
+        self._changed()
+        return result
+
+    def popitem(self):
+        result = super().popitem()
+        self._changed()
+        return result
+
+    def setdefault(self, key, default=None):
+        result = super().setdefault(key, default)
+        self._changed()
+        return result
+
+    def clear(self):
+        super().clear()
+        self._changed()
+
 
 # Roman Urdu to Urdu mapping
-ROMAN_TO_URDU = {
+ROMAN_TO_URDU = TransliterationDict({
     # Single letters
     'a': 'ا', 'b': 'ب', 'p': 'پ', 't': 'ت', 'ṭ': 'ٹ',
     's': 'س', 'j': 'ج', 'ch': 'چ', 'h': 'ح', 'kh': 'خ',
@@ -66,11 +121,153 @@ ROMAN_TO_URDU = {
     'mohabbat': 'محبت',
     'dost': 'دوست',
     'yaar': 'یار',
+    'naam': 'نام',
+    'ahmed': 'احمد',
+    'kitne': 'کتنے',
+    'hafiz': 'حافظ',
+    'allah hafiz': 'اللہ حافظ',
     
     # Numbers
     '0': '۰', '1': '۱', '2': '۲', '3': '۳', '4': '۴',
     '5': '۵', '6': '۶', '7': '۷', '8': '۸', '9': '۹',
-}
+})
+
+# Punctuation converted outside words
+URDU_PUNCTUATION = {'?': '؟'}
+
+# Latin letters (including the dotted retroflex ones) that make up a Roman word
+ROMAN_LETTER = r"[A-Za-z\u1e00-\u1eff]"
+
+class TransliterationEngine:
+    """
+    Precompiled single-pass converter built from a mapping.
+
+    Keys are sorted into three kinds:
+      * letter units - one letter, or a letter + 'h' digraph (ch, kh, sh...);
+        used only to spell out words that have no whole-word entry
+      * words and phrases - matched only as complete words, longest first
+      * single non-letters (digits) - translated wherever they appear
+    Each token is converted exactly once, so output is never rewritten.
+
+    An optional compiled Lexicon backs the in-memory words: entries in the
+    mapping win, then the lexicon is searched, then the word is spelled out.
+    """
+
+    def __init__(self, mapping, lexicon=None):
+        self.lexicon = lexicon
+        self.words = {}
+        units = {}
+        symbols = dict(URDU_PUNCTUATION)
+        for roman, urdu in mapping.items():
+            key = roman.lower()
+            if len(key) == 1 and not key.isalpha():
+                symbols[key] = urdu
+            elif len(key) == 1 or (len(key) == 2 and key[1] == 'h'):
+                units[key] = urdu
+            else:
+                self.words[key] = urdu
+
+        self.units = units
+        self.unit_pattern = re.compile(
+            '|'.join(re.escape(k) for k in sorted(units, key=len, reverse=True)),
+            re.IGNORECASE
+        ) if units else None
+        self.symbols = str.maketrans(symbols)
+
+        # One alternation: known multi-word phrases (longest first, bounded by
+        # non-letters on both sides), otherwise any single Roman word
+        phrases = sorted((k for k in self.words if ' ' in k), key=len, reverse=True)
+        letter = ROMAN_LETTER
+        alternatives = []
+        if phrases:
+            alternatives.append(
+                f"(?<!{letter})(?:{'|'.join(re.escape(p) for p in phrases)})(?!{letter})"
+            )
+        alternatives.append(f"{letter}+")
+        self.token_pattern = re.compile('|'.join(alternatives), re.IGNORECASE)
+        self.word_pattern = re.compile(f"{letter}+")
+        self.max_phrase_words = max(
+            max((len(k.split()) for k in self.words), default=1),
+            lexicon.max_phrase_words if lexicon is not None else 1
+        )
+
+    def spell(self, word):
+        """Letter-by-letter fallback, longest unit first; unmapped letters keep their case"""
+        if self.unit_pattern is None:
+            return word
+        return self.unit_pattern.sub(lambda m: self.units[m.group(0).lower()], word)
+
+    def lookup(self, word):
+        """Whole-word (or phrase) entry for a lowercase key, or None"""
+        urdu = self.words.get(word)
+        if urdu is None and self.lexicon is not None:
+            urdu = self.lexicon.get(word)
+        return urdu
+
+    def _token(self, match):
+        word = match.group(0)
+        urdu = self.lookup(word.lower())
+        return urdu if urdu is not None else self.spell(word)
+
+    def convert(self, text):
+        # Symbols never occur inside words, so translating them first is safe
+        text = text.translate(self.symbols)
+        if self.lexicon is None or self.lexicon.max_phrase_words == 1:
+            return self.token_pattern.sub(self._token, text)
+        return self._convert_phrases(text)
+
+    def _convert_phrases(self, text):
+        """Left-to-right longest match over lexicon phrases of up to max_phrase_words"""
+        words = list(self.word_pattern.finditer(text))
+        out = []
+        last = 0
+        i = 0
+        while i < len(words):
+            start = words[i].start()
+            out.append(text[last:start])
+            urdu, used = None, 1
+            for n in range(min(self.max_phrase_words, len(words) - i), 1, -1):
+                # Phrase words must be separated by exactly one space
+                if any(text[words[j].end():words[j + 1].start()] != ' ' for j in range(i, i + n - 1)):
+                    continue
+                urdu = self.lookup(text[start:words[i + n - 1].end()].lower())
+                if urdu is not None:
+                    used = n
+                    break
+            if urdu is None:
+                word = words[i].group(0)
+                urdu = self.lookup(word.lower())
+                if urdu is None:
+                    urdu = self.spell(word)
+            out.append(urdu)
+            last = words[i + used - 1].end()
+            i += used
+        out.append(text[last:])
+        return ''.join(out)
+
+
+_engine = None
+_engine_version = None
+_lexicon = None
+
+def load_lexicon(path):
+    """Back the converter with a compiled lexicon file (see roman_lexicon.py)"""
+    global _lexicon, _engine
+    cache_size = int(os.environ.get('ROMAN_URDU_LEXICON_CACHE', 32768))
+    _lexicon = Lexicon(path, cache_size=cache_size) if path else None
+    _engine = None
+    return _lexicon
+
+def get_engine():
+    """Compiled engine for ROMAN_TO_URDU, rebuilt only after the dict changes"""
+    global _engine, _engine_version
+    if _engine is None or _engine_version != ROMAN_TO_URDU.version:
+        _engine_version = ROMAN_TO_URDU.version
+        _engine = TransliterationEngine(ROMAN_TO_URDU, _lexicon)
+    return _engine
+
+if os.environ.get('ROMAN_URDU_LEXICON'):
+    load_lexicon(os.environ['ROMAN_URDU_LEXICON'])
 
 def roman_urdu_to_urdu_text(text):
     """
@@ -83,41 +280,107 @@ def roman_urdu_to_urdu_text(text):
     if not text:
         return text
     
-    # Convert to lowercase for processing
-    text_lower = text.lower()
-    
-    # Replace common phrases first
-    urdu_text = text
-    
-    # Sort keys by length (longest first) to prevent partial matches
-    sorted_keys = sorted(ROMAN_TO_URDU.keys(), key=len, reverse=True)
-    
-    for roman in sorted_keys:
-        if roman in text_lower:
-            # Replace with Urdu, preserving original case context
-            pattern = re.compile(re.escape(roman), re.IGNORECASE)
-            urdu_text = pattern.sub(ROMAN_TO_URDU[roman], urdu_text)
-    
-    # Add Urdu punctuation
-    urdu_text = urdu_text.replace('?', '؟')
-    
-    return urdu_text
+    return get_engine().convert(text)
 
-# Test function
-if __name__ == "__main__":
-    test_cases = [
-        ("salam", "سلام"),
-        ("aap kaise hain?", "آپ کیسے ہیں؟"),
-        ("mera naam ahmed hai", "میرا نام احمد ہے"),
-        ("shukriya", "شکریہ"),
-        ("allah hafiz", "اللہ حافظ"),
-        ("ye kitne ka hai?", "یہ کتنے کا ہے؟"),
-    ]
+def convert_lines(lines):
+    """Convert an iterable of lines lazily; memory stays constant for any input size"""
+    engine = get_engine()
+    for line in lines:
+        yield engine.convert(line)
+
+def _init_worker(lexicon_path):
+    if lexicon_path:
+        load_lexicon(lexicon_path)
+
+def _convert_batch(batch):
+    return [roman_urdu_to_urdu_text(line) for line in batch]
+
+def convert_stream(infile, outfile, processes=1, batch_lines=2000):
+    """
+    Convert a text stream line by line; returns the number of lines written.
+    With processes > 1 batches of lines are sharded across a worker pool,
+    with only a few batches in flight so memory stays bounded and output
+    keeps input order.
+    """
+    if processes <= 1:
+        count = 0
+        for line in convert_lines(infile):
+            outfile.write(line)
+            count += 1
+        return count
     
+    lines = iter(infile)
+    pending = deque()
+    count = 0
+    lexicon_path = _lexicon.path if _lexicon is not None else None
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(lexicon_path,)) as pool:
+        while True:
+            while len(pending) < processes * 2:
+                batch = list(islice(lines, batch_lines))
+                if not batch:
+                    break
+                pending.append(pool.apply_async(_convert_batch, (batch,)))
+            if not pending:
+                break
+            converted = pending.popleft().get()
+            outfile.writelines(converted)
+            count += len(converted)
+    return count
+
+TEST_CASES = [
+    ("salam", "سلام"),
+    ("aap kaise hain?", "آپ کیسے ہیں؟"),
+    ("mera naam ahmed hai", "میرا نام احمد ہے"),
+    ("shukriya", "شکریہ"),
+    ("allah hafiz", "اللہ حافظ"),
+    ("ye kitne ka hai?", "یہ کتنے کا ہے؟"),
+]
+
+def run_self_test():
+    """Check TEST_CASES; returns the number of failures"""
     print("🧪 Testing Roman Urdu Converter:")
     print("-" * 40)
     
-    for roman, expected in test_cases:
+    failures = 0
+    for roman, expected in TEST_CASES:
         result = roman_urdu_to_urdu_text(roman)
         status = "✅" if result == expected else "❌"
+        failures += result != expected
         print(f"{status} {roman:30} → {result:20} (Expected: {expected})")
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert Roman Urdu text to Urdu script")
+    parser.add_argument('path', nargs='?', help="input file (default: stdin)")
+    parser.add_argument('-o', '--output', help="output file (default: stdout)")
+    parser.add_argument('-j', '--processes', type=int, default=1,
+                        help="worker processes for large inputs (0 = one per CPU)")
+    parser.add_argument('--lexicon', help="compiled lexicon file (see roman_lexicon.py)")
+    parser.add_argument('--test', action='store_true', help="run the built-in test cases")
+    args = parser.parse_args(argv)
+    
+    # Bare `python roman_urdu.py` at a terminal keeps running the self-test
+    if args.test or (args.path is None and sys.stdin.isatty()):
+        return 1 if run_self_test() else 0
+    
+    if args.lexicon:
+        load_lexicon(args.lexicon)
+    processes = args.processes or os.cpu_count() or 1
+    
+    infile = open(args.path, encoding='utf-8') if args.path and args.path != '-' else sys.stdin
+    outfile = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    start = time.perf_counter()
+    try:
+        count = convert_stream(infile, outfile, processes=processes)
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+    elapsed = time.perf_counter() - start
+    print(f"✅ {count} lines in {elapsed:.2f}s ({count / elapsed if elapsed else 0:,.0f} lines/sec, "
+          f"{processes} process{'es' if processes > 1 else ''})", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Incremental synthesis: per-sentence audio cache for edited texts
+
+A multi-sentence text is synthesized one sentence at a time, and each
+sentence's MP3 is stored in the shared audio cache under its own key
+(sentence, voice, pitch, rate). Regenerating an edited document then only
+sends the new or changed sentences upstream; the cached ones are spliced
+back in as they are, since Edge's MP3 frames can be concatenated at frame
+boundaries. The gap is silence between sentences, so it is not part of the key.
+
+Sentence lookups keep their own hit/miss counters, so the audio cache's
+hit_ratio still means "requests served from cache".
+"""
+import asyncio
+import logging
+import threading
+from collections import Counter
+
+from segmenter import iter_segment_audio, mp3_silence
+from tts_cache import cache_key
+
+logger = logging.getLogger(__name__)
+
+
+class SentenceCache:
+    """Sentence-level units over an AudioCache, with reuse accounting"""
+
+    def __init__(self, cache, enabled=True):
+        self.cache = cache
+        self.enabled = enabled
+        self.requests = 0
+        self.sentences = 0
+        self.reused = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, sentence, voice, pitch, rate):
+        return cache_key(sentence, voice, pitch, rate, 0, namespace='sentence')
+
+    def _lookup(self, keys):
+        cached = {}
+        for key in set(keys):
+            audio = self.cache.get(key, count=False)
+            if audio is not None:
+                cached[key] = audio
+        return cached
+
+    async def stream(self, sentences, voice, pitch, rate, gap, synthesize, concurrency=4, info=None):
+        """
+        Yield the document's MP3 in order: cached sentences as stored,
+        missing ones from synthesize(sentence), at most `concurrency` at a time.
+        `info`, if given, receives the sentence count and how many were reused.
+        """
+        keys = [self.key(sentence, voice, pitch, rate) for sentence in sentences]
+        # Disk reads off the event loop, which other streams share
+        cached = await asyncio.to_thread(self._lookup, keys)
+        reused = sum(1 for key in keys if key in cached)
+        with self._lock:
+            self.requests += 1
+            self.sentences += len(sentences)
+            self.reused += reused
+            # Per distinct sentence: a repeat within the document is one lookup
+            self.hits += len(cached)
+            self.misses += len(set(keys)) - len(cached)
+        logger.info(f"♻️ Reusing {reused}/{len(sentences)} cached sentences")
+        if info is not None:
+            info.update(sentences=len(sentences), sentences_reused=reused)
+
+        # A sentence repeated within the document is looked up, synthesized and
+        # stored once, then its audio is fanned out to every occurrence
+        distinct = list(dict.fromkeys(keys))
+        sentence_for = dict(zip(keys, sentences))
+        remaining = Counter(keys)
+
+        async def unit(key):
+            if key in cached:
+                return cached[key]
+            audio = await synthesize(sentence_for[key])
+            await asyncio.to_thread(self.cache.put, key, audio)
+            return audio
+
+        units = iter_segment_audio(distinct, unit, concurrency)
+        ready = {}
+        produced = 0
+        silence = mp3_silence(gap)
+        try:
+            for i, key in enumerate(keys):
+                # Distinct keys arrive in first-occurrence order, so this one is next at the latest
+                while key not in ready:
+                    ready[distinct[produced]] = await units.__anext__()
+                    produced += 1
+                if i and silence:
+                    yield silence
+                remaining[key] -= 1
+                yield ready[key] if remaining[key] else ready.pop(key)
+        finally:
+            await units.aclose()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'requests': self.requests,
+                'sentences': self.sentences,
+                'reused': self.reused,
+                'reuse_ratio': round(self.reused / self.sentences, 3) if self.sentences else None,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / (self.hits + self.misses), 3) if self.hits + self.misses else None,
+            }
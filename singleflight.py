@@ -0,0 +1,208 @@
+"""
+Single-flight coalescing of identical in-flight syntheses
+
+The first request for a key starts the synthesis as a task of its own;
+every request for the same key that arrives while it runs follows that
+flight instead of calling upstream again. Followers replay the chunks
+produced so far and then receive new ones as they arrive, so streaming
+responses are a tee of the one upstream stream and buffered ones get the
+same bytes. A client that disconnects does not cancel the flight for the
+others, but once the last subscriber has gone the upstream task is
+cancelled.
+
+Replaying needs the chunks from the start, so a flight keeps them only
+while it can still be joined: after `retain_bytes` of audio (the same
+bound as the per-request buffering cap) it stops taking new subscribers,
+later requests start a flight of their own, and each chunk is dropped as
+soon as every current subscriber has read it.
+
+Flights can be joined from any thread and any event loop (gunicorn
+threads share the background loop, uvicorn has its own); new chunks wake
+each follower on its own loop with call_soon_threadsafe.
+"""
+import asyncio
+import threading
+
+
+class Flight:
+    """Chunks of one synthesis in progress, shared by everyone waiting on it"""
+
+    def __init__(self, retain_bytes):
+        self.retain_bytes = retain_bytes
+        self.chunks = []
+        # Index of chunks[0] in the whole stream, once earlier chunks were dropped
+        self.base = 0
+        self.published = 0
+        self.joinable = True
+        self.done = False
+        self.error = None
+        self.route = {}
+        self.task = None
+        self._positions = {}
+        self._waiters = []
+        self._lock = threading.Lock()
+
+    def _wake(self, waiters):
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # That follower's loop has shut down
+                pass
+
+    def _trim(self):
+        """Drop chunks every subscriber has read (caller holds the lock)"""
+        if self.joinable:
+            return
+        low = min(self._positions.values(), default=self.base + len(self.chunks))
+        if low > self.base:
+            del self.chunks[:low - self.base]
+            self.base = low
+
+    def subscribe(self, token):
+        """Register a follower at the start; False once late joiners can no longer replay"""
+        with self._lock:
+            if not self.joinable:
+                return False
+            self._positions[token] = 0
+            return True
+
+    def unsubscribe(self, token):
+        """Remove a follower; returns how many remain"""
+        with self._lock:
+            self._positions.pop(token, None)
+            self._trim()
+            return len(self._positions)
+
+    def publish(self, chunk):
+        """Append a chunk; returns True when this chunk closed the flight to joiners"""
+        with self._lock:
+            self.chunks.append(chunk)
+            self.published += len(chunk)
+            closed = self.joinable and self.published > self.retain_bytes
+            if closed:
+                self.joinable = False
+            self._trim()
+            waiters, self._waiters = self._waiters, []
+        self._wake(waiters)
+        return closed
+
+    def finish(self, error=None):
+        with self._lock:
+            self.done = True
+            self.joinable = False
+            self.error = error
+            waiters, self._waiters = self._waiters, []
+        self._wake(waiters)
+
+    async def follow(self, token):
+        """Every chunk from the start, then new ones as they are published"""
+        index = 0
+        while True:
+            event = None
+            with self._lock:
+                if index < self.base + len(self.chunks):
+                    chunk = self.chunks[index - self.base]
+                    index += 1
+                    self._positions[token] = index
+                    self._trim()
+                elif self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                else:
+                    event = asyncio.Event()
+                    self._waiters.append((asyncio.get_running_loop(), event))
+            if event is None:
+                yield chunk
+            else:
+                await event.wait()
+
+
+class SingleFlight:
+    """At most one synthesis per key in flight; duplicates share its chunks"""
+
+    def __init__(self, enabled=True, retain_bytes=8 * 1024 * 1024):
+        self.enabled = enabled
+        self.retain_bytes = retain_bytes
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+        self.cancelled = 0
+
+    async def stream(self, key, synthesize, route=None):
+        """Yield the audio for key; synthesize(route) starts the one upstream stream"""
+        if not self.enabled:
+            async for chunk in synthesize(route):
+                yield chunk
+            return
+
+        token = object()
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and flight.subscribe(token):
+                self.followers += 1
+            else:
+                flight = self._flights[key] = Flight(self.retain_bytes)
+                flight.subscribe(token)
+                self.leaders += 1
+                # Held on the flight: the loop keeps only weak references to tasks
+                flight.task = asyncio.ensure_future(self._produce(key, flight, synthesize))
+
+        chunks = flight.follow(token)
+        try:
+            first = True
+            async for chunk in chunks:
+                if first and route is not None:
+                    route.update(flight.route)
+                first = False
+                yield chunk
+        finally:
+            await chunks.aclose()
+            self._leave(key, flight, token)
+
+    def _leave(self, key, flight, token):
+        with self._lock:
+            if flight.unsubscribe(token) or flight.done:
+                return
+            # Nobody is listening any more: stop paying for the upstream call
+            self._forget(key, flight)
+            self.cancelled += 1
+        task = flight.task
+        try:
+            task.get_loop().call_soon_threadsafe(task.cancel)
+        except RuntimeError:
+            pass
+
+    def _forget(self, key, flight):
+        """Unmap the flight if it is still the one for key (caller holds the lock)"""
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def _produce(self, key, flight, synthesize):
+        error = None
+        try:
+            async for chunk in synthesize(flight.route):
+                if flight.publish(chunk):
+                    # Past retain_bytes: later requests start their own flight
+                    with self._lock:
+                        self._forget(key, flight)
+        except BaseException as e:
+            error = e
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            with self._lock:
+                self._forget(key, flight)
+            flight.finish(error)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'in_flight': len(self._flights),
+                'leaders': self.leaders,
+                'followers': self.followers,
+                'cancelled': self.cancelled,
+            }
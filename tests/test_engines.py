@@ -0,0 +1,68 @@
+"""
+EngineRouter failure classification with stub engines
+"""
+import asyncio
+import os
+import sys
+
+import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engines import EdgeEngine, EngineRouter, is_transient
+
+VOICE = 'en-US-GuyNeural'
+STAND_IN = 'en_US-stand-in-medium'
+
+
+EDGE_URL = URL('wss://speech.platform.bing.com/consumer/speech/synthesize/readaloud/edge/v1')
+REQUEST_INFO = aiohttp.RequestInfo(EDGE_URL, 'GET', CIMultiDictProxy(CIMultiDict()), EDGE_URL)
+
+
+def handshake_error(status=403):
+    return aiohttp.WSServerHandshakeError(REQUEST_INFO, (), status=status, message='Invalid response status')
+
+
+class StubLocal:
+    name = 'piper'
+    local = True
+
+    def serves(self, voice):
+        return voice == STAND_IN
+
+    async def stream(self, text, voice, pitch, rate, gap, info=None):
+        yield b'RIFF....WAVE'
+
+
+def edge_raising(error):
+    async def stream(text, voice, pitch, rate, gap, info=None):
+        raise error
+        yield
+    return EdgeEngine(stream)
+
+
+async def collect(router, route):
+    return b''.join([chunk async for chunk in router.stream('hello', VOICE, 0, 0, 0, route)])
+
+
+def test_handshake_rejection_is_engine_side():
+    assert is_transient(handshake_error(403))
+    assert is_transient(handshake_error(401))
+    # A plain 4xx response is still the request's fault
+    assert not is_transient(aiohttp.ClientResponseError(REQUEST_INFO, (), status=400))
+
+
+def test_edge_handshake_rejection_fails_over_and_trips_the_circuit():
+    router = EngineRouter(
+        [edge_raising(handshake_error()), StubLocal()],
+        voice_map={VOICE: STAND_IN}, failure_threshold=3
+    )
+    for _ in range(3):
+        route = {}
+        assert asyncio.run(collect(router, route)) == b'RIFF....WAVE'
+        assert route['engine'] == 'piper' and route['fallback']
+    edge = router.engine_stats['edge']
+    assert edge.failures == 3 and edge.is_open()
+    assert router.failovers == 3
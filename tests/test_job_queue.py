@@ -0,0 +1,57 @@
+"""
+JobQueue leases: a worker whose lease expired cannot finish or fail the job
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_queue import JobQueue
+
+MP3 = b'ID3' + b'\x00' * 64
+WAV = b'RIFF' + b'\x00' * 4 + b'WAVE' + b'\x00' * 64
+
+
+def release_and_reclaim(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'), str(tmp_path / 'results'), lease_seconds=60)
+    job_id, _ = queue.enqueue({'text': 'hello'}, 'key')
+    stale = queue.claim()
+    # The first worker stalls past its lease and another one takes over
+    queue._conn().execute('UPDATE jobs SET lease_until = 0 WHERE id = ?', (job_id,))
+    current = queue.claim()
+    assert current['id'] == job_id and current['attempts'] == stale['attempts'] + 1
+    return queue, stale, current
+
+
+def test_stale_worker_cannot_complete(tmp_path):
+    queue, stale, current = release_and_reclaim(tmp_path)
+
+    assert not queue.complete(stale['id'], stale['attempts'], WAV)
+    assert queue.get(stale['id'])['status'] == 'running'
+    assert os.listdir(queue.results_dir) == []
+
+    assert queue.complete(current['id'], current['attempts'], MP3)
+    job = queue.get(current['id'])
+    assert job['status'] == 'done' and job['result_path'].endswith('.mp3')
+    assert os.listdir(queue.results_dir) == [os.path.basename(job['result_path'])]
+
+
+def test_stale_worker_cannot_overwrite_a_finished_result(tmp_path):
+    queue, stale, current = release_and_reclaim(tmp_path)
+
+    assert queue.complete(current['id'], current['attempts'], MP3)
+    assert not queue.complete(stale['id'], stale['attempts'], MP3[:8])
+    with open(queue.get(current['id'])['result_path'], 'rb') as f:
+        assert f.read() == MP3
+    assert len(os.listdir(queue.results_dir)) == 1
+
+
+def test_stale_worker_cannot_fail_or_requeue(tmp_path):
+    queue, stale, current = release_and_reclaim(tmp_path)
+
+    assert queue.fail(stale['id'], stale['attempts'], 'timed out') is None
+    job = queue.get(stale['id'])
+    assert job['status'] == 'running' and job['error'] is None
+
+    assert queue.fail(current['id'], current['attempts'], 'upstream 503') is True
+    assert queue.get(current['id'])['status'] == 'queued'
@@ -0,0 +1,91 @@
+"""
+ModelStore conversion stamps while a voice's background hash is pending
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+onnx = pytest.importorskip('onnx')
+from onnx import TensorProto, helper, numpy_helper
+
+import model_store as store_module
+from model_store import ModelStore
+from voice_manager import VoiceManager
+
+CONFIG = b'{"audio": {"sample_rate": 22050}, "num_speakers": 1}'
+
+
+def write_voice(voices_dir):
+    import numpy
+    weights = numpy_helper.from_array(numpy.arange(1024, dtype=numpy.float32), name='w')
+    graph = helper.make_graph(
+        [helper.make_node('Add', ['x', 'w'], ['y'])], 'voice',
+        [helper.make_tensor_value_info('x', TensorProto.FLOAT, [1024])],
+        [helper.make_tensor_value_info('y', TensorProto.FLOAT, [1024])],
+        initializer=[weights]
+    )
+    model_path = os.path.join(voices_dir, 'voice.onnx')
+    onnx.save(helper.make_model(graph), model_path)
+    with open(f"{model_path}.json", 'wb') as f:
+        f.write(CONFIG)
+    return model_path
+
+
+def make_manager(voices_dir, pending):
+    manager = VoiceManager(voices_dir, download_workers=1)
+    manager.available_voices = {'voice': {'url': ''}}
+    # Leave the hash pending until the test runs it
+    manager._hash_later = pending.append
+    return manager
+
+
+def test_pending_hash_converts_once_across_workers(tmp_path, monkeypatch):
+    voices_dir = str(tmp_path / 'voices')
+    os.makedirs(voices_dir)
+    model_path = write_voice(voices_dir)
+
+    conversions = []
+    save_model = onnx.save_model
+
+    def counting_save_model(model, path, **kwargs):
+        conversions.append(path)
+        save_model(model, path, **kwargs)
+
+    monkeypatch.setattr(store_module.onnx, 'save_model', counting_save_model)
+
+    pending = []
+    first = make_manager(voices_dir, pending)
+    second = make_manager(voices_dir, pending)
+    assert first.catalog()['voice']['sha256'] is None
+    assert first.catalog()['voice']['complete']
+
+    mapped = ModelStore(first).mapped_path('voice')
+    assert ModelStore(second).mapped_path('voice') == mapped
+    assert ModelStore(first).mapped_path('voice') == mapped
+    assert len(conversions) == 1
+
+    # The hash landing does not make the converted copy stale
+    first._hash_model(model_path)
+    assert first.catalog()['voice']['sha256']
+    assert ModelStore(first).is_current('voice')
+    assert ModelStore(first).mapped_path('voice') == mapped
+    assert len(conversions) == 1
+
+
+def test_replaced_model_is_reconverted(tmp_path, monkeypatch):
+    voices_dir = str(tmp_path / 'voices')
+    os.makedirs(voices_dir)
+    model_path = write_voice(voices_dir)
+    manager = make_manager(voices_dir, [])
+    store = ModelStore(manager)
+    store.mapped_path('voice')
+
+    stat = os.stat(model_path)
+    os.utime(model_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    manager.refresh_catalog()
+    assert not store.is_current('voice')
+    store.mapped_path('voice')
+    assert store.is_current('voice')
@@ -0,0 +1,31 @@
+"""
+Transliteration mode: per-request value, falling back to TRANSLITERATE_DEFAULT
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import preprocess
+from preprocess import preprocess_text
+
+ROMAN = 'aap kaise hain?'
+URDU = 'آپ کیسے ہیں؟'
+
+
+def test_default_off_leaves_text_alone(monkeypatch):
+    monkeypatch.setattr(preprocess, 'TRANSLITERATE_DEFAULT', 'off')
+    assert preprocess_text(ROMAN, 'ur-PK-AsadNeural')[0] == ROMAN
+    assert preprocess_text(ROMAN, 'ur-PK-AsadNeural', 'auto')[0] == URDU
+
+
+def test_auto_default_converts_for_urdu_voices_only(monkeypatch):
+    monkeypatch.setattr(preprocess, 'TRANSLITERATE_DEFAULT', 'auto')
+    assert preprocess_text(ROMAN, 'ur-PK-AsadNeural')[0] == URDU
+    assert preprocess_text(ROMAN, 'en-US-JennyNeural')[0] == ROMAN
+
+
+def test_request_can_opt_out_of_the_default(monkeypatch):
+    monkeypatch.setattr(preprocess, 'TRANSLITERATE_DEFAULT', 'auto')
+    assert preprocess_text(ROMAN, 'ur-PK-AsadNeural', False)[0] == ROMAN
+    assert preprocess_text(ROMAN, 'ur-PK-AsadNeural', 'false')[0] == ROMAN
@@ -0,0 +1,93 @@
+"""
+Single-pass Roman Urdu engine checked against the regex chain it replaced
+"""
+import os
+import random
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import roman_urdu
+from roman_urdu import ROMAN_TO_URDU, TEST_CASES, TransliterationEngine, roman_urdu_to_urdu_text
+
+
+def regex_chain(text, mapping=ROMAN_TO_URDU):
+    """The previous algorithm: one case-insensitive sub pass per key, longest first"""
+    text_lower = text.lower()
+    urdu_text = text
+    for roman in sorted(mapping.keys(), key=len, reverse=True):
+        if roman in text_lower:
+            urdu_text = re.compile(re.escape(roman), re.IGNORECASE).sub(mapping[roman], urdu_text)
+    return urdu_text.replace('?', '؟')
+
+
+def dictionary_words():
+    return [k for k in ROMAN_TO_URDU if len(k) > 1 and k.isalpha() and not (len(k) == 2 and k[1] == 'h')]
+
+
+def test_matches_regex_chain_on_dictionary_text():
+    rng = random.Random(11)
+    # Unknown words built only from letter units spell out the same both ways
+    vocabulary = dictionary_words() + ['bus', 'jald', 'ghar', 'qurb']
+    for _ in range(500):
+        words = [rng.choice(vocabulary) for _ in range(rng.randint(1, 12))]
+        words = [w.capitalize() if rng.random() < 0.2 else w for w in words]
+        separators = [rng.choice([' ', ' ', ' ', ', ', '. ', '\n', '? ', ' 42 ']) for _ in words]
+        text = ''.join(w + s for w, s in zip(words, separators)).strip()
+        assert roman_urdu_to_urdu_text(text) == regex_chain(text), text
+
+
+def test_self_test_cases():
+    for roman, expected in TEST_CASES:
+        assert roman_urdu_to_urdu_text(roman) == expected
+
+
+def test_dictionary_key_inside_longer_word_is_not_replaced():
+    engine = roman_urdu.get_engine()
+    # 'kahan' is an entry; 'kahani' is not, so it is spelled out as a whole
+    assert roman_urdu_to_urdu_text('kahani') == engine.spell('kahani')
+    assert ROMAN_TO_URDU['kahan'] in regex_chain('kahani')
+    # Nor does 'to' (تو) fire inside 'tohfa'
+    assert roman_urdu_to_urdu_text('tohfa') == engine.spell('tohfa')
+    assert roman_urdu_to_urdu_text('kahan tohfa') == f"{ROMAN_TO_URDU['kahan']} {engine.spell('tohfa')}"
+
+
+def test_phrase_wins_over_its_words():
+    engine = TransliterationEngine({'p': 'پ', 'k': 'ک', 'aap': 'آپ', 'ka': 'کا', 'aap ka': 'آپکا'})
+    assert engine.convert('aap ka') == 'آپکا'
+    assert engine.convert('Aap Ka?') == 'آپکا؟'
+    # Only as whole words on both sides
+    assert engine.convert('aap kaam') == f"آپ {engine.spell('kaam')}"
+    assert engine.convert('baap ka') == f"{engine.spell('baap')} کا"
+
+
+def test_unknown_letters_pass_through_untouched():
+    # No unit covers c, u, w or x
+    assert roman_urdu_to_urdu_text('cwx') == 'cwx'
+    assert roman_urdu_to_urdu_text('Wuxcu') == regex_chain('Wuxcu') == 'Wuxcu'
+    assert roman_urdu_to_urdu_text('cux bus') == regex_chain('cux bus')
+
+
+def test_punctuation_and_urdu_script_left_alone():
+    text = 'سلام, dost! «yaar» (2024) — کیا hai?'
+    expected = 'سلام, دوست! «یار» (۲۰۲۴) — کیا ہے؟'
+    assert roman_urdu_to_urdu_text(text) == expected
+    assert regex_chain(text) == expected
+    assert roman_urdu_to_urdu_text('۱۲ سلام') == '۱۲ سلام'
+
+
+def test_dictionary_edits_rebuild_the_engine():
+    engine = roman_urdu.get_engine()
+    version = ROMAN_TO_URDU.version
+    assert roman_urdu.get_engine() is engine
+    assert 'kal' not in ROMAN_TO_URDU
+    try:
+        ROMAN_TO_URDU['kal'] = 'کل'
+        assert ROMAN_TO_URDU.version == version + 1
+        assert roman_urdu.get_engine() is not engine
+        assert roman_urdu_to_urdu_text('kal') == 'کل'
+    finally:
+        ROMAN_TO_URDU.pop('kal', None)
+    assert ROMAN_TO_URDU.version == version + 2
+    assert roman_urdu_to_urdu_text('kal') == engine.spell('kal')
@@ -0,0 +1,80 @@
+"""
+SentenceCache: repeated sentences within a document cost one synthesis
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from segmenter import mp3_silence
+from sentence_cache import SentenceCache
+from tts_cache import AudioCache
+
+SENTENCES = ['Terms apply.', 'Call us today.', 'Terms apply.', 'Terms apply.', 'Thanks!', 'Call us today.']
+VOICE = 'en-US-JennyNeural'
+
+
+class CountingCache(AudioCache):
+    def __init__(self):
+        super().__init__(memory_bytes=1 << 20)
+        self.puts = []
+
+    def put(self, key, data):
+        self.puts.append(key)
+        return super().put(key, data)
+
+
+def run(sentence_cache, synthesized, gap=0, sentences=SENTENCES):
+    async def synthesize(sentence):
+        synthesized.append(sentence)
+        await asyncio.sleep(0)
+        return f"<{sentence}>".encode()
+
+    async def collect():
+        return [chunk async for chunk in sentence_cache.stream(sentences, VOICE, 0, 0, gap, synthesize, concurrency=2)]
+
+    return asyncio.run(collect())
+
+
+def test_repeated_sentences_are_synthesized_and_stored_once():
+    cache = CountingCache()
+    sentence_cache = SentenceCache(cache)
+    synthesized = []
+
+    chunks = run(sentence_cache, synthesized)
+
+    assert chunks == [f"<{s}>".encode() for s in SENTENCES]
+    assert sorted(synthesized) == sorted(set(SENTENCES))
+    assert len(cache.puts) == len(set(SENTENCES))
+    stats = sentence_cache.stats()
+    assert stats['misses'] == len(set(SENTENCES)) and stats['hits'] == 0
+
+
+def test_fan_out_keeps_document_order_and_gaps():
+    sentence_cache = SentenceCache(CountingCache())
+    silence = mp3_silence(300)
+    assert silence
+
+    chunks = run(sentence_cache, [], gap=300)
+
+    expected = []
+    for i, sentence in enumerate(SENTENCES):
+        if i:
+            expected.append(silence)
+        expected.append(f"<{sentence}>".encode())
+    assert chunks == expected
+
+
+def test_cached_repeats_need_no_synthesis():
+    cache = CountingCache()
+    sentence_cache = SentenceCache(cache)
+    run(sentence_cache, [])
+    synthesized = []
+
+    edited = SENTENCES + ['New line.', 'Terms apply.']
+    chunks = run(sentence_cache, synthesized, sentences=edited)
+
+    assert synthesized == ['New line.']
+    assert chunks == [f"<{s}>".encode() for s in edited]
+    assert len(cache.puts) == len(set(SENTENCES)) + 1
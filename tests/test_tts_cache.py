@@ -0,0 +1,45 @@
+"""
+AudioCache keys and on-disk layout
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from segmenter import split_sentences
+from tts_cache import DiskTier, cache_key
+
+WAV = b'RIFF' + b'\x00' * 4 + b'WAVE' + b'\x00' * 64
+
+
+def key(text):
+    return cache_key(text, 'en-US-JennyNeural', 0, 0, 300)
+
+
+def test_line_breaks_are_part_of_the_key():
+    # A newline ends a sentence (and gets a gap); a space does not
+    assert split_sentences('a\nb') != split_sentences('a b')
+    assert key('a\nb') != key('a b')
+
+
+def test_spacing_that_does_not_change_the_audio_shares_a_key():
+    assert key('hello   world\t!') == key(' hello world ! ')
+    assert key('a \n\n  b\r\n') == key('a\nb')
+
+
+def test_disk_tier_uses_a_neutral_extension(tmp_path):
+    tier = DiskTier(str(tmp_path), max_bytes=1 << 20)
+    k = key('piper audio')
+    assert tier.put(k, WAV)
+    path = tier._path(k)
+    assert path.endswith(f"{k}.audio") and os.path.exists(path)
+    assert tier.get(k)[0] == WAV
+
+
+def test_old_mp3_layout_is_cleared_on_load(tmp_path):
+    k = key('old entry')
+    os.makedirs(tmp_path / k[:2])
+    old = tmp_path / k[:2] / f"{k}.mp3"
+    old.write_bytes(b'ID3')
+    tier = DiskTier(str(tmp_path), max_bytes=1 << 20)
+    assert not old.exists() and len(tier) == 0 and k not in tier
@@ -0,0 +1,239 @@
+"""
+VoiceManager downloads against a local stand-in HTTP server
+"""
+import hashlib
+import os
+import sys
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import voice_manager as vm_module
+from voice_manager import VoiceManager
+
+MODEL = bytes(range(256)) * 4096
+CONFIG = b'{"audio": {"sample_rate": 22050}, "num_speakers": 1}'
+
+
+class StandIn:
+    """Serves /voice.onnx and /voice.onnx.json with Range support and a sha256 ETag"""
+
+    def __init__(self, model=MODEL, etag=None, truncate_first=False):
+        self.files = {'/voice.onnx': model, '/voice.onnx.json': CONFIG}
+        self.etag = etag or hashlib.sha256(model).hexdigest()
+        self.truncate_first = truncate_first
+        self.requests = []
+        self.final_path = None
+        self.final_existed = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = stand_in.files.get(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                range_header = self.headers.get('Range')
+                stand_in.requests.append((self.path, range_header))
+                if self.path == '/voice.onnx' and stand_in.final_path:
+                    stand_in.final_existed.append(os.path.exists(stand_in.final_path))
+
+                start = int(range_header.split('=')[1].split('-')[0]) if range_header else 0
+                if start >= len(body) and range_header:
+                    self.send_response(416)
+                    self.send_header('Content-Range', f'bytes */{len(body)}')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(206 if range_header else 200)
+                if range_header:
+                    self.send_header('Content-Range', f'bytes {start}-{len(body) - 1}/{len(body)}')
+                if self.path == '/voice.onnx':
+                    self.send_header('ETag', f'"{stand_in.etag}"')
+                self.send_header('Content-Length', str(len(body) - start))
+                self.end_headers()
+
+                end = len(body)
+                if stand_in.truncate_first and self.path == '/voice.onnx':
+                    stand_in.truncate_first = False
+                    end = start + (len(body) - start) // 2
+                self.wfile.write(body[start:end])
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(vm_module, 'time', types.SimpleNamespace(sleep=lambda s: None, perf_counter=time.perf_counter))
+    monkeypatch.setattr(vm_module, 'DOWNLOAD_RETRIES', 3)
+
+
+def make_manager(tmp_path, stand_in, sha256=None):
+    manager = VoiceManager(str(tmp_path / 'voices'), download_workers=1)
+    manager.available_voices = {'voice': {'url': f"{stand_in.url}/voice.onnx"}}
+    if sha256:
+        manager.available_voices['voice']['sha256'] = sha256
+    stand_in.final_path = os.path.join(manager.voices_dir, 'voice.onnx')
+    return manager
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.fixture
+def stand_in():
+    servers = []
+
+    def start(**kwargs):
+        server = StandIn(**kwargs)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def test_resumes_partial_download_with_range(tmp_path, stand_in):
+    server = stand_in()
+    manager = make_manager(tmp_path, server)
+    part_path = os.path.join(manager.voices_dir, 'voice.onnx.part')
+    with open(part_path, 'wb') as f:
+        f.write(MODEL[:100000])
+
+    assert manager.download_voice('voice', background=False)
+
+    assert ('/voice.onnx', 'bytes=100000-') in server.requests
+    assert read(os.path.join(manager.voices_dir, 'voice.onnx')) == MODEL
+    assert not os.path.exists(part_path)
+    assert manager.list_downloaded_voices() == ['voice']
+
+
+def test_interrupted_transfer_resumes_from_where_it_stopped(tmp_path, stand_in, no_backoff):
+    server = stand_in(truncate_first=True)
+    manager = make_manager(tmp_path, server)
+
+    assert manager.download_voice('voice', background=False)
+
+    model_requests = [header for path, header in server.requests if path == '/voice.onnx']
+    assert len(model_requests) == 2 and model_requests[0] is None
+    # Resumes from what reached the disk, at most where the connection dropped
+    resumed_at = int(model_requests[1].removeprefix('bytes=').rstrip('-'))
+    assert 0 < resumed_at <= len(MODEL) // 2
+    assert read(os.path.join(manager.voices_dir, 'voice.onnx')) == MODEL
+
+
+def test_complete_partial_answered_with_416_is_verified_and_installed(tmp_path, stand_in):
+    server = stand_in()
+    manager = make_manager(tmp_path, server)
+    part_path = os.path.join(manager.voices_dir, 'voice.onnx.part')
+    with open(part_path, 'wb') as f:
+        f.write(MODEL)
+
+    assert manager.download_voice('voice', background=False)
+
+    assert ('/voice.onnx', f'bytes={len(MODEL)}-') in server.requests
+    assert read(os.path.join(manager.voices_dir, 'voice.onnx')) == MODEL
+    assert not os.path.exists(part_path)
+
+
+def test_sha256_mismatch_deletes_part_and_installs_nothing(tmp_path, stand_in, no_backoff):
+    server = stand_in(etag='0' * 64)
+    manager = make_manager(tmp_path, server)
+
+    assert not manager.download_voice('voice', background=False)
+
+    # Restarted from zero once, then gave up
+    assert [header for path, header in server.requests if path == '/voice.onnx'] == [None, None]
+    assert not os.path.exists(os.path.join(manager.voices_dir, 'voice.onnx.part'))
+    assert not os.path.exists(os.path.join(manager.voices_dir, 'voice.onnx'))
+    assert manager.list_downloaded_voices() == []
+
+
+def test_configured_sha256_wins_over_server_etag(tmp_path, stand_in, no_backoff):
+    server = stand_in()
+    manager = make_manager(tmp_path, server, sha256='f' * 64)
+
+    assert not manager.download_voice('voice', background=False)
+    assert not os.path.exists(os.path.join(manager.voices_dir, 'voice.onnx'))
+
+
+def test_final_path_appears_only_after_verification(tmp_path, stand_in, no_backoff):
+    server = stand_in(truncate_first=True)
+    manager = make_manager(tmp_path, server)
+
+    assert manager.download_voice('voice', background=False)
+
+    # Neither attempt could see a file at the final path while bytes were in flight
+    assert server.final_existed == [False, False]
+    names = sorted(os.listdir(manager.voices_dir))
+    assert names == ['manifest.json', 'voice.onnx', 'voice.onnx.json']
+
+
+def refresh_repeatedly(voices_dir, worker, rounds, errors):
+    manager = VoiceManager(voices_dir, download_workers=1)
+    for i in range(rounds):
+        # A partial whose size keeps changing makes every refresh rewrite the manifest
+        with open(os.path.join(voices_dir, f'worker{worker}.onnx.part'), 'wb') as f:
+            f.write(b'x' * i)
+        try:
+            manager.catalog()
+            manager.refresh_catalog()
+        except Exception as e:
+            errors.put(repr(e))
+
+
+def test_concurrent_workers_refreshing_the_manifest_never_fail(tmp_path):
+    import multiprocessing
+    voices_dir = str(tmp_path / 'voices')
+    os.makedirs(voices_dir)
+    with open(os.path.join(voices_dir, 'voice.onnx'), 'wb') as f:
+        f.write(MODEL)
+    with open(os.path.join(voices_dir, 'voice.onnx.json'), 'wb') as f:
+        f.write(CONFIG)
+
+    context = multiprocessing.get_context('fork')
+    errors = context.Queue()
+    workers = [context.Process(target=refresh_repeatedly, args=(voices_dir, n, 100, errors)) for n in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert errors.empty(), errors.get()
+    assert not [name for name in os.listdir(voices_dir) if name.endswith('.tmp')]
+
+
+def test_new_model_is_hashed_off_the_request_path(tmp_path):
+    voices_dir = str(tmp_path / 'voices')
+    os.makedirs(voices_dir)
+    model_path = os.path.join(voices_dir, 'voice.onnx')
+    with open(model_path, 'wb') as f:
+        f.write(MODEL)
+    with open(f"{model_path}.json", 'wb') as f:
+        f.write(CONFIG)
+    manager = VoiceManager(voices_dir, download_workers=1)
+    manager.available_voices = {'voice': {'url': '', 'sha256': hashlib.sha256(MODEL).hexdigest()}}
+
+    entry = manager.refresh_catalog()['voice']
+    assert entry['sha256'] is None and not entry['complete']
+
+    manager._executor.shutdown(wait=True)
+    entry = manager.catalog()['voice']
+    assert entry['sha256'] == hashlib.sha256(MODEL).hexdigest() and entry['complete']
@@ -0,0 +1,391 @@
+"""
+Content-addressed audio cache for synthesized speech
+
+Entries expire `ttl` seconds after they were written (0 keeps them until
+evicted for space). Expired entries are never served, and a sweeper thread
+deletes them from both tiers every `sweep_interval` seconds, so audio is
+gone from the server within ttl + sweep_interval of being generated.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text):
+    """Collapse spaces and tabs but keep line breaks, which end a sentence (and add a gap)"""
+    lines = (' '.join(line.split()) for line in str(text).split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+def cache_key(text, voice, pitch, rate, gap, namespace='tts'):
+    """Hash a normalized (text, voice, pitch, rate, gap) request"""
+    normalized = {
+        'ns': namespace,
+        'text': normalize_text(text),
+        'voice': str(voice),
+        'pitch': int(pitch),
+        'rate': int(rate),
+        'gap': int(gap),
+    }
+    payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class MemoryTier:
+    """In-process LRU bounded by total bytes"""
+
+    def __init__(self, max_bytes, max_item_bytes=None, ttl=0):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes or max(max_bytes // 8, 1)
+        self.ttl = ttl
+        self.size = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expired(self, written, now=None):
+        return self.ttl > 0 and (now or time.time()) - written >= self.ttl
+
+    def _drop(self, key):
+        written, data = self._items.pop(key)
+        self.size -= len(data)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[0]):
+                self._drop(key)
+                self.expirations += 1
+                return None
+            self._items.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, data, written=None):
+        if len(data) > self.max_item_bytes:
+            return False
+        with self._lock:
+            if key in self._items:
+                self._drop(key)
+            self._items[key] = (written or time.time(), data)
+            self.size += len(data)
+            while self.size > self.max_bytes and self._items:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+        return True
+
+    def expire(self):
+        """Drop entries past the TTL"""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (written, _) in self._items.items() if self._expired(written, now)]
+            for key in expired:
+                self._drop(key)
+            self.expirations += len(expired)
+        return len(expired)
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            return entry is not None and not self._expired(entry[0])
+
+    def __len__(self):
+        return len(self._items)
+
+
+# MP3 from Edge and WAV from Piper share the tier, so the extension names neither
+AUDIO_SUFFIX = '.audio'
+
+
+class DiskTier:
+    """Directory of <key>.audio files with size-based LRU eviction; mtime is the write time"""
+
+    def __init__(self, cache_dir, max_bytes, ttl=0):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._index = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}{AUDIO_SUFFIX}")
+
+    def _expired(self, mtime, now=None):
+        return self.ttl > 0 and (now or time.time()) - mtime >= self.ttl
+
+    def _forget(self, key):
+        with self._lock:
+            size = self._index.pop(key, None)
+            if size is not None:
+                self.size -= size
+
+    def _remove(self, key):
+        self._forget(key)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _load_index(self):
+        """Rebuild the LRU order from the write times left by earlier runs"""
+        self.expire()
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                if name.endswith('.mp3') and len(name) == 68:
+                    # Left by the old <key>.mp3 layout; nothing reads them any more
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+                if not name.endswith(AUDIO_SUFFIX):
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, name[:-len(AUDIO_SUFFIX)], st.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self.size += size
+        self._evict()
+
+    def get(self, key):
+        """Return (data, write time) or None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                written = os.fstat(f.fileno()).st_mtime
+                data = f.read()
+        except OSError:
+            self._forget(key)
+            return None
+        if self._expired(written):
+            self._remove(key)
+            self.expirations += 1
+            return None
+        with self._lock:
+            if key in self._index:
+                self._index.move_to_end(key)
+            else:
+                # Written by another worker process
+                self._index[key] = len(data)
+                self.size += len(data)
+        return data, written
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return False
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"⚠️ Cache write failed: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        with self._lock:
+            old = self._index.pop(key, None)
+            if old is not None:
+                self.size -= old
+            self._index[key] = len(data)
+            self.size += len(data)
+            self._evict()
+        return True
+
+    def _evict(self):
+        while self.size > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self.size -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def expire(self):
+        """Delete files past the TTL, including ones written by other workers"""
+        if self.ttl <= 0:
+            return 0
+        cutoff = time.time() - self.ttl
+        removed = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if os.stat(path).st_mtime > cutoff:
+                        continue
+                    os.remove(path)
+                except OSError:
+                    continue
+                if name.endswith(AUDIO_SUFFIX):
+                    self._forget(name[:-len(AUDIO_SUFFIX)])
+                    removed += 1
+        self.expirations += removed
+        return removed
+
+    def __contains__(self, key):
+        # The file, not the index: another worker may have written it
+        try:
+            return not self._expired(os.stat(self._path(key)).st_mtime)
+        except OSError:
+            return False
+
+    def __len__(self):
+        return len(self._index)
+
+
+class AudioCache:
+    """Two-tier (memory, then disk) cache of synthesized MP3 bytes"""
+
+    def __init__(self, memory_bytes, disk_dir=None, disk_bytes=0, ttl=0, sweep_interval=60):
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.memory = MemoryTier(memory_bytes, ttl=ttl)
+        self.disk = DiskTier(disk_dir, disk_bytes, ttl=ttl) if disk_dir and disk_bytes > 0 else None
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.stores = 0
+        self._lock = threading.Lock()
+        self._sweeper_pid = None
+
+    @property
+    def max_item_bytes(self):
+        """Largest entry worth buffering for the cache"""
+        return self.memory.max_item_bytes
+
+    def get(self, key, count=True):
+        """Return cached audio or None; disk hits are promoted to memory
+
+        count=False leaves the request hit/miss counters alone, for callers
+        (like the sentence cache) that keep their own.
+        """
+        data = self.memory.get(key)
+        if data is not None:
+            if count:
+                self._count('hits_memory')
+            return data
+        if self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                data, written = entry
+                # Keeps the disk write time, so promotion never extends the TTL
+                self.memory.put(key, data, written)
+                if count:
+                    self._count('hits_disk')
+                return data
+        if count:
+            self._count('misses')
+        return None
+
+    def __contains__(self, key):
+        """Presence check that leaves the hit counters and LRU order alone"""
+        return key in self.memory or (self.disk is not None and key in self.disk)
+
+    def put(self, key, data):
+        if not data:
+            return
+        self._start_sweeper()
+        self.memory.put(key, data)
+        if self.disk is not None:
+            self.disk.put(key, data)
+        self._count('stores')
+
+    def expire(self):
+        """Remove expired entries from both tiers"""
+        removed = self.memory.expire()
+        if self.disk is not None:
+            removed += self.disk.expire()
+        return removed
+
+    def _sweep(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                removed = self.expire()
+            except Exception as e:
+                logger.warning(f"⚠️ Cache sweep failed: {e}")
+                continue
+            if removed:
+                logger.info(f"🧹 Expired {removed} cached audio entries")
+
+    def _start_sweeper(self):
+        """Started on first store, once per worker process"""
+        if self.ttl <= 0 or self._sweeper_pid == os.getpid():
+            return
+        with self._lock:
+            if self._sweeper_pid == os.getpid():
+                return
+            self._sweeper_pid = os.getpid()
+        threading.Thread(target=self._sweep, name='cache-sweeper', daemon=True).start()
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        """Hit/miss counters and tier sizes for /health"""
+        hits = self.hits_memory + self.hits_disk
+        lookups = hits + self.misses
+        stats = {
+            'hits': hits,
+            'hits_memory': self.hits_memory,
+            'hits_disk': self.hits_disk,
+            'misses': self.misses,
+            'hit_ratio': round(hits / lookups, 3) if lookups else 0.0,
+            'stores': self.stores,
+            'ttl_seconds': self.ttl,
+            'memory': {
+                'entries': len(self.memory),
+                'bytes': self.memory.size,
+                'max_bytes': self.memory.max_bytes,
+                'evictions': self.memory.evictions,
+                'expirations': self.memory.expirations,
+            },
+        }
+        if self.disk is not None:
+            stats['disk'] = {
+                'entries': len(self.disk),
+                'bytes': self.disk.size,
+                'max_bytes': self.disk.max_bytes,
+                'evictions': self.disk.evictions,
+                'expirations': self.disk.expirations,
+            }
+        return stats
+
+
+def cache_from_env():
+    """Build the cache from TTS_CACHE_* environment variables"""
+    memory_mb = float(os.environ.get('TTS_CACHE_MEMORY_MB', 64))
+    disk_mb = float(os.environ.get('TTS_CACHE_DISK_MB', 512))
+    disk_dir = os.environ.get('TTS_CACHE_DIR', os.path.join('cache', 'tts'))
+    # The privacy page promises generated audio is deleted within 10-15 minutes
+    return AudioCache(
+        memory_bytes=int(memory_mb * 1024 * 1024),
+        disk_dir=disk_dir,
+        disk_bytes=int(disk_mb * 1024 * 1024),
+        ttl=float(os.environ.get('TTS_CACHE_TTL', 600)),
+        sweep_interval=float(os.environ.get('TTS_CACHE_SWEEP_INTERVAL', 60)),
+    )
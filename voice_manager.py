@@ -1,14 +1,70 @@
 """
 Voice Manager for Piper TTS
 """
+import hashlib
+import json
 import os
+import re
 import requests
+import tempfile
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Concurrent voice downloads (each voice = model + config)
+DOWNLOAD_WORKERS = int(os.environ.get('VOICE_DOWNLOAD_WORKERS', 3))
+DOWNLOAD_RETRIES = int(os.environ.get('VOICE_DOWNLOAD_RETRIES', 5))
+
+# Chunk size adapts to throughput: doubled while a read takes under FAST,
+# halved when one takes over SLOW, so progress stays responsive on slow links
+CHUNK_MIN = 64 * 1024
+CHUNK_MAX = 4 * 1024 * 1024
+CHUNK_FAST = 0.05
+CHUNK_SLOW = 0.5
+
+SHA256_HEX = re.compile(r'^[0-9a-f]{64}$')
+
+# Installed-voice index kept next to the models
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+def expected_sha256(response):
+    """SHA-256 the server vouches for, if any
+
+    Hugging Face answers LFS files with a redirect whose X-Linked-Etag (and
+    the ETag of the final response) is the file's SHA-256.
+    """
+    for r in list(response.history) + [response]:
+        for header in ('X-Linked-Etag', 'ETag'):
+            value = r.headers.get(header, '')
+            value = value.removeprefix('W/').strip('"').lower()
+            if SHA256_HEX.match(value):
+                return value
+    return None
+
+def file_sha256(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest
 
 class VoiceManager:
-    def __init__(self, voices_dir="voices"):
+    def __init__(self, voices_dir="voices", download_workers=DOWNLOAD_WORKERS):
         self.voices_dir = voices_dir
         os.makedirs(voices_dir, exist_ok=True)
+        self.session = requests.Session()
+        self._executor = ThreadPoolExecutor(max_workers=download_workers, thread_name_prefix='voice-download')
+        self._pending = {}
+        self._lock = threading.Lock()
+        
+        # Installed voices, rebuilt only when the directory's mtime moves
+        self.manifest_path = os.path.join(voices_dir, MANIFEST_NAME)
+        self._catalog = None
+        self._catalog_mtime = None
+        self._checksums = {}
+        self._hashing = set()
+        self._catalog_lock = threading.Lock()
         
         # Available Piper voices
         self.available_voices = {
@@ -55,75 +111,316 @@ class VoiceManager:
         if voice_name not in self.available_voices:
             return False
         
-        voice_info = self.available_voices[voice_name]
-        url = voice_info['url']
-        file_path = os.path.join(self.voices_dir, f"{voice_name}.onnx")
-        
         # Check if already downloaded
-        if os.path.exists(file_path):
+        if self.get_voice_path(voice_name):
             print(f"✅ Voice already exists: {voice_name}")
             return True
         
-        print(f"📥 Downloading voice: {voice_name}")
-        
+        future = self._submit(voice_name)
         if background:
-            # Download in background thread
-            thread = threading.Thread(
-                target=self._download_file,
-                args=(url, file_path, voice_name)
-            )
-            thread.daemon = True
-            thread.start()
             return True
-        else:
-            # Download immediately
-            return self._download_file(url, file_path, voice_name)
+        # Download immediately (joining a background download already running)
+        return future.result()
+    
+    def download_voices(self, voice_names):
+        """Download several voices concurrently on the bounded pool; returns {voice: ok}"""
+        futures = {name: self._submit(name) for name in voice_names if name in self.available_voices}
+        return {name: future.result() for name, future in futures.items()}
     
-    def _download_file(self, url, file_path, voice_name):
-        """Download file helper"""
+    def _submit(self, voice_name):
+        # One download per voice at a time; later callers share the same future
+        with self._lock:
+            future = self._pending.get(voice_name)
+            if future is None:
+                print(f"📥 Downloading voice: {voice_name}")
+                future = self._executor.submit(self._download_voice, voice_name)
+                self._pending[voice_name] = future
+                future.add_done_callback(lambda _: self._forget(voice_name))
+            return future
+    
+    def _forget(self, voice_name):
+        with self._lock:
+            self._pending.pop(voice_name, None)
+    
+    def _download_voice(self, voice_name):
+        """Download the model and its .onnx.json config (Piper needs both to load)"""
+        voice_info = self.available_voices[voice_name]
+        url = voice_info['url']
+        file_path = os.path.join(self.voices_dir, f"{voice_name}.onnx")
+        config_path = f"{file_path}.json"
         try:
-            response = requests.get(url, stream=True, timeout=30)
+            if not os.path.exists(file_path) and not self._download_file(
+                url, file_path, voice_name, voice_info.get('sha256')
+            ):
+                return False
+            if os.path.exists(config_path):
+                return True
+            return self._download_file(f"{url}.json", config_path, f"{voice_name} config")
+        finally:
+            try:
+                self.refresh_catalog()
+            except OSError as e:
+                print(f"⚠️ Voice catalog refresh failed: {e}")
+    
+    def _download_file(self, url, file_path, voice_name, sha256=None):
+        """Download to <file>.part with Range resume, verify, then rename into place
+        
+        The .part file survives errors so the next attempt (or the next run)
+        resumes where it stopped; readers never see anything but complete,
+        verified files at the final path.
+        """
+        part_path = f"{file_path}.part"
+        restarted = False
+        for attempt in range(1, DOWNLOAD_RETRIES + 1):
+            try:
+                digest, served_sha256 = self._fetch(url, part_path, voice_name)
+                expected = sha256 or served_sha256
+                if expected and digest.hexdigest() != expected:
+                    os.remove(part_path)
+                    if restarted:
+                        raise ValueError(f"SHA-256 mismatch (expected {expected[:12]}…)")
+                    # A corrupt partial from an earlier run: start over once
+                    restarted = True
+                    print(f"\n⚠️ Checksum mismatch for {voice_name}, restarting from zero")
+                    continue
+                os.replace(part_path, file_path)
+                self._checksums[file_path] = digest.hexdigest()
+                print(f"\n✅ Downloaded: {voice_name}" + (" (sha256 verified)" if expected else ""))
+                return True
+            except ValueError as e:
+                print(f"\n❌ Failed to download {voice_name}: {e}")
+                return False
+            except requests.HTTPError as e:
+                status = e.response.status_code
+                if status < 500 and status not in (408, 429):
+                    # 404 and friends will not fix themselves
+                    print(f"\n❌ Failed to download {voice_name}: {e}")
+                    return False
+                if attempt == DOWNLOAD_RETRIES:
+                    print(f"\n❌ Failed to download {voice_name}: {e} (partial kept for resume)")
+                    return False
+                time.sleep(min(30, 2 ** attempt))
+            except Exception as e:
+                if attempt == DOWNLOAD_RETRIES:
+                    print(f"\n❌ Failed to download {voice_name}: {e} (partial kept for resume)")
+                    return False
+                delay = min(30, 2 ** attempt)
+                print(f"\n⚠️ Download of {voice_name} interrupted ({e}), resuming in {delay}s")
+                time.sleep(delay)
+        return False
+    
+    def _fetch(self, url, part_path, voice_name):
+        """One attempt: append to part_path from where it ends
+
+        Returns the running sha256 of the whole file and the server's sha256 (or None).
+        """
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        response = self.session.get(url, stream=True, timeout=30, headers=headers)
+        with response:
+            if response.status_code == 416:
+                # Range starts at the end: the partial file is already complete
+                return file_sha256(part_path), expected_sha256(response)
             response.raise_for_status()
             
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded = 0
+            if response.status_code == 206:
+                digest = file_sha256(part_path)
+                mode = 'ab'
+            else:
+                # Server ignored the Range header: start over
+                digest = hashlib.sha256()
+                offset = 0
+                mode = 'wb'
+            total_size = offset + int(response.headers.get('content-length', 0))
+            downloaded = offset
+            chunk_size = CHUNK_MIN
+            reported = -1
             
-            with open(file_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        
-                        if total_size > 0:
-                            percent = (downloaded / total_size) * 100
-                            print(f"\r⬇️  Downloading {voice_name}: {percent:.1f}%", end='')
+            with open(part_path, mode) as f:
+                while True:
+                    start = time.perf_counter()
+                    chunk = response.raw.read(chunk_size, decode_content=True)
+                    if not chunk:
+                        break
+                    elapsed = time.perf_counter() - start
+                    f.write(chunk)
+                    digest.update(chunk)
+                    downloaded += len(chunk)
+                    if elapsed < CHUNK_FAST:
+                        chunk_size = min(CHUNK_MAX, chunk_size * 2)
+                    elif elapsed > CHUNK_SLOW:
+                        chunk_size = max(CHUNK_MIN, chunk_size // 2)
+                    
+                    if total_size > 0:
+                        percent = int(downloaded * 100 / total_size)
+                        if percent // 10 != reported:
+                            reported = percent // 10
+                            print(f"\r⬇️  Downloading {voice_name}: {percent}%", end='')
+                f.flush()
+                os.fsync(f.fileno())
             
-            print(f"\n✅ Downloaded: {voice_name}")
-            return True
+            if total_size and downloaded < total_size:
+                raise IOError(f"connection closed at {downloaded} of {total_size} bytes")
+            return digest, expected_sha256(response)
+    
+    def catalog(self):
+        """Installed voices by name, from memory unless the directory changed"""
+        try:
+            mtime = os.stat(self.voices_dir).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        if self._catalog is None or mtime != self._catalog_mtime:
+            try:
+                self.refresh_catalog()
+            except OSError as e:
+                # Another worker is changing the directory under us; serve what we had
+                print(f"⚠️ Voice catalog refresh failed: {e}")
+                return self._catalog or {}
+        return self._catalog
+    
+    def refresh_catalog(self):
+        """Rescan voices_dir, reusing manifest entries for unchanged files, and rewrite the manifest"""
+        with self._catalog_lock:
+            previous = self._read_manifest()
+            known = previous.get('voices', {})
+            voices = {}
+            partial = {}
+            for entry in os.scandir(self.voices_dir):
+                try:
+                    if entry.name.endswith('.onnx.part'):
+                        partial[entry.name[:-len('.onnx.part')]] = entry.stat().st_size
+                    elif entry.name.endswith('.onnx'):
+                        name = entry.name[:-len('.onnx')]
+                        voices[name] = self._describe(name, entry.path, entry.stat(), known.get(name))
+                except FileNotFoundError:
+                    # Renamed or removed by a download in another worker mid-scan
+                    continue
             
-        except Exception as e:
-            print(f"\n❌ Failed to download {voice_name}: {e}")
-            # Clean up partial download
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            return False
+            manifest = {'version': MANIFEST_VERSION, 'voices': voices, 'partial': partial}
+            if manifest != previous:
+                self._write_manifest(manifest)
+            # Writing the manifest touches the directory, so take the mtime afterwards
+            self._catalog_mtime = os.stat(self.voices_dir).st_mtime_ns
+            self._catalog = voices
+            return voices
+    
+    def _write_manifest(self, manifest):
+        """Atomic and private to this process, so concurrent workers never collide"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.voices_dir, prefix='.manifest-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError as e:
+            # The manifest only saves work on the next start; the catalog stays valid
+            print(f"⚠️ Could not write {self.manifest_path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return manifest if manifest.get('version') == MANIFEST_VERSION else {}
+    
+    def _describe(self, name, model_path, stat, previous):
+        """Manifest entry for one model; never hashes on the caller's thread
+
+        Downloads hash while they stream, so their checksum is already known.
+        Any other new or changed model is hashed in the background; until then
+        its sha256 is None (and a voice with a configured sha256 is not complete).
+        """
+        config_path = f"{model_path}.json"
+        try:
+            config_stat = os.stat(config_path)
+        except FileNotFoundError:
+            config_stat = None
+        unchanged = (
+            previous is not None
+            and previous.get('size') == stat.st_size
+            and previous.get('mtime_ns') == stat.st_mtime_ns
+            and previous.get('config_mtime_ns') == (config_stat.st_mtime_ns if config_stat else None)
+        )
+        if unchanged and previous.get('sha256'):
+            return previous
+        
+        sha256 = self._checksums.pop(model_path, None)
+        if sha256 is None:
+            self._hash_later(model_path)
+        entry = {
+            'model': os.path.basename(model_path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': sha256,
+            'config': None,
+            'config_mtime_ns': None,
+            'sample_rate': None,
+            'language': None,
+            'num_speakers': None,
+            'complete': False,
+        }
+        if config_stat is not None:
+            entry['config'] = os.path.basename(config_path)
+            entry['config_mtime_ns'] = config_stat.st_mtime_ns
+            try:
+                with open(config_path, encoding='utf-8') as f:
+                    config = json.load(f)
+                entry['sample_rate'] = config.get('audio', {}).get('sample_rate')
+                entry['language'] = config.get('language', {}).get('code') or config.get('espeak', {}).get('voice')
+                entry['num_speakers'] = config.get('num_speakers')
+            except (OSError, ValueError):
+                entry['config'] = None
+        
+        expected = self.available_voices.get(name, {}).get('sha256')
+        entry['complete'] = (
+            stat.st_size > 0
+            and entry['config'] is not None
+            and entry['sample_rate'] is not None
+            and (expected is None or expected == sha256)
+        )
+        return entry
+    
+    def _hash_later(self, model_path):
+        with self._lock:
+            if model_path in self._hashing:
+                return
+            self._hashing.add(model_path)
+        self._executor.submit(self._hash_model, model_path)
+    
+    def _hash_model(self, model_path):
+        try:
+            self._checksums[model_path] = file_sha256(model_path).hexdigest()
+        except OSError:
+            return
+        finally:
+            with self._lock:
+                self._hashing.discard(model_path)
+        try:
+            self.refresh_catalog()
+        except OSError as e:
+            print(f"⚠️ Voice catalog refresh failed: {e}")
     
     def get_voice_path(self, voice_name):
         """Get path to voice file"""
-        file_path = os.path.join(self.voices_dir, f"{voice_name}.onnx")
-        return file_path if os.path.exists(file_path) else None
+        entry = self.catalog().get(voice_name)
+        return os.path.join(self.voices_dir, entry['model']) if entry and entry['complete'] else None
+    
+    def get_config_path(self, voice_name):
+        """Get path to the voice's .onnx.json config"""
+        entry = self.catalog().get(voice_name)
+        return os.path.join(self.voices_dir, entry['config']) if entry and entry['complete'] else None
     
     def list_available_voices(self):
         """List all available voices"""
         return list(self.available_voices.keys())
     
     def list_downloaded_voices(self):
-        """List downloaded voices"""
-        downloaded = []
-        for f in os.listdir(self.voices_dir):
-            if f.endswith('.onnx'):
-                downloaded.append(f.replace('.onnx', ''))
-        return downloaded
+        """List downloaded voices (complete model + config only)"""
+        return [name for name, entry in self.catalog().items() if entry['complete']]
     
     def get_voice_info(self, voice_name):
         """Get information about a voice"""
@@ -136,3 +433,4 @@ if __name__ == "__main__":
     vm = VoiceManager()
     print("Available voices:", vm.list_available_voices())
     print("Downloaded voices:", vm.list_downloaded_voices())
+    print("Manifest:", vm.manifest_path)
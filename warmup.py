@@ -0,0 +1,258 @@
+"""
+Cache pre-warming from a curated phrase list and recent request logs
+
+With REQUEST_LOG set (it is off by default), every /tts request is appended
+to a small JSON-lines request log. A warm-up pass collects its targets from the phrase list file (one phrase per line,
+optionally "voice<TAB>text") and the top-N (text, voice, pitch, rate, gap,
+transliterate) requests in the log's recent window. It then synthesizes the ones that are
+not cached yet, one at a time, at no more than `rate` syntheses per second,
+holding back while live requests are being synthesized. Passes run at
+startup and/or every `interval` seconds. Across gunicorn workers a file lock
+lets one worker synthesize while the others wait; they then find everything
+already on the shared disk tier.
+
+Phrase file example:
+    # comments and blank lines are ignored
+    Welcome to ProVoice!
+    ur-PK-AsadNeural<TAB>Khush aamdeed
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from preprocess import transliteration_mode
+
+logger = logging.getLogger(__name__)
+
+REQUEST_FIELDS = ('text', 'voice', 'pitch', 'rate', 'gap', 'transliterate')
+
+
+class RequestLog:
+    """Append-only JSON lines of /tts requests, rotated to <path>.1 at max_bytes"""
+
+    def __init__(self, path, max_bytes=8 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def record(self, text, voice, pitch=0, rate=0, gap=0, transliterate=None):
+        line = json.dumps(
+            {'t': round(time.time(), 3), 'text': text, 'voice': voice,
+             'pitch': int(pitch), 'rate': int(rate), 'gap': int(gap),
+             'transliterate': transliteration_mode(transliterate)},
+            ensure_ascii=False
+        ) + '\n'
+        try:
+            with self._lock:
+                # Best effort across workers: a racing rotation only drops old lines
+                if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, f"{self.path}.1")
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line)
+        except OSError as e:
+            logger.warning(f"⚠️ Request log write failed: {e}")
+
+    def read(self, since=0.0):
+        """Logged requests newer than `since`, oldest file first"""
+        for path in (f"{self.path}.1", self.path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue
+                        if entry.get('t', 0) >= since:
+                            yield entry
+            except OSError:
+                continue
+
+    def counts(self, window_seconds):
+        """Counter of (text, voice, pitch, rate, gap, transliterate) over the window"""
+        return Counter(
+            tuple(entry.get(field, False if field == 'transliterate' else 0) for field in REQUEST_FIELDS)
+            for entry in self.read(time.time() - window_seconds)
+            if entry.get('text') and entry.get('voice')
+        )
+
+
+def read_phrases(path, default_voice):
+    """Warm-up items from a phrase list file"""
+    items = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line.strip() or line.lstrip().startswith('#'):
+                continue
+            voice, _, text = line.partition('\t') if '\t' in line else (default_voice, '', line)
+            items.append({'text': text.strip(), 'voice': voice.strip(), 'pitch': 0, 'rate': 0, 'gap': 0,
+                          'transliterate': transliteration_mode(None)})
+    return items
+
+
+class Warmer:
+    """Bounded-rate background synthesis of likely requests"""
+
+    def __init__(self, warm, is_warm, phrases_path=None, request_log=None, top_n=50,
+                 window_seconds=7 * 86400, rate=0.5, interval=0, on_start=True, start_delay=5.0,
+                 default_voice='en-US-JennyNeural', busy=None, max_defer=10.0, lock_path=None):
+        self.warm = warm
+        self.is_warm = is_warm
+        self.phrases_path = phrases_path
+        self.request_log = request_log
+        self.top_n = top_n
+        self.window_seconds = window_seconds
+        self.rate = rate
+        self.interval = interval
+        self.on_start = on_start
+        self.start_delay = start_delay
+        self.default_voice = default_voice
+        self.busy = busy
+        self.max_defer = max_defer
+        self.lock_path = lock_path
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._pid = None
+        self.passes = 0
+        self.state = 'idle'
+        self.progress = {}
+        self.last_pass = None
+        self._logged = 0
+
+    @property
+    def enabled(self):
+        return bool(self.phrases_path) or (self.request_log is not None and self.top_n > 0)
+
+    def targets(self):
+        """Phrase list first, then the most requested; duplicates dropped"""
+        items = []
+        if self.phrases_path:
+            try:
+                items += [dict(item, source='phrases', count=0)
+                          for item in read_phrases(self.phrases_path, self.default_voice)]
+            except OSError as e:
+                logger.warning(f"⚠️ Warm-up phrase list unreadable: {e}")
+        if self.request_log is not None and self.top_n > 0:
+            counts = self.request_log.counts(self.window_seconds)
+            self._logged = sum(counts.values())
+            items += [dict(zip(REQUEST_FIELDS, request), source='requests', count=count)
+                      for request, count in counts.most_common(self.top_n)]
+        seen = set()
+        unique = []
+        for item in items:
+            request = tuple(item[field] for field in REQUEST_FIELDS)
+            if request not in seen:
+                seen.add(request)
+                unique.append(item)
+        return unique
+
+    def _defer_to_live_traffic(self):
+        waited = 0.0
+        while self.busy is not None and self.busy() and waited < self.max_defer:
+            if self._stop.wait(0.25):
+                return
+            waited += 0.25
+
+    def run_pass(self):
+        """Warm every target once; returns the pass summary"""
+        lock_file = None
+        if self.lock_path:
+            os.makedirs(os.path.dirname(self.lock_path) or '.', exist_ok=True)
+            lock_file = open(self.lock_path, 'w')
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            return self._run_pass()
+        finally:
+            if lock_file is not None:
+                lock_file.close()
+
+    def _run_pass(self):
+        started = time.time()
+        targets = self.targets()
+        progress = {'total': len(targets), 'done': 0, 'already_warm': 0, 'synthesized': 0, 'failed': 0}
+        with self._lock:
+            self.state = 'running'
+            self.progress = progress
+        logger.info(f"🔥 Warm-up pass: {len(targets)} targets")
+
+        min_spacing = 1.0 / self.rate if self.rate > 0 else 0.0
+        last_synthesis = 0.0
+        for item in targets:
+            if self._stop.is_set():
+                break
+            try:
+                if self.is_warm(item):
+                    progress['already_warm'] += 1
+                else:
+                    # Bounded rate, and live requests go first
+                    pause = last_synthesis + min_spacing - time.monotonic()
+                    if pause > 0 and self._stop.wait(pause):
+                        break
+                    self._defer_to_live_traffic()
+                    last_synthesis = time.monotonic()
+                    self.warm(item)
+                    progress['synthesized'] += 1
+            except Exception as e:
+                progress['failed'] += 1
+                logger.warning(f"⚠️ Warm-up failed for {item['voice']} {item['text'][:30]!r}: {e}")
+            progress['done'] += 1
+
+        covered = [item for item in targets if self.is_warm(item)]
+        summary = dict(
+            progress,
+            started_at=round(started, 3),
+            seconds=round(time.time() - started, 2),
+            coverage=round(len(covered) / len(targets), 3) if targets else None,
+            # Share of all requests logged in the window that the cache now answers
+            request_coverage=round(
+                sum(item['count'] for item in covered if item['source'] == 'requests') / self._logged, 3
+            ) if self._logged else None,
+            sources=dict(Counter(item['source'] for item in targets)),
+        )
+        with self._lock:
+            self.state = 'idle'
+            self.passes += 1
+            self.last_pass = summary
+        logger.info(
+            f"✅ Warm-up pass done in {summary['seconds']}s: {progress['synthesized']} synthesized, "
+            f"{progress['already_warm']} already cached, {progress['failed']} failed, coverage {summary['coverage']}"
+        )
+        return summary
+
+    def _loop(self):
+        if self._stop.wait(self.start_delay):
+            return
+        if self.on_start:
+            self.run_pass()
+        while self.interval > 0 and not self._stop.wait(self.interval):
+            self.run_pass()
+
+    def start(self):
+        """Start the background thread once per worker process"""
+        with self._lock:
+            if self._pid == os.getpid() or not self.enabled or not (self.on_start or self.interval > 0):
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._loop, name='cache-warmer', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'state': self.state,
+                'passes': self.passes,
+                'progress': dict(self.progress),
+                'last_pass': dict(self.last_pass) if self.last_pass else None,
+                'rate_per_second': self.rate,
+                'interval_seconds': self.interval,
+            }